@@ -0,0 +1,86 @@
+"""Module providing cached CPLD register access over SMBus."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import i2cbus
+from smbus_pool import get_smbus_pool
+
+# CPLD version registers: major (bit 7 is a flag), minor, patch
+CPLD_VERSION_REG = 0x01
+CPLD_VERSION_LEN = 3
+CPLD_MAJOR_MASK = 0x7F
+
+MSG_CPLD_ERROR = "\u001b[31mGetting CPLD firmware version error.\u001b[0m"
+
+# Version data does not change while the system is up
+_VERSIONS: Dict[Tuple[str, int], Tuple[int, int, int]] = {}
+# (busid, addr) -> True if block reads match byte reads on that CPLD
+_BLOCK_READS: Dict[Tuple[int, int], bool] = {}
+
+
+def read_cpld_regs(busid: int, addr: int, reg: int, length: int) -> List[int]:
+    """
+    Reads `length` consecutive CPLD registers starting at `reg`.
+
+    A CPLD that does not auto-increment ACKs an I2C block read but repeats
+    or returns stale bytes. The first multi-register read of a device does
+    both a block read and byte reads and compares the whole block; the
+    outcome is remembered per device, so later reads are one block read,
+    or byte reads only if the block did not match (or failed).
+    """
+    pool = get_smbus_pool()
+    key = (busid, addr)
+    use_block = _BLOCK_READS.get(key)
+    if length > 1 and use_block is not False:
+        try:
+            block = pool.read_i2c_block_data(busid, addr, reg, length, force=True)
+        except OSError:
+            block = None
+        if block is not None and use_block:
+            return block
+    regs = [pool.read_byte_data(busid, addr, reg + n, force=True) for n in range(length)]
+    if length > 1 and use_block is None:
+        _BLOCK_READS[key] = block is not None and list(block) == regs
+    return regs
+
+
+def read_cpld_version(bus_name: str, addr: int) -> Optional[Tuple[int, int, int]]:
+    """Returns (major, minor, patch) of a CPLD, None if it cannot be read."""
+    key = (bus_name, addr)
+    version = _VERSIONS.get(key)
+    if version is not None:
+        return version
+    busid = i2cbus.get_i2c_bus_id(bus_name)
+    if busid < 0:
+        return None
+    try:
+        major, minor, patch = read_cpld_regs(busid, addr, CPLD_VERSION_REG, CPLD_VERSION_LEN)
+    except (OSError, ValueError):
+        return None
+    version = (major & CPLD_MAJOR_MASK, minor, patch)
+    _VERSIONS[key] = version
+    return version
+
+
+def format_cpld_version(version: Optional[Tuple[int, int, int]]) -> str:
+    """Formats a CPLD version as major.minor.patch."""
+    if version is None:
+        return MSG_CPLD_ERROR
+    return ".".join(str(n) for n in version)
+
+
+def read_cpld_versions(cplds: Dict[str, Tuple[str, int]]) -> Dict[str, str]:
+    """
+    Reads the versions of several CPLDs, name -> (bus name, address).
+
+    CPLDs on different buses are read concurrently.
+    """
+    if not cplds:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(cplds)) as pool:
+        futures = {
+            name: pool.submit(read_cpld_version, bus_name, addr)
+            for name, (bus_name, addr) in cplds.items()
+        }
+        return {name: format_cpld_version(future.result()) for name, future in futures.items()}
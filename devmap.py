@@ -0,0 +1,183 @@
+"""Module providing a one-shot index of the /run/devmap udev links."""
+
+import os
+import re
+from typing import Dict, List, Optional
+
+# Define devmap paths and categories
+DEVMAP_ROOT = "/run/devmap"
+DEVMAP_I2C = "i2c-busses"
+DEVMAP_FLASHES = "flashes"
+DEVMAP_GPIOCHIPS = "gpiochips"
+DEVMAP_XCVRS = "xcvrs"
+DEVMAP_CPLDS = "cplds"
+DEVMAP_CATEGORIES = (DEVMAP_I2C, DEVMAP_FLASHES, DEVMAP_GPIOCHIPS, DEVMAP_XCVRS, DEVMAP_CPLDS)
+
+# Trailing number of a chardev, i2c-5 -> 5, spidev1.0 -> 1, gpiochip0 -> 0
+CHARDEV_ID_PATTERN = re.compile(r"(\d+)(?:\.\d+)?$")
+
+
+class DevMapEntry:
+    """A udev link under /run/devmap/<category>/."""
+
+    __slots__ = ("category", "name", "path", "target")
+
+    def __init__(self, category, name, path, target):
+        self.category = category
+        self.name = name
+        self.path = path
+        self.target = target
+
+    @property
+    def exists(self) -> bool:
+        """True if the link target is present now (checked on every call)."""
+        return os.path.exists(self.path)
+
+    @property
+    def chardev(self) -> Optional[str]:
+        """Basename of the link target, e.g. i2c-5 or spidev0.0."""
+        return os.path.basename(self.target) if self.target else None
+
+    @property
+    def dev_id(self) -> int:
+        """Number of the target chardev (bus id), -1 if none."""
+        if not self.target or not self.exists:
+            return -1
+        match = CHARDEV_ID_PATTERN.search(self.chardev)
+        return int(match.group(1)) if match else -1
+
+    def __repr__(self):
+        return f"DevMapEntry({self.category}/{self.name} -> {self.target})"
+
+
+def _read_entry(category: str, name: str, path: str, is_link: bool) -> DevMapEntry:
+    target = None
+    if is_link:
+        target = os.readlink(path)
+        if not os.path.isabs(target):
+            target = os.path.normpath(os.path.join(os.path.dirname(path), target))
+    return DevMapEntry(category, name, path, target)
+
+
+class _Category:
+    """Entries of one devmap directory and the mtime they were read at."""
+
+    __slots__ = ("mtime", "by_name", "by_chardev")
+
+    def __init__(self, mtime, entries: List[DevMapEntry]):
+        self.mtime = mtime
+        self.by_name = {entry.name: entry for entry in entries}
+        self.by_chardev = {entry.chardev: entry for entry in entries if entry.chardev}
+
+
+class DevMap:
+    """
+    Index of every /run/devmap category.
+
+    Each category is read with a single os.scandir pass. Lookups stat the
+    category directory and rebuild it only when its mtime has changed;
+    whether a link target exists is checked on every lookup, since targets
+    can come and go without touching the directory.
+    """
+
+    def __init__(self, root: str = DEVMAP_ROOT):
+        self.root = root
+        self._categories: Dict[str, _Category] = {}
+
+    def _scan(self, category: str, mtime) -> _Category:
+        entries = []
+        cat_path = os.path.join(self.root, category)
+        try:
+            with os.scandir(cat_path) as it:
+                for dirent in it:
+                    entries.append(_read_entry(category, dirent.name, dirent.path, dirent.is_symlink()))
+        except OSError:
+            pass
+        return _Category(mtime, entries)
+
+    def mtime(self, category: str) -> Optional[int]:
+        """Returns the mtime (ns) of a category directory, None if missing."""
+        try:
+            return os.stat(os.path.join(self.root, category)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _category(self, category: str) -> _Category:
+        mtime = self.mtime(category)
+        cached = self._categories.get(category)
+        if cached is None or cached.mtime != mtime:
+            cached = self._scan(category, mtime)
+            self._categories[category] = cached
+        return cached
+
+    def invalidate(self):
+        """Drops every cached category."""
+        self._categories.clear()
+
+    def names(self, category: str) -> List[str]:
+        """Returns the udev names of a category."""
+        return list(self._category(category).by_name)
+
+    def entries(self, category: str) -> List[DevMapEntry]:
+        """Returns the entries of a category."""
+        return list(self._category(category).by_name.values())
+
+    def lookup(self, category: str, name: str) -> Optional[DevMapEntry]:
+        """
+        Forward lookup: udev name -> entry. Names below an entry, such as
+        xcvr_1/xcvr_reset_1, are read when looked up.
+        """
+        head, sep, rest = name.partition("/")
+        entry = self._category(category).by_name.get(head)
+        if entry is None or not sep:
+            return entry
+        path = os.path.join(entry.path, rest)
+        try:
+            if not os.path.lexists(path):
+                return None
+            return _read_entry(category, name, path, os.path.islink(path))
+        except OSError:
+            return None
+
+    def reverse(self, category: str, chardev: str) -> Optional[DevMapEntry]:
+        """Reverse lookup: chardev (i2c-5, spidev0.0, ...) -> entry."""
+        return self._category(category).by_chardev.get(os.path.basename(chardev))
+
+    def resolve(self, category: str, name: str) -> Optional[str]:
+        """Returns the link target of a udev name, None if missing."""
+        entry = self.lookup(category, name)
+        return entry.target if entry else None
+
+    def exists(self, category: str, name: str) -> bool:
+        """Returns True if the udev name exists and its target is present."""
+        entry = self.lookup(category, name)
+        return bool(entry and entry.exists)
+
+    def i2c_bus_id(self, bus_name: str) -> int:
+        """udev bus name -> bus id, -1 if unknown."""
+        entry = self.lookup(DEVMAP_I2C, bus_name)
+        return entry.dev_id if entry else -1
+
+    def i2c_bus_name(self, busid: int) -> Optional[str]:
+        """Bus id -> udev bus name, None if unmapped."""
+        entry = self.reverse(DEVMAP_I2C, f"i2c-{busid}")
+        return entry.name if entry else None
+
+
+_DEVMAP: Optional[DevMap] = None
+
+
+def get_devmap() -> DevMap:
+    """Returns the process-wide devmap index."""
+    global _DEVMAP
+    if _DEVMAP is None:
+        _DEVMAP = DevMap()
+    return _DEVMAP
+
+
+if __name__ == "__main__":
+    devmap = get_devmap()
+    for cat in DEVMAP_CATEGORIES:
+        print(f"[{cat}]")
+        for devmap_entry in sorted(devmap.entries(cat), key=lambda e: e.name):
+            print(f'{"":4}{devmap_entry.name:<24} -> {devmap_entry.target}')
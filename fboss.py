@@ -1,17 +1,18 @@
 #!/usr/bin/env python3
 
 """Module providing test functions for fboss and fpga."""
-import struct
 import random
 import string
-import mmap
-import contextlib
 import re
 import json
+import functools
 from time import sleep
 from datetime import timedelta
 from fboss_utils import *
 import i2cbus
+import cpld
+from smbus_pool import get_smbus_pool
+from iob_bar import get_iob_bar
 from spibus import SPIBUS
 
 IOB_PCI_DRIVER="fbiob_pci"
@@ -67,6 +68,21 @@ I2C_ADDR_SMBCPLD = 0x33
 I2C_BUS_MCBCPLD = "IOB_I2C_BUS_14"
 I2C_ADDR_MCBCPLD = 0x33
 
+# Static version sources
+DMI_BIOS_VERSION = "/sys/class/dmi/id/bios_version"
+DIAGOS_VERSION_FILE = "/etc/VERSION"
+BSP_VERSION_FILE = "/etc/BSPVER"
+
+
+@functools.lru_cache(maxsize=None)
+def _read_static_file(path: str):
+    """Reads a file whose content is fixed for the life of the system."""
+    try:
+        with open(path, "r", encoding="utf-8") as fd:
+            return fd.read().strip()
+    except OSError:
+        return None
+
 
 def platform_data_parse(config_file):
     """Parses platform data from a JSON configuration file."""
@@ -126,25 +142,11 @@ class Fboss:
         bdf_fd = f"{self.fpga_path}resource0"
 
         try:
-            with open(bdf_fd, mode="r+", encoding="utf-8") as fpgaio:
-                with contextlib.closing(
-                    mmap.mmap(
-                        fpgaio.fileno(),
-                        length=0,
-                        flags=mmap.MAP_SHARED,
-                        access=mmap.ACCESS_DEFAULT,
-                    )
-                ) as mmap_obj:
-                    if val is not None:
-                        mmap_obj.seek(reg)
-                        mmap_obj.write(bytes.fromhex(val))
-                        mmap_obj.flush()
-                    else:
-                        mmap_obj.seek(reg)
-                        strout = struct.pack(
-                            "<l", *struct.unpack(">l", mmap_obj.read(4))
-                        )
-                        return bytes.hex(strout)
+            bar = get_iob_bar(bdf_fd)
+            if val is not None:
+                bar.write_block(reg, bytes.fromhex(val))
+            else:
+                return f"{bar.read32(reg):08x}"
         except IOError as err:
             print("I/O error:", err)
         except ValueError:
@@ -154,13 +156,13 @@ class Fboss:
             raise
 
     def _execute_i2cget(self, bus: int, addr: int, reg: int) -> tuple[bool, list[int]]:
-        """Executes an I2C get command."""
-        i2cget_cmd = f"i2cget -y -f {bus} {addr:#4x} {reg:#4x}"
-        stat, res = execute_shell_cmd(i2cget_cmd)
-        if not stat:
+        """Reads one register byte, like i2cget -y -f."""
+        try:
+            value = get_smbus_pool().read_byte_data(bus, addr, reg, force=True)
+        except OSError:
             return False, []
 
-        return True, [int(i, 16) for i in res.split()]
+        return True, [value]
 
     def gen_random_hex_string(self, size):
         """Generates a random hexadecimal string."""
@@ -320,29 +322,30 @@ System Uptime   : {execute_shell_cmd('uptime -p')[1].strip()}
     def _bios_version(self) -> str:
         # BIOS Version
         bios_version = "Getting BIOS version error."
-        cmd = "dmidecode -s bios-version"
-        _, bios_info = execute_shell_cmd(cmd)
-        if _:
-            bios_version = bios_info
+        bios_info = _read_static_file(DMI_BIOS_VERSION)
+        if bios_info is None:
+            _, bios_info = execute_shell_cmd("dmidecode -s bios-version")
+            if not _:
+                return bios_version
+        bios_version = bios_info
 
         return bios_version
 
     def _diagos_version(self) -> str:
         # DiagOS Version
-        cmd = "cat /etc/VERSION"
         diagos_version = "Getting DiagOS version error."
-        _, os_info = execute_shell_cmd(cmd)
-        if _:
+        os_info = _read_static_file(DIAGOS_VERSION_FILE)
+        if os_info:
             diagos_version = os_info
 
-        return diagos_version.split("=")[1]
+        parts = diagos_version.split("=")
+        return parts[1] if len(parts) > 1 else diagos_version
 
     def _bsp_version(self) -> str:
         # FBOSS BSP Version
-        cmd = "cat /etc/BSPVER"
         bsp_version = "Getting FBOSS BSP version error."
-        _, bsp_info = execute_shell_cmd(cmd)
-        if not _:
+        bsp_info = _read_static_file(BSP_VERSION_FILE)
+        if bsp_info is None:
             return bsp_version
 
         bsp_version = re.findall(r"BSP_VER\S+", bsp_info, re.M)
@@ -354,60 +357,29 @@ System Uptime   : {execute_shell_cmd('uptime -p')[1].strip()}
 
     def _cplds_version(self, dev_info, dev_addr) -> str:
         # Get CPLD Version
-        cpld_version = []
-        msg = "\u001b[31mGetting CPLD firmware version error.\u001b[0m"
-        busid = i2cbus.get_i2c_bus_id(dev_info)
-        if int(busid) < 0:
-            return "x", "x", "x"
-        for reg in range(1, 4):
-            _, val = self._execute_i2cget(busid, dev_addr, reg)
-            if not _:
-                cpld_version.append(msg)
-            cpld_version.append(val)
+        return cpld.format_cpld_version(cpld.read_cpld_version(dev_info, dev_addr))
 
-        return cpld_version[0], cpld_version[1], cpld_version[2]
+    def _fpga_version(self, fpga_info: str) -> str:
+        path_file = f"{IOB_PCI_DRIVER}.{fpga_info}/fpga_ver"
+        val = read_sysfile_value(f"{DEV_PATH}{path_file}")
+        if not val:
+            return "NA"
+        return f"0.{int(val, 16)}"
 
     def firmware_version_info(self) -> str:
         """get firmware version functon"""
         # IOB/DOM FPGA Version
-        _major, _minor, _patch = "x", "x", "x"
-        path_file = f"{IOB_PCI_DRIVER}.fpga_info_iob.0/fpga_ver"
-        val = read_sysfile_value(f"{DEV_PATH}{path_file}")
-        if not val:
-            iob_version = "NA"
-        else:
-            iob_version = f"0.{int(val, 16)}"
-        path_file = f"{IOB_PCI_DRIVER}.fpga_info_dom.1/fpga_ver"
-        val = read_sysfile_value(f"{DEV_PATH}{path_file}")
-        if not val:
-            dom1_version = "NA"
-        else:
-            dom1_version = f"0.{int(val, 16)}"
+        iob_version = self._fpga_version("fpga_info_iob.0")
+        dom1_version = self._fpga_version("fpga_info_dom.1")
 
         if self._platform == "montblanc":
-            path_file = f"{IOB_PCI_DRIVER}.fpga_info_dom.2/fpga_ver"
-            val = read_sysfile_value(f"{DEV_PATH}{path_file}")
-            if not val:
-                dom2_version = "NA"
-            else:
-                dom2_version = f"0.{int(val, 16)}"
-            # SCM CPLD version
-            _major, _minor, _patch = self._cplds_version(
-                I2C_BUS_SCMCPLD, I2C_ADDR_SCMCPLD
-            )
-            scm_version = f"{_major[0] & 0x7f}.{_minor[0]}.{_patch[0]}"
-
-            # SMB CPLD version
-            _major, _minor, _patch = self._cplds_version(
-                I2C_BUS_SMBCPLD, I2C_ADDR_SMBCPLD
-            )
-            smb_version = f"{_major[0] & 0x7f}.{_minor[0]}.{_patch[0]}"
-
-            # MCB CPLD version
-            _major, _minor, _patch = self._cplds_version(
-                I2C_BUS_MCBCPLD, I2C_ADDR_MCBCPLD
-            )
-            mcb_version = f"{_major[0] & 0x7f}.{_minor[0]}.{_patch[0]}"
+            dom2_version = self._fpga_version("fpga_info_dom.2")
+            # SCM/SMB/MCB CPLD versions, read concurrently
+            versions = cpld.read_cpld_versions({
+                "scm": (I2C_BUS_SCMCPLD, I2C_ADDR_SCMCPLD),
+                "smb": (I2C_BUS_SMBCPLD, I2C_ADDR_SMBCPLD),
+                "mcb": (I2C_BUS_MCBCPLD, I2C_ADDR_MCBCPLD),
+            })
             return f"""\
 [Firmware Version Info]
 {self._platform.title()} BIOS      : {self._bios_version()}
@@ -416,28 +388,17 @@ System Uptime   : {execute_shell_cmd('uptime -p')[1].strip()}
 {self._platform.title()} IOB FPGA  : {iob_version}
 {self._platform.title()} DOM1 FPGA : {dom1_version}
 {self._platform.title()} DOM2 FPGA : {dom2_version}
-{self._platform.title()} SCM CPLD  : {scm_version}
-{self._platform.title()} SMB CPLD  : {smb_version}
-{self._platform.title()} MCB CPLD  : {mcb_version}
+{self._platform.title()} SCM CPLD  : {versions["scm"]}
+{self._platform.title()} SMB CPLD  : {versions["smb"]}
+{self._platform.title()} MCB CPLD  : {versions["mcb"]}
 """
         if self._platform == "janga" or self._platform == "tahan":
-            # PWR CPLD Version
-            _major, _minor, _patch = self._cplds_version(
-                I2C_BUS_PWRCPLD, I2C_ADDR_PWRCPLD
-            )
-            pwr_version = f"{_major[0] & 0x7f}.{_minor[0]}.{_patch[0]}"
-
-            # SMB CPLD1 Version
-            _major, _minor, _patch = self._cplds_version(
-                I2C_BUS_SMBCPLD1, I2C_ADDR_SMBCPLD1
-            )
-            smb1_version = f"{_major[0] & 0x7f}.{_minor[0]}.{_patch[0]}"
-
-            # SMB CPLD2 Version
-            _major, _minor, _patch = self._cplds_version(
-                I2C_BUS_SMBCPLD2, I2C_ADDR_SMBCPLD2
-            )
-            smb2_version = f"{_major[0] & 0x7f}.{_minor[0]}.{_patch[0]}"
+            # PWR/SMB1/SMB2 CPLD versions, read concurrently
+            versions = cpld.read_cpld_versions({
+                "pwr": (I2C_BUS_PWRCPLD, I2C_ADDR_PWRCPLD),
+                "smb1": (I2C_BUS_SMBCPLD1, I2C_ADDR_SMBCPLD1),
+                "smb2": (I2C_BUS_SMBCPLD2, I2C_ADDR_SMBCPLD2),
+            })
 
             return f"""\
 [Firmware Version Info]
@@ -446,9 +407,9 @@ System Uptime   : {execute_shell_cmd('uptime -p')[1].strip()}
 {self._platform.title()} FBOSS BSP : {self._bsp_version()}
 {self._platform.title()} IOB FPGA  : {iob_version}
 {self._platform.title()} DOM FPGA  : {dom1_version}
-{self._platform.title()} PWR CPLD  : {pwr_version}
-{self._platform.title()} SMB CPLD1 : {smb1_version}
-{self._platform.title()} SMB CPLD2 : {smb2_version}
+{self._platform.title()} PWR CPLD  : {versions["pwr"]}
+{self._platform.title()} SMB CPLD1 : {versions["smb1"]}
+{self._platform.title()} SMB CPLD2 : {versions["smb2"]}
 """
 
     def show_version_info(self):
@@ -484,8 +445,17 @@ System Uptime   : {execute_shell_cmd('uptime -p')[1].strip()}
 
         return f'{"PASS" if status else sta_info}'
 
-    def detect_iob_i2c_buses(self):
-        """iob i2c bus scan"""
+    def _i2c_scan_status(self, results) -> tuple[str, str]:
+        """Returns the first failing bus status, or the last one if all passed."""
+        for result in results:
+            if result.status != "PASS":
+                return result.status, result.sta_info
+        if not results:
+            return "PASS", "No I2C bus scanned."
+        return results[-1].status, results[-1].sta_info
+
+    def detect_iob_i2c_buses(self, targeted: bool = False):
+        """iob i2c bus scan, `targeted` only probes the expected addresses"""
         max_bus = self.platform_data["i2cDeviceConfigs"].get("iobBusCount")
         i2cDeviceInfo = f"{self._platform}_i2c_bus_map"
         dev_map = self.platform_data["i2cDeviceConfigs"].get(i2cDeviceInfo)
@@ -494,15 +464,14 @@ System Uptime   : {execute_shell_cmd('uptime -p')[1].strip()}
             " Status | CH ID | BUSID |   UDEV Name   |   Slave Devices List\n"
             "-------------------------------------------------------------------------"
         )
-        for bus_name in dev_map.keys():
-            status, sta_info = i2cbus.scan_verify_i2c_bus(
-                self._platform, "IOB", bus_name, dev_map
-            )
+        results = i2cbus.scan_verify_i2c_buses(
+            self._platform, "IOB", list(dev_map.keys()), dev_map, targeted=targeted
+        )
 
-        return status, sta_info
+        return self._i2c_scan_status(results)
 
-    def detect_doms_i2c_buses(self):
-        """dom1 i2c bus scan"""
+    def detect_doms_i2c_buses(self, targeted: bool = False):
+        """dom1 i2c bus scan, `targeted` only probes the expected addresses"""
         I2CBusCount = f"{self._platform}XcvrCount"
         max_bus = self.platform_data["i2cDeviceConfigs"].get(I2CBusCount)
         dev_map = self.platform_data["i2cDeviceConfigs"].get("xcvrDevicesMap")
@@ -511,13 +480,12 @@ System Uptime   : {execute_shell_cmd('uptime -p')[1].strip()}
             " Status | CH ID | BUSID |  UDEV  |  REG  |  PRE  | RST | Slave Devices List\n"
             "-------------------------------------------------------------------------"
         )
-        for n in range(max_bus):
-            bus_name = f"XCVR_{n + 1}"
-            status, sta_info = i2cbus.scan_verify_i2c_bus(
-                self._platform, "DOM", bus_name, dev_map
-            )
+        bus_names = [f"XCVR_{n + 1}" for n in range(max_bus)]
+        results = i2cbus.scan_verify_i2c_buses(
+            self._platform, "DOM", bus_names, dev_map, targeted=targeted
+        )
 
-        return status, sta_info
+        return self._i2c_scan_status(results)
 
     def scan_spi_device_test(self, devs: tuple[str, ...]) -> tuple[int, str]:
         """detect spidev flash functon"""
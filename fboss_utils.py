@@ -4,6 +4,8 @@ import os
 import sys
 from typing import Tuple, Optional
 
+from pci_devices import find_pci_bdf
+
 # Constants for clarity
 MSG_FILE_NOT_FOUND = "\u001b[31mFAIL\u001b[0m\t{}File not exist."
 COLOR_RED = '\033[1;31m'
@@ -71,13 +73,7 @@ def execute_shell_cmd(cmd: str) -> Tuple[bool, str]:
 
 def get_pci_bdf_info(vendor_id: str) -> Optional[str]:
     """Retrieves the PCI Bus, Device, and Function (BDF) information for a device with the given vendor ID."""
-    status, stdout = execute_shell_cmd("lspci -n")
-    if not status:
-        return None
-    for line in stdout.splitlines():
-        if vendor_id in line:
-            return line.split()[0]
-    return None
+    return find_pci_bdf(vendor_id)
 
 
 def read_sysfile_value(devfile: str) -> Optional[str]:
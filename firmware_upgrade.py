@@ -1,6 +1,7 @@
 import os
 import time
 import pathlib
+from devmap import get_devmap, DEVMAP_FLASHES
 from fboss_utils import execute_shell_cmd
 
 # Chip and GPIO pin mappings
@@ -98,10 +99,14 @@ def firmware_upgrade() -> None:
     if gpionum:
         select_gpio(gpionum)
 
-    flash_devmap = f"/run/devmap/flashes/{devname.upper()}_FLASH"
+    flash_udev = f"{devname.upper()}_FLASH"
     if devname == "scmcpld":
-        flash_devmap = f"/run/devmap/flashes/I210_{devname.upper()}_FLASH"
-    upgrade_cmd = f"flashrom -p linux_spi:dev={os.readlink(flash_devmap)} -w {fwimg} -c {chipname}"
+        flash_udev = f"I210_{devname.upper()}_FLASH"
+    spidev = get_devmap().resolve(DEVMAP_FLASHES, flash_udev)
+    if spidev is None:
+        print(f"\nError: No device link in this path : /run/devmap/flashes/{flash_udev}\n")
+        return
+    upgrade_cmd = f"flashrom -p linux_spi:dev={spidev} -w {fwimg} -c {chipname}"
     print(upgrade_cmd, "\n\nStarting firmware upgrade...\n")
 
     os.system(upgrade_cmd)
@@ -2,62 +2,169 @@
 import os
 import re
 import yaml
-import mmap
 import random
+import hashlib
+import numpy as np
 from typing import Tuple
-import struct
 
-from fboss_utils import execute_shell_cmd
+from iob_bar import get_iob_bar
 import i2cbus
 
 OFFSET_REVISION = 0x00000
 OFFSET_REVISION_DOM1 = 0x40000
+OFFSET_REVISION_DOM2 = 0x48000
 
-IOB_RESOURCE0 = ""
+# Register windows of the golden file, highest base first
+FPGA_WINDOWS = (
+    ("DOM2", OFFSET_REVISION_DOM2),
+    ("DOM1", OFFSET_REVISION_DOM1),
+    ("IOB", OFFSET_REVISION),
+)
 
-def _fetch_resourse0() -> str:
-    status, stdout = execute_shell_cmd("lspci -nd 1d9b:0011")
-    if not status:
-        return None
-    pcie_bdf = stdout.split()[0]
-    return f"/sys/bus/pci/devices/0000:{pcie_bdf}/resource0"
-
-IOB_RESOURCE0 = _fetch_resourse0()
-
-def load_yaml_file() :
-    yaml_file_name = "MP3_FPGA.yaml"
+GOLDEN_YAML = "MP3_FPGA.yaml"
+# Compiled golden data, stored next to the YAML and keyed by its hash
+GOLDEN_CACHE = ".{}.{}.npz"
+FPGA_REG_WIDTH = 4
+FPGA_WORD_MASK = 0xFFFFFFFF
 
+def load_yaml_file(yaml_file_name=GOLDEN_YAML) :
     with open(yaml_file_name , 'r', encoding='utf-8') as file :
-        data = yaml.load(file, Loader=yaml.FullLoader)
+        data = yaml.load(file, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
     return data
 
 def _iob_read(offset: int, length: int)  -> bytes:
-    with open(IOB_RESOURCE0, "r+b") as fpga_fd, mmap.mmap(
-        fpga_fd.fileno(), 0
-    ) as mm_fpga:
-        mm_fpga.seek(offset)
-        return mm_fpga.read(length)
-
-def verify_fpag_data():
-    data = load_yaml_file()
-    fpga_number = data["FPGA"]['FPAG_NUMBER']
-    for i in range(1, fpga_number + 1):
-        fpga_read_write = data["FPGA"]['fpga_read_write_{}'.format(i)]
-        fpga_start_bit = data["FPGA"]['fpga_start_bit_{}'.format(i)]
-        fpga_length = 4
-        fpga_value_1 = data["FPGA"]['fpga_value1_{}'.format(i)]
-        fpga_value_2 = data["FPGA"]['fpga_value2_{}'.format(i)]
-        fpga_value_3 = data["FPGA"]['fpga_value3_{}'.format(i)]
-        fpga_value_4 = data["FPGA"]['fpga_value4_{}'.format(i)]
-
-        if fpga_read_write == "read" or fpga_read_write == "READ":
-            value_1, value_2, value_3, value_4 = _iob_read(fpga_start_bit, fpga_length)
-            if value_1 != fpga_value_1 or value_2 != fpga_value_2 or value_3 != fpga_value_3 or value_4 != fpga_value_4:
-                print(f"Check data \033[0;31;40m error \033[0m: fpga_read_offset = {fpga_start_bit:#8x}, fpga_length = {fpga_length}, fpga_value = {fpga_value_1:#4x}, {fpga_value_2:#4x}, {fpga_value_3:#4x}, {fpga_value_4:#4x}, get data = {value_1:#4x}, {value_2:#4x}, {value_3:#4x}, {value_4:#4x}")
+    view = get_iob_bar().read_block(offset, length)
+    try:
+        return bytes(view)
+    finally:
+        view.release()
+
+def fpga_window_name(offset: int) -> str:
+    """Returns the register window (IOB/DOM1/DOM2) an offset falls in."""
+    for name, base in FPGA_WINDOWS:
+        if offset >= base:
+            return name
+    return "IOB"
+
+
+class GoldenRegisters:
+    """
+    Golden register set compiled into parallel arrays.
+
+    `offsets`, `expected` and `masks` hold one uint32 per "read" entry of the
+    golden file, `entries` the entry number it was compiled from.
+    """
+
+    def __init__(self, entries, offsets, expected, masks):
+        self.entries = np.asarray(entries, dtype=np.uint32)
+        self.offsets = np.asarray(offsets, dtype=np.uint32)
+        self.expected = np.asarray(expected, dtype=np.uint32)
+        self.masks = np.asarray(masks, dtype=np.uint32)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @classmethod
+    def from_yaml_data(cls, data):
+        """Compiles the FPGA section of a loaded golden YAML."""
+        fpga = data["FPGA"]
+        entries, offsets, expected, masks = [], [], [], []
+        for i in range(1, fpga["FPAG_NUMBER"] + 1):
+            if str(fpga[f"fpga_read_write_{i}"]).lower() != "read":
                 continue
-        
-            print(f"Check data success: fpga_read_offset = {fpga_start_bit:#8x}, fpga_length = {fpga_length}, fpga_value = {fpga_value_1:#4x}, {fpga_value_2:#4x}, {fpga_value_3:#4x}, {fpga_value_4:#4x}, get data = {value_1:#4x}, {value_2:#4x}, {value_3:#4x}, {value_4:#4x}")
+            word = 0
+            for n in range(FPGA_REG_WIDTH):
+                word |= (fpga[f"fpga_value{n + 1}_{i}"] & 0xFF) << (8 * n)
+            entries.append(i)
+            offsets.append(fpga[f"fpga_start_bit_{i}"])
+            expected.append(word)
+            masks.append(fpga.get(f"fpga_mask_{i}", FPGA_WORD_MASK))
+        return cls(entries, offsets, expected, masks)
+
+    @classmethod
+    def load(cls, yaml_file_name=GOLDEN_YAML):
+        """Loads the compiled golden set, compiling and caching it if needed."""
+        with open(yaml_file_name, "rb") as fd:
+            digest = hashlib.sha256(fd.read()).hexdigest()[:16]
+        yaml_dir, yaml_base = os.path.split(os.path.abspath(yaml_file_name))
+        cache_file = os.path.join(yaml_dir, GOLDEN_CACHE.format(yaml_base, digest))
+        if os.path.exists(cache_file):
+            try:
+                with np.load(cache_file) as cache:
+                    return cls(
+                        cache["entries"], cache["offsets"],
+                        cache["expected"], cache["masks"]
+                    )
+            except (OSError, KeyError, ValueError):
+                pass
+
+        golden = cls.from_yaml_data(load_yaml_file(yaml_file_name))
+        tmp_file = f"{cache_file}.tmp"
+        try:
+            with open(tmp_file, "wb") as fd:
+                np.savez(
+                    fd, entries=golden.entries, offsets=golden.offsets,
+                    expected=golden.expected, masks=golden.masks
+                )
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            # Read-only checkout, run from the YAML every time
+            pass
+        return golden
+
+    def _gather_view(self, view):
+        if not np.any(self.offsets % FPGA_REG_WIDTH):
+            words = np.frombuffer(view, dtype="<u4")
+            return words[self.offsets // FPGA_REG_WIDTH].astype(np.uint32)
+        raw = np.frombuffer(view, dtype=np.uint8)
+        lanes = self.offsets[:, None] + np.arange(FPGA_REG_WIDTH, dtype=np.uint32)
+        return np.ascontiguousarray(raw[lanes]).view("<u4").ravel().astype(np.uint32)
+
+    def gather(self, bar):
+        """Reads every golden register from a single BAR mapping."""
+        length = bar.size - bar.size % FPGA_REG_WIDTH
+        if len(self) and int(self.offsets.max()) + FPGA_REG_WIDTH > length:
+            raise ValueError(f"Golden offsets exceed BAR size {bar.size:#x}")
+        view = bar.read_block(0, length)
+        try:
+            return self._gather_view(view)
+        finally:
+            view.release()
+
+    def verify(self, bar):
+        """
+        Compares the BAR against the golden set in one pass.
+
+        Returns the gathered values and the indices of mismatching registers.
+        """
+        values = self.gather(bar)
+        diff = (values ^ self.expected) & self.masks
+        return values, np.flatnonzero(diff)
+
+def verify_fpag_data(yaml_file_name=GOLDEN_YAML, verbose=True):
+    golden = GoldenRegisters.load(yaml_file_name)
+    fpga_length = FPGA_REG_WIDTH
+    values, mismatches = golden.verify(get_iob_bar())
+    failed = set(mismatches.tolist())
+
+    for idx in range(len(golden)):
+        if idx not in failed and not verbose:
+            continue
+        fpga_start_bit = int(golden.offsets[idx])
+        expect = int(golden.expected[idx]).to_bytes(FPGA_REG_WIDTH, "little")
+        value = int(values[idx]).to_bytes(FPGA_REG_WIDTH, "little")
+        fpga_value = ", ".join(f"{b:#4x}" for b in expect)
+        get_data = ", ".join(f"{b:#4x}" for b in value)
+        window = fpga_window_name(fpga_start_bit)
+        if idx in failed:
+            print(f"Check data \033[0;31;40m error \033[0m: [{window}] fpga_read_offset = {fpga_start_bit:#8x}, fpga_length = {fpga_length}, mask = {int(golden.masks[idx]):#010x}, fpga_value = {fpga_value}, get data = {get_data}")
+            continue
+
+        print(f"Check data success: [{window}] fpga_read_offset = {fpga_start_bit:#8x}, fpga_length = {fpga_length}, fpga_value = {fpga_value}, get data = {get_data}")
+
+    print(f"Checked {len(golden)} registers, {len(failed)} mismatched.")
+    return not failed
 
 
 if __name__ == "__main__":
@@ -1,10 +1,11 @@
 """gpio module"""
 
-import os
 import re
 from typing import Tuple
 
+from devmap import get_devmap, DEVMAP_GPIOCHIPS
 from fboss_utils import execute_shell_cmd, get_platform
+from smbus_pool import get_smbus_pool
 import i2cbus
 
 IOB_PCI_DRIVER = "fbiob_pci"
@@ -23,8 +24,7 @@ def detect_gpio_devmap_device() -> str:
     if not stat:
         return GPIO_ERR_1
 
-    gpio_udev = f"/run/devmap/gpiochips/{GPIO_CHIP_NAME}"
-    if not os.path.exists(gpio_udev):
+    if not get_devmap().exists(DEVMAP_GPIOCHIPS, GPIO_CHIP_NAME):
         return GPIO_ERR_2.format(GPIO_CHIP_NAME)
 
     return GPIO_SUCCESS
@@ -91,14 +91,13 @@ def check_gpio_direction(gpiochip: str, pinnum: int) -> str:
 
 def check_set_gpio_output_success() -> str:
     """Test gpio control function."""
-    bus_info = "/run/devmap/i2c-busses/IOB_I2C_BUS_6"
-    if not os.path.exists(bus_info):
+    i2c_number = i2cbus.get_i2c_bus_id("IOB_I2C_BUS_6")
+    if i2c_number < 0:
         return GPIO_ERR_2.format("IOB_I2C_BUS_6")
 
-    i2c_number = i2cbus.get_i2c_bus_id("IOB_I2C_BUS_6")
-    cmd = f"i2cget -y -f -a {i2c_number} 0x50"
-    stat, _ = execute_shell_cmd(cmd)
-    if not stat:
+    try:
+        get_smbus_pool().read_byte(i2c_number, 0x50, force=True)
+    except OSError:
         return GPIO_ERR_4
 
     return GPIO_SUCCESS
@@ -1,154 +1,418 @@
 import os
+import select
+import time
+
+import numpy as np
 
 from fboss_utils import print_dict
 
+HWMON_PATH = '/sys/class/hwmon'
+HWMON_LIMITS = ("_max", "_min", "_crit", "_lcrit")
+# Limits that are upper bounds (max, crit), the others are lower bounds
+HWMON_LIMIT_HIGH = np.array([True, False, True, False])
+
+# Attribute kinds: file prefix, raw value divisor, unit, see
+# https://www.kernel.org/doc/Documentation/hwmon/sysfs-interface
+HWMON_KINDS = (
+    ('in', 1000, 'V'),
+    ('fan', 1, 'RPM'),
+    ('pwm', 255, 'PWM (%)'),
+    ('temp', 1000, 'C'),
+    ('curr', 1000, 'A'),
+    ('power', 1000000, 'W'),
+    ('freq', 1000000, 'MHz'),
+)
+KIND_NONE = -1
+
+# Alarm attributes, and the fallback poll interval range for drivers that
+# do not notify changes
+HWMON_ALARM_SUFFIXES = ('_alarm', '_fault')
+ALARM_POLL_MIN = 0.1
+ALARM_POLL_MAX = 5.0
+
+# One row per input attribute, raw integer values as read from sysfs
+HWMON_DTYPE = np.dtype([
+    ('chip', '<i4'),
+    ('kind', 'i1'),
+    ('valid', '?'),
+    ('value', '<i8'),
+    ('limits', '<i8', (len(HWMON_LIMITS),)),
+    ('has_limit', '?', (len(HWMON_LIMITS),)),
+])
+
+
+def hwmon_kind(attributes_file):
+    """Returns the HWMON_KINDS index of an attribute file, KIND_NONE if unknown."""
+    name = attributes_file.lower()
+    for kind, (prefix, _, _) in enumerate(HWMON_KINDS):
+        if name.startswith(prefix):
+            return kind
+    return KIND_NONE
+
+
+def format_value(kind, raw):
+    """Formats a raw value for display, None for unknown kinds."""
+    if kind == KIND_NONE:
+        return None
+    _, divisor, unit = HWMON_KINDS[kind]
+    if divisor == 1:
+        return f"{raw} {unit}"
+    return f"{round(int(raw) / divisor, 2)} {unit}"
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _read_file(path):
+    """Reads a small sysfs file, None on error."""
+    try:
+        with open(path, 'r') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+class HwmonAttr():
+    """One *_input/*_average attribute of a chip, with its static siblings."""
+
+    __slots__ = ('file', 'label', 'path', 'kind', 'limits', 'fd')
+
+    def __init__(self, file_, label, path, limits):
+        self.file = file_
+        self.label = label
+        self.path = path
+        self.kind = hwmon_kind(file_)
+        # Raw value of each of HWMON_LIMITS, None if absent
+        self.limits = limits
+        self.fd = None
+
+    def read(self):
+        """Reads the current value through the held-open fd."""
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDONLY)
+        return os.pread(self.fd, 64, 0).decode().strip()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class HwmonChip():
+    """A /sys/class/hwmon entry and its attributes."""
+
+    __slots__ = ('folder', 'name', 'attrs', 'alarms')
+
+    def __init__(self, folder, name, attrs, alarms=()):
+        self.folder = folder
+        self.name = name
+        self.attrs = attrs
+        self.alarms = list(alarms)
+
+
+class HwmonIndex():
+    """
+    Index of the hwmon chips, built with one os.scandir per chip.
+
+    Labels and limit attributes are static and read once when the index is
+    built; input attributes stay open so a refresh is one pread each.
+    """
+
+    def __init__(self, master_path=HWMON_PATH):
+        self.master_path = master_path
+        self.chips = []
+        self.attrs = []
+        self.template = np.zeros(0, dtype=HWMON_DTYPE)
+        self._folders = None
+        self.build()
+
+    def build(self):
+        """Scans every chip and opens nothing but the static attributes."""
+        self.close()
+        self.chips = []
+        self._folders = sorted(os.listdir(self.master_path))
+        for folder in self._folders:
+            chip = self._scan_chip(os.path.join(self.master_path, folder))
+            if chip:
+                self.chips.append(chip)
+        # Static part of the data rows, copied and filled on each sample
+        self.attrs = [(n, attr) for n, chip in enumerate(self.chips) for attr in chip.attrs]
+        self.template = np.zeros(len(self.attrs), dtype=HWMON_DTYPE)
+        for row, (chip_idx, attr) in enumerate(self.attrs):
+            self.template[row]['chip'] = chip_idx
+            self.template[row]['kind'] = attr.kind
+            for n, limit in enumerate(attr.limits):
+                if limit is not None:
+                    self.template[row]['limits'][n] = limit
+                    self.template[row]['has_limit'][n] = True
+
+    def _scan_chip(self, chip_path):
+        try:
+            with os.scandir(chip_path) as it:
+                files = [entry.name for entry in it]
+        except OSError:
+            return None
+        present = set(files)
+        name_key = _read_file(os.path.join(chip_path, 'name')) if 'name' in present else None
+        try:
+            symlink = os.readlink(os.path.join(chip_path, 'device')).strip().split("/")[-1]
+        except OSError:
+            symlink = os.path.basename(chip_path)
+
+        attrs = []
+        alarms = []
+        for file_ in files:
+            if file_.endswith(HWMON_ALARM_SUFFIXES):
+                file_key = file_.split('_')[0]
+                label = file_key
+                if file_key + '_label' in present:
+                    label = _read_file(os.path.join(chip_path, file_key + '_label'))
+                alarms.append(HwmonAttr(file_, label, os.path.join(chip_path, file_), []))
+                continue
+            if '_input' not in file_ and '_average' not in file_:
+                continue
+            file_key = file_.split('_')[0]
+            if file_key + '_label' in present:
+                # Labelled *_input_* files (e.g. _input_highest) are not values
+                if '_input_' in file_:
+                    continue
+                label = _read_file(os.path.join(chip_path, file_key + '_label'))
+            else:
+                label = file_key
+            limits = []
+            for suffix in HWMON_LIMITS:
+                file_id = file_key + suffix
+                value = _read_file(os.path.join(chip_path, file_id)) if file_id in present else None
+                limits.append(_parse_int(value))
+            attrs.append(HwmonAttr(file_, label, os.path.join(chip_path, file_), limits))
+        return HwmonChip(os.path.basename(chip_path), f"{name_key}-{symlink}", attrs, alarms)
+
+    def stale(self):
+        """Returns True if chips have been added or removed."""
+        try:
+            return sorted(os.listdir(self.master_path)) != self._folders
+        except OSError:
+            return True
+
+    def sample(self):
+        """Reads every input attribute once into a HwmonData."""
+        records = self.template.copy()
+        for row, (_, attr) in enumerate(self.attrs):
+            try:
+                value = _parse_int(attr.read())
+            except OSError:
+                attr.close()
+                continue
+            if value is not None:
+                records[row]['value'] = value
+                records[row]['valid'] = True
+        return HwmonData([chip.name for chip in self.chips],
+                         [attr.label for _, attr in self.attrs], records)
+
+    def close(self):
+        """Closes every held-open input attribute."""
+        for chip in self.chips:
+            for attr in chip.attrs + chip.alarms:
+                attr.close()
+
+
+class HwmonData():
+    """
+    Numeric snapshot of every hwmon input: one HWMON_DTYPE row per
+    attribute plus the chip names and labels the rows refer to. Values
+    stay raw integers until they are rendered.
+    """
+
+    __slots__ = ('chips', 'labels', 'records')
+
+    def __init__(self, chips, labels, records):
+        self.chips = chips
+        self.labels = labels
+        self.records = records
+
+    def failures(self):
+        """Returns a row mask of valid values outside any of their limits."""
+        value = self.records['value'][:, None]
+        limits = self.records['limits']
+        outside = np.where(HWMON_LIMIT_HIGH, value > limits, value < limits)
+        checked = self.records['valid'] & (self.records['kind'] != KIND_NONE)
+        return checked & (outside & self.records['has_limit']).any(axis=1)
+
+    def rows(self, chip):
+        """Returns {label: row} of one chip, later rows win on duplicate labels."""
+        rows = {}
+        for row in np.flatnonzero(self.records['chip'] == chip):
+            if self.records[row]['valid']:
+                rows[self.labels[row]] = int(row)
+        return rows
+
+    def format_row(self, row):
+        """Formats a row as [value, max, min, crit, lcrit] strings."""
+        record = self.records[row]
+        kind = int(record['kind'])
+        fields = [format_value(kind, int(record['value']))]
+        for limit, present in zip(record['limits'], record['has_limit']):
+            fields.append(format_value(kind, int(limit)) if present else None)
+        return fields
+
+    def to_dict(self):
+        """Returns {chip: {label: [value, max, min, crit, lcrit]}} strings."""
+        return {
+            name: {label: self.format_row(row) for label, row in self.rows(chip).items()}
+            for chip, name in enumerate(self.chips)
+        }
+
+
+class HwmonAlarmWatch():
+    """
+    Watches every *_alarm/*_fault attribute of a HwmonIndex.
+
+    All alarm files sit in one epoll set waiting for POLLPRI, which the
+    kernel raises through sysfs_notify. Files that cannot be registered, or
+    have never notified, are re-read on an adaptive interval that doubles
+    while nothing changes and drops back after a transition.
+    """
+
+    def __init__(self, index, min_interval=ALARM_POLL_MIN, max_interval=ALARM_POLL_MAX):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.epoll = select.epoll()
+        self.alarms = {}
+        self.state = {}
+        self.notifying = set()
+        for chip in index.chips:
+            for alarm in chip.alarms:
+                try:
+                    value = alarm.read()
+                except OSError:
+                    alarm.close()
+                    continue
+                self.alarms[alarm.fd] = (chip, alarm)
+                self.state[alarm.fd] = value
+                try:
+                    self.epoll.register(alarm.fd, select.EPOLLPRI | select.EPOLLERR)
+                except OSError:
+                    # Not pollable (e.g. a regular file), left to the fallback
+                    pass
+
+    def _check(self, fds, timestamp):
+        events = []
+        for fd in fds:
+            chip, alarm = self.alarms[fd]
+            try:
+                value = alarm.read()
+            except OSError:
+                continue
+            if value != self.state[fd]:
+                events.append((timestamp, chip.name, alarm.label, alarm.file, self.state[fd], value))
+                self.state[fd] = value
+        return events
+
+    def wait(self, timeout=None):
+        """
+        Waits up to `timeout` seconds, returns the alarm transitions as
+        (timestamp, chip, label, file, old value, new value).
+        """
+        fallback = [fd for fd in self.alarms if fd not in self.notifying]
+        wait = self.interval if fallback else timeout
+        if timeout is not None and wait is not None:
+            wait = min(wait, timeout)
+        ready = [fd for fd, _ in self.epoll.poll(-1 if wait is None else wait)]
+        timestamp = time.time()
+        self.notifying.update(ready)
+        events = self._check(ready, timestamp)
+        if not ready and fallback:
+            events += self._check(fallback, timestamp)
+            if events:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+        return events
+
+    def close(self):
+        self.epoll.close()
+
+
 class Hwmon():
 
     def __init__(self):
-        self.master_path = '/sys/class/hwmon'
-        self.attributes_list = ["_max", "_min", "_crit", "_lcrit"]
+        self.master_path = HWMON_PATH
+        self.attributes_list = list(HWMON_LIMITS)
+        self._index = None
 
-    def value_format(self, attributes_file, value):
+    @property
+    def index(self):
+        """The chip index, rebuilt when chips come or go."""
+        if self._index is None or self._index.stale():
+            if self._index is not None:
+                self._index.close()
+            self._index = HwmonIndex(self.master_path)
+        return self._index
 
-         # See https://www.kernel.org/doc/Documentation/hwmon/sysfs-interface
-        if attributes_file.lower().startswith('in'):
-            return str(round(int(value) / 1000 ,2)) + ' V'
-        elif attributes_file.lower().startswith('fan'):
-            return value + ' RPM'
-        elif attributes_file.lower().startswith('pwm'):
-            return str(round(int(value) / 255, 2)) + ' PWM (%)'
-        elif attributes_file.lower().startswith('temp'):
-            return str(round(int(value) / 1000, 2)) + ' C'
-        elif attributes_file.lower().startswith('curr'):
-            return str(round(int(value) / 1000, 2)) + ' A'
-        elif attributes_file.lower().startswith('power'):
-            return str(round(int(value) / 1000000, 2)) + ' W'
-        elif attributes_file.lower().startswith('freq'):
-            return str(round(int(value) / 1000000, 2)) + ' MHz'
+    def value_format(self, attributes_file, value):
+        """Formats a raw attribute value with its unit."""
+        return format_value(hwmon_kind(attributes_file), value)
 
     def read_data(self, data_path):
         """Reads data from a file."""
         with open(data_path, 'r') as file:
             return file.read().strip()
 
-    def extract_data(self, sub_folder_path, file_):
-        """Extracts data for a specific sensor attribute."""
-        hwmon_data = [None for _ in range(5)]
-        data = {}
-        idx = 0
-        file_key = file_.split('_')[0]
-
-        if os.path.exists(os.path.join(sub_folder_path, file_key + '_label')):
-            label_name = file_key + '_label'
-            label_name = self.read_data(os.path.join(sub_folder_path, label_name))
-            if '_input_' not in file_:
-                value = self.read_data(os.path.join(sub_folder_path, file_))
-        else:
-            label_name = file_key
-            value = self.read_data(os.path.join(sub_folder_path, file_))
-
-        hwmon_data[idx] = self.value_format(file_, value)
-
-        for file in self.attributes_list:
-            idx += 1
-            file_id = file_key + file
-
-            if os.path.exists(os.path.join(sub_folder_path, file_id)):
-                value = self.read_data(os.path.join(sub_folder_path, file_id))
-                hwmon_data[idx] = self.value_format(file_id, value)
-
-        data[label_name] = hwmon_data
-        return data
-    
     def data(self):
-        """Collects and organizes sensor data."""
-        data = {}
-
-        for folder in os.listdir(self.master_path):
-            sub_folder_path = os.path.join(self.master_path, folder)
-
-            name_key = None
-            if os.path.exists(os.path.join(sub_folder_path, 'name')):
-                name_key = self.read_data(os.path.join(sub_folder_path, 'name'))
-
-            symlink = os.readlink(os.path.join(sub_folder_path, 'device')).strip().split("/")[-1]
-            sensor_name = f"{name_key}-{symlink}"
-            data[sensor_name] = {}
-
-            for file_ in os.listdir(sub_folder_path):
-                if '_input' in file_ or '_average' in file_:
-                    try:
-                        hwmon_data = self.extract_data(sub_folder_path, file_)
-                        data[sensor_name].update(hwmon_data)
-                    except Exception:
-                        pass
-
-            # estimate_w = []
-
-            # for sensor in data.keys():
-
-            #     for value in data[sensor].keys():
-
-            #         if data[sensor][value].endswith("V"):
-
-            #             try:
-            #                 v = float(data[sensor][value].split(" ")[0])
-            #                 i = float(data[sensor]["I" + value[1:]].split(" ")[0])
-            #                 estimate_w.append([sensor, "W" + value[1:] + "*", round(v*i,4)])
-            #             except Exception:
-            #                 pass
-
-            # for value in estimate_w:
-            #     data[value[0]][value[1]] = str(value[2]) + " w"
-
-        return data
-
-    def compare_element(self, list_data):
-        """Compares elements in a list to check for status."""
-        status = True
-        if isinstance(list_data, list):
-            for n in range(len(list_data)):
-                if list_data[n]:
-                    if n % 2 == 0:
-                        if float(list_data[0].split(" ")[0]) < float(list_data[n].split(" ")[0]):
-                            status = False
-                    else:
-                        if float(list_data[0].split(" ")[0]) > float(list_data[n].split(" ")[0]):
-                            status = False
-        return status
+        """Collects sensor data as a numeric HwmonData snapshot."""
+        return self.index.sample()
 
     def print_data_format(self):
         """Prints sensor data in a tabular format."""
         ret = "\033[1;32mPASS\033[00m"
         TABLE_FLAG = "-----------+"
-        dictionary = self.data()
+        data = self.data()
+        failures = data.failures()
         print("+--------" + TABLE_FLAG * 7)
-        if isinstance(dictionary, dict):
-            for key in sorted(dictionary.keys()):
-                indent = 1
+        for chip in sorted(range(len(data.chips)), key=lambda n: data.chips[n]):
+            print("|" + f"{data.chips[chip]:^19}", end="")
+            print("|   Value   | Max Value | Min Value | Crit Max  | Crit Min  |  Status   |")
+            print("+--------" + TABLE_FLAG * 7)
+
+            rows = data.rows(chip)
+            for label in sorted(rows):
+                row = rows[label]
+                print("|", f"{label:^18}", end="")
+                for field in data.format_row(row):
+                    print("|", f"{field:^10}" if field else "-".center(10), end="")
+
                 status = "\033[1;32mPASS\033[00m"
-                print("|" + f"{key:^19}", end="")
-                print("|   Value   | Max Value | Min Value | Crit Max  | Crit Min  |  Status   |")
-                print("+--------" + TABLE_FLAG * 7)
-                
-                if isinstance(dictionary[key], dict):
-                    for key_list in sorted(dictionary[key].keys()):
-                        print("|", f"{key_list:^18}", end="")
-                        for n in range(5):
-                            if dictionary[key][key_list][n]:
-                                print("|", f"{dictionary[key][key_list][n]:^10}", end="")
-                            else:
-                                print("|", "-".center(10), end="")
-
-                        if not self.compare_element(dictionary[key][key_list]):
-                            status = "\033[1;31mFAIL\033[0m"
-                            ret = "\033[1;31mFAIL\033[0m"
-
-                        print("|   ", status, "  |")
-
-                    print("+--------" + TABLE_FLAG * 7)
+                if failures[row]:
+                    status = "\033[1;31mFAIL\033[0m"
+                    ret = "\033[1;31mFAIL\033[0m"
+
+                print("|   ", status, "  |")
+
+            print("+--------" + TABLE_FLAG * 7)
         return ret
-    
+
+    def alarm_watch(self, duration=None):
+        """Prints hwmon alarm transitions until interrupted or `duration` elapses."""
+        watch = HwmonAlarmWatch(self.index)
+        print(f"Watching {len(watch.alarms)} hwmon alarm attributes")
+        end = time.monotonic() + duration if duration else None
+        try:
+            while end is None or time.monotonic() < end:
+                timeout = None if end is None else max(0.0, end - time.monotonic())
+                for timestamp, chip, label, file_, old, new in watch.wait(timeout):
+                    stamp = time.strftime('%F %T', time.localtime(timestamp)) + f"{timestamp % 1:.3f}"[1:]
+                    status = "\033[1;31mALARM\033[0m" if new not in ('0', '') else "\033[1;32mCLEAR\033[00m"
+                    print(f"{stamp}  {chip:<24}{label:<18}{file_:<16}{old} -> {new}  {status}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watch.close()
+
     def hwmon_test(self):
         """sensors hwmon functon"""
         print(
@@ -156,4 +420,17 @@ class Hwmon():
             "                        |  system hwmon Test  |\n"
             "-------------------------------------------------------------------------"
         )
-        return self.print_data_format()
\ No newline at end of file
+        return self.print_data_format()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="hwmon test.")
+    parser.add_argument("--watch", action="store_true", help="watch alarm attributes")
+    parser.add_argument("--duration", type=float, default=None, help="watch duration in seconds")
+    args = parser.parse_args()
+    if args.watch:
+        Hwmon().alarm_watch(args.duration)
+    else:
+        Hwmon().hwmon_test()
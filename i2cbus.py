@@ -1,31 +1,41 @@
 import os
-from fboss_utils import execute_shell_cmd, read_sysfile_value
-from typing import Dict, List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from smbus_pool import get_smbus_pool
+from devmap import get_devmap, DEVMAP_I2C
+from fboss_utils import read_sysfile_value, write_sysfile_value
+from typing import Dict, Iterable, List, Tuple
 
 IOB_PCI_DRIVER="fbiob_pci"
 
 # Constants
-DEVMAP_I2C = "/run/devmap/i2c-busses/"
 I2C_DRV = "/sys/class/i2c-adapter/"
 DEVMAP_XCVR_REST = "/run/devmap/xcvrs"
 RESET_STATUS = {"hold": "0x0", "reset": "0x1"}
 
+# Address range probed by a bus scan (same as i2cdetect -a, minus reserved 0x00-0x02)
+I2C_SCAN_FIRST = 0x03
+I2C_SCAN_LAST = 0x7F
+# Ranges i2cdetect probes with a read byte instead of a quick write (EEPROMs and
+# write-only chips that a quick write could corrupt)
+I2C_READ_PROBE_RANGES = ((0x30, 0x37), (0x50, 0x5F))
+# Addresses no device should answer on (HS-mode master codes), probed by the
+# targeted mode to catch buses that ACK everything
+I2C_SENTINEL_ADDRS = (0x04, 0x07)
+# Upper bound on concurrent bus scans (one per physical master)
+I2C_SCAN_WORKERS = 16
+
 # Colors for output
 FAIL_COLOR = "\033[31m"
 END_COLOR = "\033[0m"
 
 def parse_dev_udev() -> Dict[str, str]:
     """Parses udev information for I2C busses."""
-    devs_dict = {}
-    i2c_udev_list = os.listdir(DEVMAP_I2C)
-    if not i2c_udev_list:
-        return devs_dict  # Return empty dict instead of False
-
-    for dev in i2c_udev_list:
-        file = os.readlink(f"{DEVMAP_I2C}{dev}")
-        devid = os.path.basename(file)
-        devs_dict[dev] = devid
-    return devs_dict
+    return {
+        entry.name: entry.chardev
+        for entry in get_devmap().entries(DEVMAP_I2C)
+        if entry.chardev
+    }
 
 def parse_sort_drv_devices(source_list: List[str]) -> List[Tuple[str, int]]:
     """Sorts I2C driver devices based on master information."""
@@ -51,29 +61,29 @@ def check_drv_udev_status() -> Tuple[bool, str]:
 
     devs_list = parse_sort_drv_devices(i2c_dev_list)
     status = "PASS"
-
+    stat = True
+
+    # Resolve every adapter once: controller device -> i2c-N list
+    adapters: Dict[str, List[str]] = {}
+    for i2cinfo in i2c_dev_list:
+        if not os.path.islink(f"{I2C_DRV}{i2cinfo}"):
+            stat = False
+            status = f"{FAIL_COLOR} FAIL{END_COLOR}\tNo Master device."
+            continue
+        adapter_info = os.readlink(f"{I2C_DRV}{i2cinfo}").split("/")[-2]
+        adapters.setdefault(adapter_info, []).append(i2cinfo)
+
+    udev_map = get_devmap()
     for i2cdev in devs_list:
-        masterid = i2cinfo = udev_info = master_info = "NA"
-        stat = True
         dev_info = f"{IOB_PCI_DRIVER}.{i2cdev[0]}.{i2cdev[1]}"
+        master_info = dev_info.split(".")[1]
+        masterid = master_info.split("_")[0].upper()
 
-        for i2cinfo in i2c_dev_list:
-            if not os.path.islink(f"{I2C_DRV}{i2cinfo}"):
-                stat = False
-                status = f"{FAIL_COLOR} FAIL{END_COLOR}\tNo Master device."
-            adapter_info = os.readlink(f"{I2C_DRV}{i2cinfo}").split("/")[-2]
-            if adapter_info == dev_info:
-                master_info = adapter_info.split(".")[1]
-                masterid = master_info.split("_")[0].upper()
-            else:
-                continue
-
-            devs_dict = parse_dev_udev()
-            for item in devs_dict.items():
-                if item[1] == i2cinfo:
-                    udev_info = item[0]
+        for i2cinfo in adapters.get(dev_info, []):
+            entry = udev_map.reverse(DEVMAP_I2C, i2cinfo)
+            udev_info = entry.name if entry else "NA"
             print(
-                f'  {masterid:<5}{"":2}{i2cinfo:<6}{"":3}{adapter_info:<30}'
+                f'  {masterid:<5}{"":2}{i2cinfo:<6}{"":3}{dev_info:<30}'
                 + f'{"":3}{udev_info:15} {status:<5}  \n',
                 end="",
             )
@@ -82,55 +92,72 @@ def check_drv_udev_status() -> Tuple[bool, str]:
 
 def get_i2c_bus_id(bus_name: str) -> int:
     """Gets the I2C bus ID from the bus name."""
-    busid = -1
-    dev_name = f"{DEVMAP_I2C}{bus_name}"
-    if not os.path.exists(dev_name):
-        return busid
-    chardev = os.readlink(dev_name)
-    if os.path.exists(chardev):
-        bus_info = os.path.basename(chardev)
-        bus_id = bus_info.split("-")
-        busid = int(bus_id[1])  # Convert to integer
-    return busid
+    return get_devmap().i2c_bus_id(bus_name)
 
 def detect_i2c_devices(bus_info: str):
-    """Detects I2C devices on the specified bus."""
-    busid = get_i2c_bus_id(bus_info)
-    cmd = f"i2cdetect -y -a {busid}"
-    os.system(cmd)
+    """Detects I2C devices on the specified bus, printed like i2cdetect -a."""
+    print_i2c_bus(get_i2c_bus_id(bus_info))
+
+def print_i2c_bus(busid: int):
+    """Scans a bus by id and prints it like i2cdetect -a."""
+    try:
+        found = set(scan_i2c_bus(busid, range(0x00, 0x80)))
+    except OSError:
+        print(f"Scan Bus {busid} failed.")
+        return
+    print("     " + "".join(f"{col:>3x}" for col in range(16)))
+    for row in range(0, 0x80, 16):
+        cells = "".join(f" {addr:02x}" if addr in found else " --" for addr in range(row, row + 16))
+        print(f"{row:02x}:{cells}")
+
+def addr_bitmap(addrs: Iterable) -> int:
+    """Packs I2C addresses (ints or hex strings) into a 128-bit bitmap."""
+    bitmap = 0
+    for addr in addrs or ():
+        bitmap |= 1 << (int(addr, 16) if isinstance(addr, str) else addr)
+    return bitmap
+
+def bitmap_addrs(bitmap: int) -> List[int]:
+    """Unpacks an address bitmap into a sorted address list."""
+    return [addr for addr in range(bitmap.bit_length()) if bitmap >> addr & 1]
+
+def compile_i2c_bus_maps(dev_map: Dict[str, List[str]]) -> Dict[str, int]:
+    """Precompiles a *_i2c_bus_map into per-bus address bitmaps."""
+    return {bus_name: addr_bitmap(addrs) for bus_name, addrs in dev_map.items()}
 
 def list_difference(list1: List[str], list2: List[str]) -> bool:
     """Compares two lists of I2C device addresses."""
-    temp1 = [int(item, 16) for item in list1] if list1 else []
-    temp2 = [int(item, 16) for item in list2] if list2 else []
-    return all(i in temp1 for i in temp2) and all(i in temp2 for i in temp1)
-
-def list_i2c_devices(_busid: int) -> List[str]:
+    return addr_bitmap(list1) == addr_bitmap(list2)
+
+def probe_i2c_address(busid: int, addr: int) -> bool:
+    """Probes one address with SMBus quick write or read byte, like i2cdetect."""
+    pool = get_smbus_pool()
+    try:
+        if any(low <= addr <= high for low, high in I2C_READ_PROBE_RANGES):
+            pool.read_byte(busid, addr, force=True)
+        else:
+            pool.write_quick(busid, addr, force=True)
+    except OSError:
+        return False
+    return True
+
+def scan_i2c_bus(busid: int, addresses: Iterable[int] = None) -> List[int]:
+    """Probes addresses on /dev/i2c-<busid> in-process, returns the ones that ACK."""
+    if addresses is None:
+        addresses = range(I2C_SCAN_FIRST, I2C_SCAN_LAST + 1)
+    busid = int(busid)
+    # A missing adapter raises here instead of reading as an empty bus
+    get_smbus_pool().open(busid)
+    return [addr for addr in addresses if probe_i2c_address(busid, addr)]
+
+def list_i2c_devices(_busid: int, addresses: Iterable[int] = None) -> List[str]:
     """Detects devices on the specified I2C bus."""
-    addr_list, devices_list = [], []
-    busid = str(_busid)
-    cmd = f"i2cdetect -y -a {busid}"
-    _, i2cdevs = execute_shell_cmd(cmd)
-    if not _:
-        print(f"Scan Bus {busid} failed.")
-        return addr_list
-
-    for line in i2cdevs.strip().splitlines()[1:]:
-        temp_list = line.split()
-        addr_list += temp_list[1:]
-
-    for addr in range(3, len(addr_list)):
-        if addr_list[addr] != "--":
-            if addr_list[addr] == "UU":
-                cmd = f"i2cget -y -f -a {busid} {hex(addr)}"
-                _, i2cdevs = execute_shell_cmd(cmd)
-                if _:
-                    devices_list.append(hex(addr))
-                else:
-                    print(f"Bus:{busid} dev:{hex(addr)} read failed.")
-            else:
-                devices_list.append(hex(int(addr_list[addr], 16)))
-    return devices_list
+    try:
+        found = scan_i2c_bus(_busid, addresses)
+    except OSError:
+        print(f"Scan Bus {_busid} failed.")
+        return []
+    return [hex(addr) for addr in found]
 
 def get_reset_status(chanid: str) -> str:
     """Gets the reset status of a channel."""
@@ -179,58 +206,101 @@ def read_present_value(platform: str, devid: str) -> str:
     present = value.split("\n")
     return "Yes" if present == "0x1" else "No"
 
-def scan_verify_i2c_bus(platform: str, fpga_type: str, bus_info: str, dev_map: Dict[str, List[str]] = None) -> Tuple[str, str]:
-    """Detects I2C devices and compares them to expected values."""
-    status, reset = "PASS", "No"
-    sta_info = "Scan I2C Buses successful."
-    expect_devs, sdevices = "", ""
-    devices_list, expect_list = [], []
-    chanid = bus_info.split("_")[-1]
+class I2cBusResult:
+    """Outcome of scanning and verifying one I2C bus."""
+
+    def __init__(self, fpga_type: str, bus_info: str):
+        self.fpga_type = fpga_type
+        self.bus_info = bus_info
+        self.chanid = bus_info.split("_")[-1]
+        self.status = "PASS"
+        self.sta_info = "Scan I2C Buses successful."
+        self.bus_id = -1
+        self.present = "No"
+        self.reset = "No"
+        self.devices_list: List[str] = []
+        self.expect_list: List[str] = []
+        self.missing: List[str] = []
+        self.extra: List[str] = []
+        self.latency = 0.0
+
+def verify_i2c_bus(platform: str, fpga_type: str, bus_info: str, dev_map: Dict[str, List[str]] = None,
+                   targeted: bool = False, sentinels: Iterable[int] = I2C_SENTINEL_ADDRS,
+                   expected_bitmap: int = None) -> I2cBusResult:
+    """
+    Detects I2C devices on one bus and compares them to expected values.
+
+    In targeted mode only the expected addresses and `sentinels` are probed
+    instead of the full range.
+    """
+    start = time.perf_counter()
+    result = I2cBusResult(fpga_type, bus_info)
+    chanid = result.chanid
 
     if fpga_type == "DOM":
         devid = bus_info.split("_")[-1]
-        present = read_present_value(platform, devid)
-        if present == "Yes":
+        result.present = read_present_value(platform, devid)
+        if result.present == "Yes":
             ret = enable_reset(devid)
             if ret == "SUCCESS":
-                reset = "Yes"
+                result.reset = "Yes"
 
-    bus_id = get_i2c_bus_id(bus_info)
-    if int(bus_id) >= 0:
-        devices_list = list_i2c_devices(bus_id)
-    else:
-        status = f"{FAIL_COLOR} FAIL{END_COLOR}"
-        sta_info = f"Get Bus [{chanid}] with udev [{bus_info}] failed."
+    if dev_map:
+        result.expect_list = dev_map if fpga_type == "DOM" else dev_map.get(bus_info)
+    if expected_bitmap is None:
+        expected_bitmap = addr_bitmap(result.expect_list)
 
-    if not devices_list:
-        sdevices = "NULL"
+    addresses = None
+    if targeted and result.expect_list:
+        addresses = bitmap_addrs(expected_bitmap | addr_bitmap(sentinels))
+
+    result.bus_id = get_i2c_bus_id(bus_info)
+    if int(result.bus_id) >= 0:
+        result.devices_list = list_i2c_devices(result.bus_id, addresses)
     else:
-        for dev in devices_list:
-            sdevices += "".join([f"{dev} "])
+        result.status = f"{FAIL_COLOR} FAIL{END_COLOR}"
+        result.sta_info = f"Get Bus [{chanid}] with udev [{bus_info}] failed."
 
     if dev_map:
+        check = bool(result.expect_list)
         if fpga_type == "DOM":
-            reset = get_reset_status(devid)
-            expect_list = dev_map
-            if present == "Yes" and reset == "Yes":
-                if not list_difference(devices_list, expect_list):
-                    status = f"{FAIL_COLOR} FAIL{END_COLOR}"
-                    sta_info = "Scan devices not match system."
-        else:
-            expect_list = dev_map.get(bus_info)
-            if expect_list and not list_difference(devices_list, expect_list):
-                status = f"{FAIL_COLOR} FAIL{END_COLOR}"
-                sta_info = "Scan devices not match system."
+            result.reset = get_reset_status(devid)
+            check = result.present == "Yes" and result.reset == "Yes"
+        diff = addr_bitmap(result.devices_list) ^ expected_bitmap
+        if check and diff:
+            result.missing = [hex(addr) for addr in bitmap_addrs(diff & expected_bitmap)]
+            result.extra = [hex(addr) for addr in bitmap_addrs(diff & ~expected_bitmap)]
+            result.status = f"{FAIL_COLOR} FAIL{END_COLOR}"
+            result.sta_info = (
+                f"Scan devices not match system. missing: {result.missing or 'none'},"
+                f" extra: {result.extra or 'none'}"
+            )
 
-    if fpga_type == "DOM":
+    result.latency = time.perf_counter() - start
+    return result
+
+def print_i2c_bus_result(result: I2cBusResult):
+    """Prints one bus scan result as a table row."""
+    expect_devs, sdevices = "", ""
+    status, chanid, bus_id = result.status, result.chanid, result.bus_id
+    bus_info, present, reset = result.bus_info, result.present, result.reset
+    latency = f"({result.latency * 1000:.1f} ms)"
+
+    if not result.devices_list:
+        sdevices = "NULL"
+    else:
+        for dev in result.devices_list:
+            sdevices += "".join([f"{dev} "])
+
+    if result.fpga_type == "DOM":
         print(
             f' {status:>5}  {chanid:>5}  {bus_id:>6}{"":5}{bus_info.ljust(7)}'
             + f'{"":3}{present.ljust(7)} {present.ljust(7)}'
-            + f"{reset.ljust(5)} {sdevices.ljust(1)} \n",
+            + f"{reset.ljust(5)} {sdevices.ljust(1)} {latency}\n",
             end="",
         )
-        if dev_map and expect_list:
-            for test_dev in expect_list:
+        if result.expect_list:
+            for test_dev in result.expect_list:
                 expect_devs += "".join([f"{test_dev} "])
             print(f'{"":56} {expect_devs.ljust(1)}{"[test dev]"} \n', end="")
         else:
@@ -238,24 +308,88 @@ def scan_verify_i2c_bus(platform: str, fpga_type: str, bus_info: str, dev_map: D
     else:
         print(
             f' {status:>5}  {chanid:>5}  {bus_id:>6}{"":5}'
-            + f"{bus_info.ljust(16)}  {sdevices.ljust(1)} \n",
+            + f"{bus_info.ljust(16)}  {sdevices.ljust(1)} {latency}\n",
             end="",
         )
-        if dev_map and expect_list:
-            for test_dev in expect_list:
+        if result.expect_list:
+            for test_dev in result.expect_list:
                 expect_devs += "".join([f"{test_dev} "])
             print(f'{"":43} {expect_devs.ljust(1)}{"[test dev]"} \n', end="")
         else:
             print(f'{"":43} {"[NA]":>4s} {"[test dev]"} \n', end="")
 
-    return status, sta_info
+def scan_verify_i2c_bus(platform: str, fpga_type: str, bus_info: str, dev_map: Dict[str, List[str]] = None) -> Tuple[str, str]:
+    """Detects I2C devices and compares them to expected values."""
+    result = verify_i2c_bus(platform, fpga_type, bus_info, dev_map)
+    print_i2c_bus_result(result)
+    return result.status, result.sta_info
+
+def get_i2c_master(bus_name: str) -> str:
+    """Gets the controller (physical master) behind a devmap bus name."""
+    busid = get_i2c_bus_id(bus_name)
+    if busid < 0:
+        return bus_name
+    try:
+        adapter = os.readlink(f"{I2C_DRV}i2c-{busid}")
+    except OSError:
+        return bus_name
+    # .../<controller>/i2c-N, mux channels hang off their parent adapter
+    parts = adapter.split("/")
+    masters = [p for p in parts[:-1] if "i2c_master" in p]
+    return masters[-1] if masters else parts[-2]
+
+def scan_verify_i2c_buses(platform: str, fpga_type: str, bus_names: List[str], dev_map: Dict[str, List[str]] = None,
+                          max_workers: int = I2C_SCAN_WORKERS, targeted: bool = False,
+                          sentinels: Iterable[int] = I2C_SENTINEL_ADDRS) -> List[I2cBusResult]:
+    """
+    Scans and verifies several I2C buses concurrently.
+
+    Buses are grouped by physical master and each master is scanned by one
+    worker at a time, so independent masters run in parallel while no
+    controller has more than one transfer in flight. Results are printed
+    in the order of `bus_names` once every scan has finished.
+    """
+    if not dev_map:
+        bitmaps = {}
+    elif fpga_type == "DOM":
+        bitmaps = dict.fromkeys(bus_names, addr_bitmap(dev_map))
+    else:
+        bitmaps = compile_i2c_bus_maps(dev_map)
+
+    groups: Dict[str, List[str]] = {}
+    for bus_name in bus_names:
+        groups.setdefault(get_i2c_master(bus_name), []).append(bus_name)
+
+    def scan_master(names: List[str]) -> List[I2cBusResult]:
+        return [
+            verify_i2c_bus(platform, fpga_type, name, dev_map, targeted, sentinels, bitmaps.get(name))
+            for name in names
+        ]
+
+    results: Dict[str, I2cBusResult] = {}
+    workers = max(1, min(max_workers, len(groups)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for group_results in pool.map(scan_master, groups.values()):
+            for result in group_results:
+                results[result.bus_info] = result
+
+    ordered = [results[name] for name in bus_names]
+    for result in ordered:
+        print_i2c_bus_result(result)
+        if result.missing or result.extra:
+            print(f'{"":43} missing: {" ".join(result.missing) or "-"}  extra: {" ".join(result.extra) or "-"}')
+    return ordered
 
 if __name__ == "__main__":
-    # Example usage:
-    platform = "tahan"  # Replace with your actual platform
-    fpga_type = "DOM"  # Replace with your actual FPGA type
-    bus_info = "i2c_bus_1"  # Replace with your actual bus information
-    dev_map = {"i2c_bus_1": ["0x10", "0x12"]}  # Replace with your expected device map
-
-    status, sta_info = scan_verify_i2c_bus(platform, fpga_type, bus_info, dev_map)
-    print(f"Overall Status: {status}, {sta_info}")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="I2C bus scan.")
+    parser.add_argument("buses", nargs="+", help="bus ids or devmap bus names")
+    parser.add_argument("--stats", action="store_true", help="print per-bus SMBus statistics")
+    args = parser.parse_args()
+    for bus in args.buses:
+        busid = int(bus) if bus.isdigit() else get_i2c_bus_id(bus)
+        print(f"Bus {bus} (i2c-{busid}):")
+        print_i2c_bus(busid)
+    if args.stats:
+        get_smbus_pool().print_stats()
@@ -0,0 +1,192 @@
+"""Module providing a persistent BAR0 session for the IOB FPGA."""
+
+import atexit
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Optional
+
+from fboss_utils import get_pci_bdf_info
+
+# Define IOB device ID and paths
+IOB_DEV_ID = "1d9b:0011"
+IOB_RESOURCE0 = "/sys/bus/pci/devices/0000:{}/resource0"
+
+# Register width of the IOB BAR
+REG_WIDTH = 4
+# Registers are little-endian; a native "I" view is only used on hosts
+# with the same byte order
+NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+# Open sessions, keyed by the resolved backing path
+_SESSIONS: Dict[str, "IobBar"] = {}
+
+# IOB resource0 path, looked up once per process
+_IOB_RESOURCE0_PATH: Optional[str] = None
+
+
+class IobBar:
+    """
+    Long-lived mapping of a BAR (or a plain file standing in for one).
+
+    The backing file is opened and mapped once; every accessor works on the
+    shared mapping so a register access costs a single load or store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_SYNC)
+        try:
+            self.size = os.fstat(self._fd).st_size
+            self._mmap = mmap.mmap(
+                self._fd,
+                length=self.size,
+                flags=mmap.MAP_SHARED,
+                access=mmap.ACCESS_DEFAULT,
+            )
+        except (OSError, ValueError):
+            os.close(self._fd)
+            raise
+        self._map_views()
+
+    def _map_views(self):
+        self._view = memoryview(self._mmap)
+        # 32-bit view over the aligned part of the BAR, registers are
+        # accessed as whole words instead of byte copies. The cast uses host
+        # byte order, big-endian hosts go through struct "<I" instead.
+        self._words = None
+        if NATIVE_LITTLE_ENDIAN:
+            self._words = self._view[: self.size - self.size % REG_WIDTH].cast("I")
+
+    @property
+    def closed(self) -> bool:
+        """Returns True once the session has been closed."""
+        return self._mmap is None
+
+    def _check(self, offset: int, length: int):
+        if self._mmap is None:
+            raise ValueError(f"I/O operation on closed BAR session {self.path}")
+        if offset < 0 or offset + length > self.size:
+            raise ValueError(
+                f"Offset {offset:#x} (+{length}) out of range for {self.path}"
+            )
+
+    def read32(self, offset: int) -> int:
+        """Reads a 32-bit little-endian register."""
+        self._check(offset, REG_WIDTH)
+        if offset % REG_WIDTH or self._words is None:
+            return struct.unpack_from("<I", self._mmap, offset)[0]
+        return self._words[offset // REG_WIDTH]
+
+    def write32(self, offset: int, value: int):
+        """Writes a 32-bit little-endian register."""
+        self._check(offset, REG_WIDTH)
+        if offset % REG_WIDTH or self._words is None:
+            struct.pack_into("<I", self._mmap, offset, value & 0xFFFFFFFF)
+        else:
+            self._words[offset // REG_WIDTH] = value & 0xFFFFFFFF
+
+    def read_block(self, offset: int, length: int) -> memoryview:
+        """
+        Returns a zero-copy view of `length` bytes starting at `offset`.
+
+        The view must be released (or dropped) before the session is closed.
+        """
+        self._check(offset, length)
+        return self._view[offset : offset + length]
+
+    def write_block(self, offset: int, data: bytes):
+        """Writes raw bytes starting at `offset`."""
+        self._check(offset, len(data))
+        self._view[offset : offset + len(data)] = data
+
+    def close(self):
+        """
+        Unmaps the BAR and closes the backing file.
+
+        Raises BufferError, leaving the session open and usable, while a
+        view returned by read_block is still held.
+        """
+        if self._mmap is None:
+            return
+        if self._words is not None:
+            self._words.release()
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            self._map_views()
+            raise
+        os.close(self._fd)
+        self._mmap = None
+        key = os.path.realpath(self.path)
+        if _SESSIONS.get(key) is self:
+            del _SESSIONS[key]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        state = "closed" if self.closed else f"{self.size:#x} bytes"
+        return f"IobBar({self.path!r}, {state})"
+
+
+def get_iob_resource0() -> Optional[str]:
+    """Gets the resource0 path of the IOB FPGA."""
+    global _IOB_RESOURCE0_PATH
+    if _IOB_RESOURCE0_PATH is None:
+        fpga_bdf = get_pci_bdf_info(IOB_DEV_ID)
+        if fpga_bdf is None:
+            return None
+        _IOB_RESOURCE0_PATH = IOB_RESOURCE0.format(fpga_bdf)
+    return _IOB_RESOURCE0_PATH
+
+
+def get_iob_bar(path: str = None) -> IobBar:
+    """
+    Returns the process-wide session for `path`, mapping it on first use.
+
+    With no path the IOB FPGA resource0 is looked up, so every module
+    sharing the IOB ends up on the same mapping.
+    """
+    if path is None:
+        path = get_iob_resource0()
+        if path is None:
+            raise FileNotFoundError(f"PCI device {IOB_DEV_ID} not found")
+    key = os.path.realpath(path)
+    bar = _SESSIONS.get(key)
+    if bar is None:
+        bar = IobBar(path)
+        _SESSIONS[key] = bar
+    return bar
+
+
+def close_iob_bars():
+    """Closes every open BAR session, sessions with views still held stay open."""
+    for bar in list(_SESSIONS.values()):
+        try:
+            bar.close()
+        except BufferError:
+            continue
+
+
+atexit.register(close_iob_bars)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Benchmark register reads against a real BAR or a plain backing file
+    bench_path = sys.argv[1] if len(sys.argv) > 1 else get_iob_resource0()
+    loops = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    with IobBar(bench_path) as bench_bar:
+        start = time.perf_counter()
+        for n in range(loops):
+            bench_bar.read32((n * REG_WIDTH) % (bench_bar.size - bench_bar.size % REG_WIDTH))
+        elapsed = time.perf_counter() - start
+    print(f"{loops} reads in {elapsed:.3f}s ({elapsed / loops * 1e9:.0f} ns/read)")
@@ -1,6 +1,11 @@
+import argparse
+import os
 import pathlib
 import subprocess
-from typing import Tuple, Optional
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pci_devices import find_pci_bdf
 
 PASS = "\033[1;32mPASS\033[00m"
 FAILED = "\033[1;31mFAIL\033[0m"
@@ -12,12 +17,72 @@ DEV_INOF = {
     "subsystem_device": "0x0007",
 }
 
-IOB_BDF = "17:00.0"
+IOB_DEV_ID = "1d9b:0011"
 
 PCI_PATH = "/sys/bus/pci/devices/0000:{}"
 
 MSG_FILE_NOT_FOUND = "\u001b[31mFAIL\u001b[0m\t{}File not exist."
 
+# Config space layout
+PCI_STATUS = 0x06
+PCI_STATUS_CAP_LIST = 0x10
+PCI_CAPABILITY_LIST = 0x34
+PCI_CFG_SPACE_SIZE = 0x100
+PCI_CFG_SPACE_EXP_SIZE = 0x1000
+PCI_CAP_ID_EXP = 0x10
+PCI_EXP_LNKCAP = 0x0C
+PCI_EXP_LNKSTA = 0x12
+# Bound on list walks, guards against looping capability pointers
+PCI_CAP_MAX = 48
+
+# Type 0 header fields: name -> (offset, size)
+PCI_HEADER_FIELDS = {
+    "vendor_id": (0x00, 2),
+    "device_id": (0x02, 2),
+    "command": (0x04, 2),
+    "status": (0x06, 2),
+    "revision_id": (0x08, 1),
+    "class_code": (0x09, 3),
+    "cache_line_size": (0x0C, 1),
+    "latency_timer": (0x0D, 1),
+    "header_type": (0x0E, 1),
+    "bar0": (0x10, 4),
+    "bar1": (0x14, 4),
+    "bar2": (0x18, 4),
+    "bar3": (0x1C, 4),
+    "bar4": (0x20, 4),
+    "bar5": (0x24, 4),
+    "subsystem_vendor_id": (0x2C, 2),
+    "subsystem_id": (0x2E, 2),
+    "expansion_rom": (0x30, 4),
+    "capabilities_ptr": (0x34, 1),
+    "interrupt_line": (0x3C, 1),
+    "interrupt_pin": (0x3D, 1),
+}
+
+PCI_CAP_NAMES = {
+    0x01: "Power Management",
+    0x05: "MSI",
+    0x09: "Vendor Specific",
+    0x10: "PCI Express",
+    0x11: "MSI-X",
+}
+
+PCI_EXT_CAP_NAMES = {
+    0x0001: "Advanced Error Reporting",
+    0x0002: "Virtual Channel",
+    0x0003: "Device Serial Number",
+    0x000B: "Vendor Specific",
+    0x000E: "ARI",
+    0x0010: "SR-IOV",
+    0x0019: "Secondary PCI Express",
+    0x0025: "Data Link Feature",
+    0x0026: "Physical Layer 16.0 GT/s",
+}
+
+# Link speed encoding of LNKCAP/LNKSTA
+PCIE_LINK_SPEED = {1: "2.5GT/s", 2: "5GT/s", 3: "8GT/s", 4: "16GT/s", 5: "32GT/s", 6: "64GT/s"}
+
 # Error handling and logging
 # import logging
 # logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -59,28 +124,193 @@ def read_sysfile_value(devfile: str) -> Optional[str]:
     return None
 
 
-def store_config():
-    cmd = f"lspci -s {IOB_BDF} -xxx"
-    status, stdout = execute_shell_cmd(cmd)
-    if not status:
-        # logging.error(f"PCI device with BDF '{IOB_BDF}' not found.")
+def get_iob_bdf() -> Optional[str]:
+    """Gets the BDF of the IOB FPGA."""
+    return find_pci_bdf(IOB_DEV_ID)
+
+
+def config_path(bdf: str) -> str:
+    """Gets the sysfs config space file of a BDF."""
+    return f"{PCI_PATH.format(bdf)}/config"
+
+
+class ConfigReader:
+    """
+    Held-open reader of a device config space.
+
+    Each snapshot is a single pread of the sysfs config file, so the space
+    can be sampled many times per second.
+    """
+
+    def __init__(self, bdf: str, size: int = PCI_CFG_SPACE_EXP_SIZE):
+        self.bdf = bdf
+        self._fd = os.open(config_path(bdf), os.O_RDONLY)
+        self.size = min(size, os.fstat(self._fd).st_size or size)
+
+    def read(self) -> bytes:
+        """Returns the config space as bytes."""
+        return os.pread(self._fd, self.size, 0)
+
+    def close(self):
+        """Closes the config file."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_config_space(bdf: str) -> Optional[bytes]:
+    """Reads the config space of a BDF, None if unavailable."""
+    try:
+        with ConfigReader(bdf) as reader:
+            return reader.read()
+    except OSError:
         return None
 
-    return stdout
 
+def _field(cfg: bytes, offset: int, size: int) -> Optional[int]:
+    if offset + size > len(cfg):
+        return None
+    return int.from_bytes(cfg[offset : offset + size], "little")
 
-def compare_config(stored_config):
-    # read current config data
-    cur_config = store_config()
 
-    if cur_config == stored_config:
-        return True
+def walk_capabilities(cfg: bytes) -> List[Tuple[int, int]]:
+    """Returns (cap_id, offset) of the standard capability list."""
+    caps = []
+    status = _field(cfg, PCI_STATUS, 2)
+    if status is None or not status & PCI_STATUS_CAP_LIST:
+        return caps
+    pos = _field(cfg, PCI_CAPABILITY_LIST, 1) & ~0x3
+    seen = set()
+    while pos >= 0x40 and pos not in seen and len(caps) < PCI_CAP_MAX:
+        if pos + 2 > len(cfg):
+            break
+        seen.add(pos)
+        caps.append((cfg[pos], pos))
+        pos = cfg[pos + 1] & ~0x3
+    return caps
 
-    return False
+
+def walk_ext_capabilities(cfg: bytes) -> List[Tuple[int, int, int]]:
+    """Returns (cap_id, version, offset) of the extended capability list."""
+    caps = []
+    pos = PCI_CFG_SPACE_SIZE
+    seen = set()
+    while pos >= PCI_CFG_SPACE_SIZE and pos not in seen and pos + 4 <= len(cfg):
+        header = _field(cfg, pos, 4)
+        if header in (0, 0xFFFFFFFF):
+            break
+        seen.add(pos)
+        caps.append((header & 0xFFFF, (header >> 16) & 0xF, pos))
+        pos = (header >> 20) & ~0x3
+    return caps
+
+
+def find_capability(cfg: bytes, cap_id: int) -> Optional[int]:
+    """Returns the offset of a standard capability, None if absent."""
+    for cid, pos in walk_capabilities(cfg):
+        if cid == cap_id:
+            return pos
+    return None
 
 
-def compare_data(sys_file, data):
-    vendor_file = PCI_PATH.format(IOB_BDF)
+def config_fields(cfg: bytes) -> Dict[str, Tuple[int, int]]:
+    """
+    Returns the named fields of a config space: name -> (offset, size).
+
+    Covers the type 0 header, one field per capability header and the PCIe
+    link registers.
+    """
+    fields = dict(PCI_HEADER_FIELDS)
+    for cap_id, pos in walk_capabilities(cfg):
+        name = PCI_CAP_NAMES.get(cap_id, f"cap_{cap_id:02x}")
+        fields[f"{name}@{pos:#x}"] = (pos, 2)
+        if cap_id == PCI_CAP_ID_EXP:
+            fields["link_capabilities"] = (pos + PCI_EXP_LNKCAP, 4)
+            fields["link_control"] = (pos + 0x10, 2)
+            fields["link_status"] = (pos + PCI_EXP_LNKSTA, 2)
+    for cap_id, _, pos in walk_ext_capabilities(cfg):
+        name = PCI_EXT_CAP_NAMES.get(cap_id, f"ext_cap_{cap_id:04x}")
+        fields[f"{name}@{pos:#x}"] = (pos, 4)
+    return fields
+
+
+def diff_config(baseline: bytes, current: bytes) -> Tuple[List[Tuple[int, int]], Dict[str, Tuple[int, int]]]:
+    """
+    Compares two config space snapshots.
+
+    Returns the differing byte ranges as [start, end) pairs and the changed
+    named fields as name -> (baseline value, current value).
+    """
+    if baseline == current:
+        return [], {}
+    length = min(len(baseline), len(current))
+    ranges = []
+    start = None
+    for pos in range(length):
+        if baseline[pos] != current[pos]:
+            if start is None:
+                start = pos
+        elif start is not None:
+            ranges.append((start, pos))
+            start = None
+    if start is not None:
+        ranges.append((start, length))
+    if len(baseline) != len(current):
+        ranges.append((length, max(len(baseline), len(current))))
+
+    fields = {}
+    if ranges:
+        for name, (offset, size) in config_fields(baseline).items():
+            old, new = _field(baseline, offset, size), _field(current, offset, size)
+            if old != new:
+                fields[name] = (old, new)
+    return ranges, fields
+
+
+def pcie_link_status(cfg: bytes) -> Optional[Dict[str, str]]:
+    """Returns current and maximum PCIe link speed and width."""
+    pos = find_capability(cfg, PCI_CAP_ID_EXP)
+    if pos is None:
+        return None
+    lnkcap = _field(cfg, pos + PCI_EXP_LNKCAP, 4)
+    lnksta = _field(cfg, pos + PCI_EXP_LNKSTA, 2)
+    if lnkcap is None or lnksta is None:
+        return None
+    return {
+        "speed": PCIE_LINK_SPEED.get(lnksta & 0xF, "unknown"),
+        "width": f"x{(lnksta >> 4) & 0x3F}",
+        "max_speed": PCIE_LINK_SPEED.get(lnkcap & 0xF, "unknown"),
+        "max_width": f"x{(lnkcap >> 4) & 0x3F}",
+    }
+
+
+def store_config(bdf: str = None) -> Optional[bytes]:
+    bdf = bdf or get_iob_bdf()
+    if bdf is None:
+        # logging.error(f"PCI device '{IOB_DEV_ID}' not found.")
+        return None
+
+    return read_config_space(bdf)
+
+
+def compare_config(stored_config, bdf: str = None):
+    # read current config data
+    cur_config = store_config(bdf)
+    if cur_config is None or stored_config is None:
+        return False
+
+    ranges, _ = diff_config(stored_config, cur_config)
+    return not ranges
+
+
+def compare_data(sys_file, data, bdf: str = None):
+    vendor_file = PCI_PATH.format(bdf or get_iob_bdf())
     vendor_id = read_sysfile_value(f"{vendor_file}/{sys_file}")
     if vendor_id == data:
         return True
@@ -88,26 +318,99 @@ def compare_data(sys_file, data):
     return False
 
 
+def watch_config(baseline: bytes, bdf: str, rate: float = 100, duration: float = 10):
+    """
+    Snapshots the config space at `rate` Hz and reports every change
+    against the baseline. Returns the number of corrupted snapshots.
+    """
+    period = 1.0 / rate
+    errors = snapshots = 0
+    with ConfigReader(bdf, len(baseline)) as reader:
+        deadline = time.perf_counter()
+        end = deadline + duration
+        while deadline < end:
+            cur_config = reader.read()
+            snapshots += 1
+            ranges, fields = diff_config(baseline, cur_config)
+            if ranges:
+                errors += 1
+                stamp = time.strftime("%H:%M:%S")
+                spans = ", ".join(f"{s:#05x}-{e - 1:#05x}" for s, e in ranges)
+                print(f"{stamp} {FAILED} config changed at [{spans}] {fields}")
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    print(f"Config snapshots: {snapshots}, corrupted: {errors}")
+    return errors
+
+
+def print_config_report(cfg: bytes):
+    """Prints the capability lists and link status of a config space."""
+    print("Capabilities:")
+    for cap_id, pos in walk_capabilities(cfg):
+        print(f'{"":4}[{pos:#05x}] {PCI_CAP_NAMES.get(cap_id, "Unknown")} ({cap_id:#04x})')
+    for cap_id, ver, pos in walk_ext_capabilities(cfg):
+        print(f'{"":4}[{pos:#05x}] {PCI_EXT_CAP_NAMES.get(cap_id, "Unknown")} ({cap_id:#06x} v{ver})')
+    link = pcie_link_status(cfg)
+    if link:
+        print(
+            f"PCIe link: {link['speed']} {link['width']} "
+            f"(capable {link['max_speed']} {link['max_width']})"
+        )
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FPGA PCI config test.")
+    parser.add_argument("--bdf", default=None, help="device BDF, IOB FPGA by default")
+    parser.add_argument("--baseline", default=None, help="compare against a saved config file")
+    parser.add_argument("--save", default=None, help="save the current config to a file")
+    parser.add_argument("--watch", type=float, default=0, help="watch for changes for N seconds")
+    parser.add_argument("--rate", type=float, default=100, help="watch snapshot rate in Hz")
+    args = parser.parse_args()
+
     print(
         "-------------------------------------------------------------------------\n"
         "                        |  FPGA Config Test  |\n"
         "-------------------------------------------------------------------------"
     )
+    iob_bdf = args.bdf or get_iob_bdf()
+    if iob_bdf is None:
+        print(f"{FAILED}\tPCI device {IOB_DEV_ID} not found.")
+        raise SystemExit(1)
+
     # save the config data
-    iob_config = store_config()
-    stat = compare_config(iob_config)
-    print(iob_config)
+    if args.baseline:
+        with open(args.baseline, "rb") as fd:
+            iob_config = fd.read()
+    else:
+        iob_config = store_config(iob_bdf)
+    if iob_config is None:
+        print(f"{FAILED}\tCannot read config space of {iob_bdf}.")
+        raise SystemExit(1)
+    if args.save:
+        with open(args.save, "wb") as fd:
+            fd.write(iob_config)
+
+    cur_config = store_config(iob_bdf)
+    diff_ranges, diff_fields = diff_config(iob_config, cur_config)
+    print(f"Device {iob_bdf}, {len(cur_config)} bytes of config space")
+    print_config_report(cur_config)
     print("-------------------------------------------------------------------------")
-    config_status = PASS if stat else FAILED
+    config_status = PASS if not diff_ranges else FAILED
     print("PCI Config raw data compared: ", config_status)
+    for name, (old, new) in diff_fields.items():
+        print(f'{"":4}{name:<32} {old!s:>12} -> {new!s:<12}')
     print(
         "----------------------+------------+-----------\n"
         "     Test items       |    Value   |  Status\n"
         "----------------------+------------+-----------"
     )
     for k, v in DEV_INOF.items():
-        stat = compare_data(k, v)
+        stat = compare_data(k, v, iob_bdf)
         data_status = PASS if stat else FAILED
         print(f'{"":4}{k:<18}{"|":<4}{v:<7}{"":>2}{"|":<3}{data_status}')
-        print("----------------------+------------+-----------")
\ No newline at end of file
+        print("----------------------+------------+-----------")
+
+    if args.watch:
+        watch_config(iob_config, iob_bdf, args.rate, args.watch)
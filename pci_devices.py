@@ -0,0 +1,219 @@
+"""Module providing sysfs based PCI device discovery."""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+# Define sysfs paths
+SYSFS_PCI_ROOT = "/sys/bus/pci/devices"
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+# Per-boot index cache, /run is cleared on reboot but still checked by boot id
+PCI_INDEX_CACHE = "/run/fboss_cit/pci_index.json"
+
+PCI_ID_ATTRS = ("vendor", "device", "subsystem_vendor", "subsystem_device")
+
+# Indexes built in this process, keyed by sysfs root
+_INDEXES: Dict[str, "PciIndex"] = {}
+
+
+def read_boot_id(boot_id_file: str = BOOT_ID_FILE) -> str:
+    """Reads the kernel boot id, empty if unavailable."""
+    try:
+        with open(boot_id_file, "r", encoding="utf-8") as fd:
+            return fd.read().strip()
+    except OSError:
+        return ""
+
+
+class PciDevice:
+    """A PCI function as seen in sysfs."""
+
+    __slots__ = ("bdf", "vendor", "device", "subsystem_vendor", "subsystem_device")
+
+    def __init__(self, bdf, vendor, device, subsystem_vendor="", subsystem_device=""):
+        self.bdf = bdf
+        self.vendor = vendor
+        self.device = device
+        self.subsystem_vendor = subsystem_vendor
+        self.subsystem_device = subsystem_device
+
+    @property
+    def dev_id(self) -> str:
+        """vendor:device in lspci -n notation, e.g. 1d9b:0011."""
+        return f"{self.vendor}:{self.device}"
+
+    @property
+    def short_bdf(self) -> str:
+        """BDF as printed by lspci, domain dropped when it is 0000."""
+        domain, _, rest = self.bdf.partition(":")
+        return rest if domain == "0000" else self.bdf
+
+    def to_dict(self) -> Dict[str, str]:
+        """Returns the device as a plain dictionary."""
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+    def __repr__(self):
+        return f"PciDevice({self.bdf} {self.dev_id})"
+
+
+def _read_id(dev_path: str, attr: str) -> str:
+    try:
+        with open(os.path.join(dev_path, attr), "r", encoding="utf-8") as fd:
+            value = fd.read().strip()
+    except OSError:
+        return ""
+    return value[2:] if value.startswith("0x") else value
+
+
+class PciIndex:
+    """
+    Index of the PCI devices under a sysfs root, by vendor:device.
+
+    The index is built once per boot: an on-disk cache tagged with the boot
+    id is reused if it matches, otherwise the sysfs tree is scanned. Hits
+    are checked against sysfs before they are returned. The first lookup
+    that misses or hits a device gone from sysfs rescans (and rewrites the
+    cache), so devices that appear or move later in the boot, after a
+    rescan or an FPGA reload, are still found; later misses do not rescan
+    again in the same process.
+    """
+
+    def __init__(self, sysfs_root: str = SYSFS_PCI_ROOT, boot_id: str = None, cache_file: str = None):
+        self.sysfs_root = sysfs_root
+        self.boot_id = read_boot_id() if boot_id is None else boot_id
+        self.cache_file = cache_file
+        self.devices: List[PciDevice] = []
+        self._by_id: Dict[str, List[PciDevice]] = {}
+        self._by_bdf: Dict[str, PciDevice] = {}
+        self._rescanned = False
+        if not self._load_cache():
+            self.refresh()
+
+    def refresh(self):
+        """Rescans sysfs and rewrites the per-boot cache."""
+        self.scan()
+        self._store_cache()
+
+    def scan(self):
+        """Scans the sysfs tree and rebuilds the index."""
+        devices = []
+        try:
+            entries = sorted(os.scandir(self.sysfs_root), key=lambda e: e.name)
+        except OSError:
+            entries = []
+        for entry in entries:
+            ids = [_read_id(entry.path, attr) for attr in PCI_ID_ATTRS]
+            devices.append(PciDevice(entry.name, *ids))
+        self._build(devices)
+
+    def _build(self, devices: List[PciDevice]):
+        self.devices = devices
+        self._by_id = {}
+        self._by_bdf = {}
+        for dev in devices:
+            self._by_id.setdefault(dev.dev_id, []).append(dev)
+            self._by_bdf[dev.bdf] = dev
+
+    def _load_cache(self) -> bool:
+        if not self.cache_file or not self.boot_id:
+            return False
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as fd:
+                cache = json.load(fd)
+        except (OSError, ValueError):
+            return False
+        if cache.get("boot_id") != self.boot_id or cache.get("sysfs_root") != self.sysfs_root:
+            return False
+        try:
+            self._build([PciDevice(**dev) for dev in cache["devices"]])
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def _store_cache(self):
+        if not self.cache_file or not self.boot_id:
+            return
+        cache = {
+            "boot_id": self.boot_id,
+            "sysfs_root": self.sysfs_root,
+            "devices": [dev.to_dict() for dev in self.devices],
+        }
+        tmp_file = f"{self.cache_file}.{os.getpid()}"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as fd:
+                json.dump(cache, fd)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def _present(self, dev: Optional[PciDevice]) -> bool:
+        return dev is not None and os.path.exists(self.device_path(dev))
+
+    def _rescan_once(self) -> bool:
+        """Rescans sysfs on the first miss of this process, False after that."""
+        if self._rescanned:
+            return False
+        self._rescanned = True
+        self.refresh()
+        return True
+
+    def find(self, dev_id: str) -> List[PciDevice]:
+        """Returns all devices matching vendor:device (e.g. 1d9b:0011)."""
+        dev_id = dev_id.lower()
+        devs = self._by_id.get(dev_id, [])
+        if (not devs or not all(map(self._present, devs))) and self._rescan_once():
+            devs = self._by_id.get(dev_id, [])
+        return [dev for dev in devs if self._present(dev)]
+
+    def first(self, dev_id: str) -> Optional[PciDevice]:
+        """Returns the first device matching vendor:device, or None."""
+        devs = self.find(dev_id)
+        return devs[0] if devs else None
+
+    def get(self, bdf: str) -> Optional[PciDevice]:
+        """Returns the device at a BDF, with or without the domain."""
+        if bdf.count(":") == 1:
+            bdf = f"0000:{bdf}"
+        dev = self._by_bdf.get(bdf)
+        if not self._present(dev) and self._rescan_once():
+            dev = self._by_bdf.get(bdf)
+        return dev if self._present(dev) else None
+
+    def device_path(self, dev: PciDevice) -> str:
+        """Returns the sysfs directory of a device."""
+        return os.path.join(self.sysfs_root, dev.bdf)
+
+
+def get_pci_index(sysfs_root: str = SYSFS_PCI_ROOT, refresh: bool = False) -> PciIndex:
+    """
+    Returns the memoized PCI index for a sysfs root.
+
+    Only the default root uses the per-boot cache file, fake trees used for
+    testing are always scanned.
+    """
+    index = _INDEXES.get(sysfs_root)
+    if index is None:
+        cache_file = PCI_INDEX_CACHE if sysfs_root == SYSFS_PCI_ROOT else None
+        index = PciIndex(sysfs_root, cache_file=cache_file)
+        _INDEXES[sysfs_root] = index
+    elif refresh:
+        index.refresh()
+    return index
+
+
+def find_pci_bdf(dev_id: str, sysfs_root: str = SYSFS_PCI_ROOT) -> Optional[str]:
+    """Returns the lspci style BDF of the first vendor:device match."""
+    dev = get_pci_index(sysfs_root).first(dev_id)
+    return dev.short_bdf if dev else None
+
+
+if __name__ == "__main__":
+    import sys
+
+    root = sys.argv[1] if len(sys.argv) > 1 else SYSFS_PCI_ROOT
+    for pci_dev in get_pci_index(root).devices:
+        print(
+            f"{pci_dev.short_bdf:<14}{pci_dev.dev_id:<12}"
+            f"{pci_dev.subsystem_vendor}:{pci_dev.subsystem_device}"
+        )
@@ -0,0 +1,109 @@
+"""Module providing a preallocated ring buffer of timestamped samples."""
+
+import warnings
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated ring buffer of (timestamp, value) samples.
+
+    With `channels` set every sample is a row of that many values, else a
+    single value. Min/max/mean of the buffered window are kept up to date
+    on append: the sum is adjusted by the sample in and the sample out, and
+    min/max are only rescanned when the overwritten sample was the extreme.
+    NaN samples are left out of the statistics.
+    """
+
+    def __init__(self, capacity: int, channels: Optional[int] = None, dtype=np.float64):
+        self.capacity = capacity
+        self.channels = channels
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        shape = (capacity,) if channels is None else (capacity, channels)
+        self.values = np.zeros(shape, dtype=dtype)
+        self.count = 0
+        width = 1 if channels is None else channels
+        self._sum = np.zeros(width, dtype=np.float64)
+        self._valid = np.zeros(width, dtype=np.int64)
+        self._min = np.full(width, np.inf)
+        self._max = np.full(width, -np.inf)
+        self._rescan = False
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp: float, value: Union[float, Sequence]):
+        """Stores one sample, overwriting the oldest when full."""
+        idx = self.count % self.capacity
+        if self.count >= self.capacity:
+            old = self.values[idx].reshape(-1).astype(np.float64)
+            known = ~np.isnan(old)
+            self._sum -= np.where(known, old, 0.0)
+            self._valid -= known
+            if np.any(known & ((old <= self._min) | (old >= self._max))):
+                self._rescan = True
+        self.timestamps[idx] = timestamp
+        self.values[idx] = value
+        self.count += 1
+        new = self.values[idx].reshape(-1).astype(np.float64)
+        known = ~np.isnan(new)
+        self._sum += np.where(known, new, 0.0)
+        self._valid += known
+        self._min = np.fmin(self._min, new)
+        self._max = np.fmax(self._max, new)
+
+    def window(self, since: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the samples newer than `since`, oldest first."""
+        if self.count <= self.capacity:
+            ts, vals = self.timestamps[: self.count], self.values[: self.count]
+        else:
+            idx = self.count % self.capacity
+            order = np.r_[idx : self.capacity, 0:idx]
+            ts, vals = self.timestamps[order], self.values[order]
+        if since:
+            keep = ts > since
+            ts, vals = ts[keep], vals[keep]
+        return ts, vals
+
+    def _rescan_window(self):
+        _, vals = self.window()
+        vals = vals.reshape(len(vals), len(self._sum)).astype(np.float64)
+        known = ~np.isnan(vals)
+        self._sum = np.where(known, vals, 0.0).sum(axis=0)
+        self._valid = known.sum(axis=0)
+        self._min = np.fmin.reduce(vals, axis=0, initial=np.inf)
+        self._max = np.fmax.reduce(vals, axis=0, initial=-np.inf)
+        self._rescan = False
+
+    def stats(self, percentiles: Sequence[float] = ()) -> Dict[str, np.ndarray]:
+        """
+        Returns min/max/mean of the buffered window, NaN where there is no
+        valid sample. Percentiles sort the window, so they are only computed
+        when asked for, as "p<percentile>" entries.
+        """
+        if self._rescan:
+            self._rescan_window()
+        empty = self._valid == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = {
+                "min": np.where(empty, np.nan, self._min),
+                "max": np.where(empty, np.nan, self._max),
+                "mean": np.where(empty, np.nan, self._sum / self._valid),
+            }
+        if len(percentiles):
+            _, vals = self.window()
+            vals = vals.reshape(len(vals), len(self._sum)).astype(np.float64)
+            if len(vals) and not empty.all():
+                with warnings.catch_warnings():
+                    # All-NaN channels give NaN
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    pct = np.nanpercentile(vals, percentiles, axis=0)
+            else:
+                pct = np.full((len(percentiles), vals.shape[1]), np.nan)
+            for p, row in zip(percentiles, pct):
+                result[f"p{p:g}"] = row
+        if self.channels is None:
+            return {k: float(v[0]) for k, v in result.items()}
+        return result
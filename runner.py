@@ -5,7 +5,7 @@ import argparse
 import os
 import sys
 from fboss import Fboss
-from xadc import test_iob_xadc
+from xadc import test_iob_xadc, xadc_monitor
 from xcvr import XcvrManager
 from leds import port_led_status_test, port_led_loop_test
 from hwmon import Hwmon
@@ -61,11 +61,13 @@ command list:
     iob_version
     iob_info
     iob_xadc
+    iob_xadc_monitor
     spi_udev
     spi_detect
     gpio
     i2c_udev
     i2c_detect
+    i2c_quick
     i2c_buses
     port_led
     loop_leds
@@ -114,6 +116,10 @@ class TestFboss(unittest.TestCase):
         """Tests the IOB XADC registers."""
         test_iob_xadc()
 
+    def test_iob_xadc_monitor(self):
+        """Samples the IOB XADC registers continuously for 10 seconds."""
+        xadc_monitor(duration=10)
+
     def test_spi_udev(self):
         """Test SPI bus udev."""
         self.fboss.spi_bus_udev_test()
@@ -131,6 +137,11 @@ class TestFboss(unittest.TestCase):
         self.fboss.detect_iob_i2c_buses()
         self.fboss.detect_doms_i2c_buses()
 
+    def test_i2c_quick(self):
+        """Test I2C buses probing only the expected addresses."""
+        self.fboss.detect_iob_i2c_buses(targeted=True)
+        self.fboss.detect_doms_i2c_buses(targeted=True)
+
     def test_i2c_buses(self):
         """Test I2C device detection."""
         self.fboss.detect_i2c_devices()
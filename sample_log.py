@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+"""Module providing an append-only binary log of sensor samples."""
+
+import argparse
+import json
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Default log location and limits
+SAMPLE_LOG_DIR = "/var/log/fboss_cit/samples"
+SEGMENT_BYTES = 64 * 1024 * 1024
+RETENTION_BYTES = 1024 * 1024 * 1024
+
+# Segment layout: header (magic, version, base time, names length, records
+# offset), JSON list of sample names, records. Timestamps are monotonic
+# clock milliseconds from the segment base time, so they never step back
+# with the wall clock and a segment spans < 49 days.
+SEGMENT_MAGIC = b"FSLG"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct("<4sH2xdII")
+SEGMENT_ALIGN = 16
+SEGMENT_PATTERN = "samples-{:013d}.seg"
+SEGMENT_MAX_MS = 0xFFFFFFFF
+
+RECORD_DTYPE = np.dtype([("ts_ms", "<u4"), ("index", "<u2"), ("raw", "<i4")])
+RAW_MIN = np.iinfo(np.int32).min
+RAW_MAX = np.iinfo(np.int32).max
+
+
+def _segment_header(base_time: float, names: Sequence[str]) -> bytes:
+    names_blob = json.dumps(list(names)).encode()
+    size = SEGMENT_HEADER.size + len(names_blob)
+    padding = -size % SEGMENT_ALIGN
+    header = SEGMENT_HEADER.pack(
+        SEGMENT_MAGIC, SEGMENT_VERSION, base_time, len(names_blob), size + padding
+    )
+    return header + names_blob + b" " * padding
+
+
+class Segment:
+    """
+    Read-only view of one segment file.
+
+    Records are memory mapped as a NumPy structured array, nothing is
+    parsed beyond the header.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as fd:
+            head = fd.read(SEGMENT_HEADER.size)
+            magic, version, self.base_time, names_len, self.offset = SEGMENT_HEADER.unpack(head)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                raise ValueError(f"{path} is not a sample log segment")
+            self.names: List[str] = json.loads(fd.read(names_len))
+        self.index = {name: idx for idx, name in enumerate(self.names)}
+        count = (os.path.getsize(path) - self.offset) // RECORD_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=self.offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def end_time(self) -> float:
+        """Timestamp of the last record, the base time if empty."""
+        if not len(self.records):
+            return self.base_time
+        return self.base_time + int(self.records["ts_ms"][-1]) / 1000.0
+
+    def select(self, name: str, start: float = None, end: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (timestamps, raw values) of one name within [start, end)."""
+        idx = self.index.get(name)
+        if idx is None or not len(self.records):
+            return np.zeros(0), np.zeros(0, dtype=np.int32)
+        ts_ms = self.records["ts_ms"]
+        lo = 0 if start is None else np.searchsorted(ts_ms, max(0.0, (start - self.base_time) * 1000.0))
+        hi = len(ts_ms) if end is None else np.searchsorted(ts_ms, max(0.0, (end - self.base_time) * 1000.0))
+        records = self.records[lo:hi]
+        records = records[records["index"] == idx]
+        return self.base_time + records["ts_ms"] / 1000.0, records["raw"].astype(np.int32)
+
+
+class SampleLog:
+    """
+    Append-only writer of fixed-width (timestamp, index, raw) records.
+
+    A new segment is started when the current one reaches `segment_bytes`
+    or would overflow its millisecond timestamps. Old segments are deleted
+    to keep the directory under `retention_bytes`. Values that are not
+    integers in the <i4 range are not stored; they are counted per name in
+    `rejected`.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        directory: str = SAMPLE_LOG_DIR,
+        segment_bytes: int = SEGMENT_BYTES,
+        retention_bytes: int = RETENTION_BYTES,
+    ):
+        if len(names) > np.iinfo(RECORD_DTYPE["index"]).max:
+            raise ValueError(f"Too many sample names: {len(names)}")
+        self.names = list(names)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention_bytes = retention_bytes
+        self.path: Optional[str] = None
+        self._fd: Optional[int] = None
+        self._base_time = 0.0
+        self._base_mono = 0.0
+        self._last_ms = 0
+        self._size = 0
+        self.rejected = np.zeros(len(self.names), dtype=np.int64)
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self, mono: float):
+        self.close()
+        base_time = time.time() - (time.monotonic() - mono)
+        self._base_time = base_time
+        self._base_mono = mono
+        self._last_ms = 0
+        self.path = os.path.join(self.directory, SEGMENT_PATTERN.format(int(base_time * 1000)))
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        header = _segment_header(base_time, self.names)
+        os.write(self._fd, header)
+        self._size = len(header)
+        self.enforce_retention()
+
+    def append(self, raw, indices=None, mono: float = None):
+        """
+        Appends one sweep: raw values of `indices` (default all names) read
+        at time.monotonic() `mono` (default now). NaN values are skipped.
+        Written with a single write.
+
+        Returns the indices of values rejected as fractional or out of range.
+        """
+        raw = np.asarray(raw, dtype=np.float64)
+        indices = np.arange(len(raw)) if indices is None else np.asarray(indices)
+        present = ~np.isnan(raw)
+        with np.errstate(invalid="ignore"):
+            fits = (raw >= RAW_MIN) & (raw <= RAW_MAX) & (raw == np.trunc(raw))
+        rejected = indices[present & ~fits]
+        if len(rejected):
+            np.add.at(self.rejected, rejected, 1)
+        valid = present & fits
+        if not valid.any():
+            return rejected
+        if mono is None:
+            mono = time.monotonic()
+        if (
+            self._fd is None
+            or self._size >= self.segment_bytes
+            or (mono - self._base_mono) * 1000.0 > SEGMENT_MAX_MS
+        ):
+            self._open_segment(mono)
+        # Records stay sorted by time, select() bisects on ts_ms
+        self._last_ms = max(self._last_ms, int((mono - self._base_mono) * 1000.0))
+        records = np.empty(int(valid.sum()), dtype=RECORD_DTYPE)
+        records["ts_ms"] = self._last_ms
+        records["index"] = indices[valid]
+        records["raw"] = raw[valid]
+        data = records.tobytes()
+        os.write(self._fd, data)
+        self._size += len(data)
+        return rejected
+
+    def enforce_retention(self):
+        """Deletes the oldest segments until the log fits its retention."""
+        segments = list_segments(self.directory)
+        sizes = [os.path.getsize(path) for path in segments]
+        total = sum(sizes)
+        for path, size in zip(segments, sizes):
+            if total <= self.retention_bytes or path == self.path:
+                break
+            os.unlink(path)
+            total -= size
+
+    def close(self):
+        """Closes the current segment."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def list_segments(directory: str = SAMPLE_LOG_DIR) -> List[str]:
+    """Returns the segment files of a log, oldest first."""
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.startswith("samples-") and n.endswith(".seg"))
+    except OSError:
+        return []
+    return [os.path.join(directory, n) for n in names]
+
+
+class SampleLogReader:
+    """Range queries over every segment of a log directory."""
+
+    def __init__(self, directory: str = SAMPLE_LOG_DIR):
+        self.directory = directory
+        self.segments: List[Segment] = []
+        self.refresh()
+
+    def refresh(self):
+        """Maps the current segments again, picking up new records."""
+        self.segments = []
+        for path in list_segments(self.directory):
+            try:
+                self.segments.append(Segment(path))
+            except (OSError, ValueError, struct.error):
+                continue
+
+    def names(self) -> List[str]:
+        """Returns every sample name found in the log."""
+        seen: Dict[str, None] = {}
+        for segment in self.segments:
+            seen.update(dict.fromkeys(segment.names))
+        return list(seen)
+
+    def query(self, name: str, start: float = None, end: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (timestamps, raw values) of one name within [start, end)."""
+        ts_parts, raw_parts = [], []
+        for segment in self.segments:
+            if start is not None and segment.end_time < start:
+                continue
+            if end is not None and segment.base_time >= end:
+                continue
+            ts, raw = segment.select(name, start, end)
+            ts_parts.append(ts)
+            raw_parts.append(raw)
+        if not ts_parts:
+            return np.zeros(0), np.zeros(0, dtype=np.int32)
+        return np.concatenate(ts_parts), np.concatenate(raw_parts)
+
+    def downsample(self, name: str, bucket: float, start: float = None, end: float = None):
+        """
+        Returns (bucket start, min, max, mean) arrays of one name, with
+        samples grouped in `bucket` second intervals.
+        """
+        ts, raw = self.query(name, start, end)
+        if not len(ts):
+            empty = np.zeros(0)
+            return empty, empty, empty, empty
+        origin = ts[0] if start is None else start
+        buckets = np.floor((ts - origin) / bucket).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        values = raw.astype(np.float64)
+        counts = np.diff(np.r_[starts, len(values)])
+        return (
+            origin + buckets[starts] * bucket,
+            np.minimum.reduceat(values, starts),
+            np.maximum.reduceat(values, starts),
+            np.add.reduceat(values, starts) / counts,
+        )
+
+
+def hwmon_sample_names(index) -> List[str]:
+    """Returns the sample names of the rows of a HwmonIndex, chip/attribute."""
+    return [f"{index.chips[chip].name}/{attr.file}" for chip, attr in index.attrs]
+
+
+def hwmon_raw(data) -> np.ndarray:
+    """Returns the raw values of a HwmonData, NaN where a read failed."""
+    return np.where(data.records["valid"], data.records["value"], np.nan)
+
+
+def record_sensors(directory: str = SAMPLE_LOG_DIR, config_file: str = None,
+                   interval: float = 1.0, duration: float = None, hwmon: bool = False):
+    """
+    Records every sensor of the catalog and, with `hwmon`, every hwmon
+    input at `interval` seconds. A new segment is started when hwmon chips
+    come or go, since the sample names change.
+    """
+    from hwmon import HwmonIndex
+    from sensors import SensorPoller, get_sensor_config_file, read_config_file, resolve_sensor_paths
+
+    sensors = resolve_sensor_paths(read_config_file(config_file or get_sensor_config_file()))
+    poller = SensorPoller(sensors)
+    index = HwmonIndex() if hwmon else None
+    sensor_names = [s.sensor_name for s in sensors]
+
+    def open_log():
+        names = sensor_names + (hwmon_sample_names(index) if index else [])
+        return SampleLog(names, directory)
+
+    end = time.monotonic() + duration if duration else None
+    next_due = time.monotonic()
+    log = open_log()
+    warned = set()
+    try:
+        while end is None or time.monotonic() < end:
+            if index is not None and index.stale():
+                index.build()
+                log.close()
+                log = open_log()
+            raw = poller.read_raw()
+            if index is not None:
+                raw = np.concatenate([raw, hwmon_raw(index.sample())])
+            for idx in log.append(raw):
+                if idx not in warned:
+                    warned.add(idx)
+                    print(f"{log.names[idx]}: value {raw[idx]!r} is not a storable integer, skipped")
+            next_due += interval
+            time.sleep(max(0.0, next_due - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log.close()
+        poller.close()
+        if index is not None:
+            index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sensor sample log.")
+    parser.add_argument("action", choices=("record", "names", "query"))
+    parser.add_argument("--dir", default=SAMPLE_LOG_DIR, help="log directory")
+    parser.add_argument("--config", default=None, help="sensor threshold CSV")
+    parser.add_argument("--interval", type=float, default=1.0, help="record interval in seconds")
+    parser.add_argument("--duration", type=float, default=None, help="record duration in seconds")
+    parser.add_argument("--hwmon", action="store_true", help="also record every hwmon input")
+    parser.add_argument("--name", help="sample name to query")
+    parser.add_argument("--start", type=float, default=None, help="query start (epoch seconds)")
+    parser.add_argument("--end", type=float, default=None, help="query end (epoch seconds)")
+    parser.add_argument("--bucket", type=float, default=None, help="downsample bucket in seconds")
+    args = parser.parse_args()
+    if args.action == "record":
+        record_sensors(args.dir, args.config, args.interval, args.duration, args.hwmon)
+    elif args.action == "names":
+        print("\n".join(SampleLogReader(args.dir).names()))
+    else:
+        reader = SampleLogReader(args.dir)
+        if args.bucket:
+            for row in zip(*reader.downsample(args.name, args.bucket, args.start, args.end)):
+                print(f"{time.strftime('%F %T', time.localtime(row[0]))}  "
+                      f"min {row[1]:<10g} max {row[2]:<10g} mean {row[3]:.3f}")
+        else:
+            for ts, raw in zip(*reader.query(args.name, args.start, args.end)):
+                print(f"{ts:.3f} {raw}")
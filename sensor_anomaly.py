@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""Module providing streaming anomaly detection over rail telemetry."""
+
+import argparse
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from sensors import SensorColumns, SensorPoller, get_sensor_config_file, read_config_file, resolve_sensor_paths
+
+# Largest change per second before a rail is flagged, by unit
+RATE_LIMITS = {
+    "V": 1.0,
+    "A": 20.0,
+    "W": 200.0,
+    "°C": 2.0,
+    "RPM": 3000.0,
+}
+
+# Consecutive samples needed to raise or clear an alarm
+DEBOUNCE_SAMPLES = 3
+# Threshold alarms clear this fraction of the limit inside it
+HYSTERESIS_FRACTION = 0.02
+# EWMA drift: fast and slow smoothing, z-score and warmup before judging
+EWMA_FAST = 0.3
+EWMA_SLOW = 0.01
+DRIFT_SIGMA = 6.0
+DRIFT_WARMUP = 100
+# Relative tolerance of the P = V x I consistency rule
+POWER_TOLERANCE = 0.15
+
+RULE_HIGH = "high"
+RULE_LOW = "low"
+RULE_RATE = "rate"
+RULE_DRIFT = "drift"
+RULE_POWER = "power"
+
+
+class AnomalyEvent:
+    """An alarm raised or cleared at a sample timestamp."""
+
+    __slots__ = ("timestamp", "index", "name", "rule", "active", "value")
+
+    def __init__(self, timestamp, index, name, rule, active, value):
+        self.timestamp = timestamp
+        self.index = index
+        self.name = name
+        self.rule = rule
+        self.active = active
+        self.value = value
+
+    def __repr__(self):
+        state = "RAISED" if self.active else "CLEARED"
+        return f"AnomalyEvent({self.timestamp:.3f} {self.name} {self.rule} {state} {self.value:g})"
+
+
+class _Debounce:
+    """Debounced on/off state for a vector of conditions."""
+
+    def __init__(self, size: int, samples: int):
+        self.active = np.zeros(size, dtype=bool)
+        self.count = np.zeros(size, dtype=np.int32)
+        self.samples = samples
+
+    def update(self, trigger: np.ndarray, clear: np.ndarray) -> np.ndarray:
+        """Advances the state, returns the indices that changed."""
+        pending = np.where(self.active, clear, trigger)
+        self.count = np.where(pending, self.count + 1, 0)
+        flip = np.flatnonzero(self.count >= self.samples)
+        if len(flip):
+            self.active[flip] = ~self.active[flip]
+            self.count[flip] = 0
+        return flip
+
+
+def match_power_rails(sensors) -> List[Tuple[int, int, int]]:
+    """
+    Pairs the W, V and A rails of each device (same location, bus and
+    address) as (power, voltage, current) index triples. Devices with more
+    than one rail of a unit are skipped as ambiguous.
+    """
+    devices = {}
+    for idx, sensor in enumerate(sensors):
+        key = (sensor.local, sensor.busid, sensor.addr)
+        devices.setdefault(key, {}).setdefault(sensor.unit, []).append(idx)
+    rules = []
+    for units in devices.values():
+        rails = [units.get(unit, []) for unit in ("W", "V", "A")]
+        if all(len(rail) == 1 for rail in rails):
+            rules.append(tuple(rail[0] for rail in rails))
+    return rules
+
+
+class RailAnomalyDetector:
+    """
+    Streaming evaluator for converted rail samples.
+
+    Each update takes one vector of values (NaN for missing rails) and
+    advances every rule for every rail with array operations:
+    debounced min/max crossings with hysteresis, rate-of-change limits,
+    drift of a fast EWMA away from a slow EWMA baseline, and P = V x I
+    consistency between rails of the same device. Only transitions are
+    reported.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        minvals,
+        maxvals,
+        rate_limits,
+        power_rules: Sequence[Tuple[int, int, int]] = (),
+        debounce: int = DEBOUNCE_SAMPLES,
+    ):
+        self.names = list(names)
+        size = len(self.names)
+        self.minvals = np.asarray(minvals, dtype=np.float64)
+        self.maxvals = np.asarray(maxvals, dtype=np.float64)
+        self.rate_limits = np.asarray(rate_limits, dtype=np.float64)
+        self.high_clear = self.maxvals - np.abs(self.maxvals) * HYSTERESIS_FRACTION
+        self.low_clear = self.minvals + np.abs(self.minvals) * HYSTERESIS_FRACTION
+        rules = np.asarray(power_rules, dtype=np.int64).reshape(-1, 3)
+        self.power_idx, self.voltage_idx, self.current_idx = rules.T
+        self.states = {
+            RULE_HIGH: _Debounce(size, debounce),
+            RULE_LOW: _Debounce(size, debounce),
+            RULE_RATE: _Debounce(size, debounce),
+            RULE_DRIFT: _Debounce(size, debounce),
+            RULE_POWER: _Debounce(len(rules), debounce),
+        }
+        self.last_value = np.full(size, np.nan)
+        self.last_time = np.full(size, np.nan)
+        self.fast = np.full(size, np.nan)
+        self.slow = np.full(size, np.nan)
+        self.slow_var = np.zeros(size)
+        self.samples = np.zeros(size, dtype=np.int64)
+
+    @classmethod
+    def from_columns(cls, columns: SensorColumns, **kwargs):
+        """Builds a detector for a sensor catalog."""
+        rate_limits = [RATE_LIMITS.get(unit, np.nan) for unit in columns.units]
+        return cls(columns.names, columns.minvals, columns.maxvals, rate_limits,
+                   match_power_rails(columns.sensors), **kwargs)
+
+    def _events(self, rule, flips, timestamp, values, indices=None) -> List[AnomalyEvent]:
+        active = self.states[rule].active
+        events = []
+        for n in flips:
+            idx = int(n if indices is None else indices[n])
+            events.append(AnomalyEvent(timestamp, idx, self.names[idx], rule, bool(active[n]), float(values[n])))
+        return events
+
+    def update(self, timestamp: float, values) -> List[AnomalyEvent]:
+        """Feeds one sample vector, returns the alarm transitions."""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        events = []
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Static limits with hysteresis
+            flips = self.states[RULE_HIGH].update(values > self.maxvals, values <= self.high_clear)
+            events += self._events(RULE_HIGH, flips, timestamp, values)
+            flips = self.states[RULE_LOW].update(values < self.minvals, values >= self.low_clear)
+            events += self._events(RULE_LOW, flips, timestamp, values)
+
+            # Rate of change against the previous valid sample
+            rate = np.abs(values - self.last_value) / (timestamp - self.last_time)
+            flips = self.states[RULE_RATE].update(rate > self.rate_limits, rate <= self.rate_limits)
+            events += self._events(RULE_RATE, flips, timestamp, values)
+
+            # EWMA drift of the fast average away from the slow baseline
+            first = valid & np.isnan(self.slow)
+            self.fast = np.where(first, values, self.fast)
+            self.slow = np.where(first, values, self.slow)
+            delta = values - self.slow
+            self.fast = np.where(valid, self.fast + EWMA_FAST * (values - self.fast), self.fast)
+            self.slow = np.where(valid, self.slow + EWMA_SLOW * delta, self.slow)
+            self.slow_var = np.where(
+                valid, (1 - EWMA_SLOW) * (self.slow_var + EWMA_SLOW * delta * delta), self.slow_var
+            )
+            self.samples += valid
+            spread = DRIFT_SIGMA * np.sqrt(self.slow_var) + 1e-9
+            drift = np.abs(self.fast - self.slow)
+            warm = self.samples >= DRIFT_WARMUP
+            flips = self.states[RULE_DRIFT].update(warm & (drift > spread), drift <= spread * 0.5)
+            events += self._events(RULE_DRIFT, flips, timestamp, values)
+
+            # P = V x I consistency across rails of one device
+            if len(self.power_idx):
+                power = values[self.power_idx]
+                estimate = values[self.voltage_idx] * values[self.current_idx]
+                error = np.abs(power - estimate) / np.maximum(np.abs(power), 1e-3)
+                flips = self.states[RULE_POWER].update(error > POWER_TOLERANCE, error <= POWER_TOLERANCE)
+                events += self._events(RULE_POWER, flips, timestamp, power, self.power_idx)
+
+        self.last_value = np.where(valid, values, self.last_value)
+        self.last_time = np.where(valid, timestamp, self.last_time)
+        return events
+
+    def active(self) -> List[Tuple[str, str]]:
+        """Returns the (rail name, rule) pairs currently in alarm."""
+        alarms = []
+        for rule, state in self.states.items():
+            for n in np.flatnonzero(state.active):
+                idx = int(self.power_idx[n]) if rule == RULE_POWER else int(n)
+                alarms.append((self.names[idx], rule))
+        return alarms
+
+
+def sensor_anomaly_monitor(config_file: str = None, rate: float = 10.0, duration: float = None):
+    """Samples the sensor catalog at `rate` Hz and prints alarm transitions."""
+    columns = SensorColumns(resolve_sensor_paths(read_config_file(config_file or get_sensor_config_file())))
+    detector = RailAnomalyDetector.from_columns(columns)
+    poller = SensorPoller(columns.sensors)
+    period = 1.0 / rate
+    end = time.monotonic() + duration if duration else None
+    next_due = time.monotonic()
+    try:
+        while end is None or time.monotonic() < end:
+            timestamp = time.time()
+            for event in detector.update(timestamp, columns.convert(poller.read_raw())):
+                state = "\033[1;31mRAISED\033[0m" if event.active else "\033[1;32mCLEARED\033[00m"
+                stamp = time.strftime("%F %T", time.localtime(event.timestamp))
+                stamp += f"{event.timestamp % 1:.3f}"[1:]
+                print(f"{stamp}  {event.name:<24}{event.rule:<7}{state}  {event.value:g}")
+            next_due += period
+            time.sleep(max(0.0, next_due - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rail anomaly monitor.")
+    parser.add_argument("--config", default=None, help="sensor threshold CSV")
+    parser.add_argument("--rate", type=float, default=10.0, help="sample rate in Hz")
+    parser.add_argument("--duration", type=float, default=None, help="monitor duration in seconds")
+    args = parser.parse_args()
+    sensor_anomaly_monitor(args.config, args.rate, args.duration)
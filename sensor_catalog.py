@@ -0,0 +1,220 @@
+"""Module providing the compiled sensor catalog format."""
+
+import csv
+import hashlib
+import io
+import math
+import os
+import re
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Catalog fields in Sensor argument order. Each field lists the CSV headers
+# it may appear under, the rail name header carries the build stage.
+SENSOR_SCHEMA = (
+    ("sensor_name", re.compile(r"^Sensor rail name(?: \w+)?$")),
+    ("local", re.compile(r"^Device location$")),
+    ("busid", re.compile(r"^Bus Num$")),
+    ("addr", re.compile(r"^Address$")),
+    ("sysfs_link", re.compile(r"^Software point$")),
+    ("position", re.compile(r"^Sensor Position$")),
+    ("coefficient", re.compile(r"^Multiply$")),
+    ("unit", re.compile(r"^Sensor Unit$")),
+    ("maxval", re.compile(r"^Max_Design$")),
+    ("minval", re.compile(r"^Min_Design$")),
+)
+STRING_FIELDS = 8
+LIMIT_FIELDS = 2
+
+NUMBER_PATTERN = re.compile(r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$")
+
+# Compiled catalog layout (little endian):
+#   header   magic, version, sensor count, string count
+#   strings  u32 string table index per string field, STRING_FIELDS per sensor
+#   limits   f64 max/min per sensor, NaN for "NA"
+#   offsets  u32 end offset of each string in the blob
+#   blob     utf-8 strings
+CATALOG_MAGIC = b"FSCT"
+CATALOG_VERSION = 1
+CATALOG_HEADER = struct.Struct("<4sIII")
+# Cache next to the CSV, named after it and the hash of its content
+CATALOG_CACHE = ".{}.{}.cat"
+
+
+class SensorCatalog:
+    """
+    Sensor rows decoded from a compiled catalog.
+
+    String fields share one deduplicated string table and the limits are a
+    flat float view, so the rows cost little more than the file itself.
+    """
+
+    def __init__(self, data: bytes):
+        magic, version, count, nstrings = CATALOG_HEADER.unpack_from(data)
+        if magic != CATALOG_MAGIC or version != CATALOG_VERSION:
+            raise ValueError("Not a compiled sensor catalog")
+        fields_end = CATALOG_HEADER.size + 4 * STRING_FIELDS * count
+        limits_start = fields_end + -fields_end % 8
+        offsets_start = limits_start + 8 * LIMIT_FIELDS * count
+        blob_start = offsets_start + 4 * nstrings
+        if len(data) < blob_start:
+            raise ValueError(f"Truncated sensor catalog: {len(data)} < {blob_start} bytes")
+        view = memoryview(data)
+        self.fields = view[CATALOG_HEADER.size : fields_end].cast("I")
+        self.limits = view[limits_start : offsets_start].cast("d")
+        offsets = view[offsets_start : blob_start].cast("I")
+        blob = bytes(view[blob_start:])
+        if (offsets[-1] if nstrings else 0) != len(blob):
+            raise ValueError(f"Sensor catalog string table does not match its {len(blob)} byte blob")
+        if count and max(self.fields) >= nstrings:
+            raise ValueError("Sensor catalog string index out of range")
+        start = 0
+        self.strings: List[str] = []
+        for end in offsets:
+            if end < start:
+                raise ValueError("Sensor catalog string offsets are not increasing")
+            self.strings.append(blob[start:end].decode())
+            start = end
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def row(self, idx: int) -> Tuple:
+        """Returns sensor `idx` as Sensor constructor arguments."""
+        base = idx * STRING_FIELDS
+        values = [self.strings[n] for n in self.fields[base : base + STRING_FIELDS]]
+        for limit in self.limits[idx * LIMIT_FIELDS : (idx + 1) * LIMIT_FIELDS]:
+            values.append("NA" if math.isnan(limit) else limit)
+        return tuple(values)
+
+    def rows(self) -> Iterator[Tuple]:
+        """Iterates the sensors as Sensor constructor arguments."""
+        for idx in range(self.count):
+            yield self.row(idx)
+
+
+def _parse_limit(value: str) -> float:
+    value = value.strip()
+    if not any(char.isdigit() for char in value):
+        return math.nan
+    if not NUMBER_PATTERN.match(value):
+        raise ValueError(f"invalid limit {value!r}")
+    return float(value)
+
+
+def parse_catalog_csv(text: str) -> List[Tuple]:
+    """
+    Parses and validates a sensor threshold CSV.
+
+    Raises ValueError listing every missing column and invalid row.
+    """
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, [])
+    columns = []
+    errors = []
+    for field, pattern in SENSOR_SCHEMA:
+        matches = [n for n, name in enumerate(header) if pattern.match(name.strip())]
+        if not matches:
+            errors.append(f"missing column for {field} ({pattern.pattern})")
+        else:
+            columns.append(matches[0])
+    if errors:
+        raise ValueError("\n".join(errors))
+
+    rows = []
+    for line, record in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in record):
+            continue
+        if len(record) <= max(columns):
+            errors.append(f"line {line}: expected {max(columns) + 1} columns, got {len(record)}")
+            continue
+        values = [record[col] for col in columns]
+        values[3] = values[3].strip()
+        if not values[0].strip():
+            errors.append(f"line {line}: empty sensor name")
+        if values[6].strip() and not NUMBER_PATTERN.match(values[6].strip()):
+            errors.append(f"line {line}: invalid Multiply {values[6]!r}")
+        try:
+            values[8] = _parse_limit(values[8])
+            values[9] = _parse_limit(values[9])
+        except ValueError as err:
+            errors.append(f"line {line}: {err}")
+            continue
+        rows.append(tuple(values))
+    if errors:
+        raise ValueError("\n".join(errors))
+    return rows
+
+
+def compile_catalog(rows: List[Tuple]) -> bytes:
+    """Encodes parsed catalog rows in the compiled catalog format."""
+    table: Dict[str, int] = {}
+    fields = []
+    limits = []
+    for row in rows:
+        for value in row[:STRING_FIELDS]:
+            fields.append(table.setdefault(value, len(table)))
+        limits.extend(row[STRING_FIELDS:])
+    blob = bytearray()
+    offsets = []
+    for value in table:
+        blob += value.encode()
+        offsets.append(len(blob))
+    out = bytearray(CATALOG_HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, len(rows), len(table)))
+    out += struct.pack(f"<{len(fields)}I", *fields)
+    out += bytes(-len(out) % 8)
+    out += struct.pack(f"<{len(limits)}d", *limits)
+    out += struct.pack(f"<{len(offsets)}I", *offsets)
+    out += blob
+    return bytes(out)
+
+
+def catalog_cache_path(csv_file: str, digest: str) -> str:
+    """Returns the cache file of a CSV with the given content hash."""
+    directory, name = os.path.split(csv_file)
+    return os.path.join(directory, CATALOG_CACHE.format(name, digest))
+
+
+def load_catalog(csv_file: str) -> SensorCatalog:
+    """
+    Loads a sensor catalog, compiling the CSV only when its content has
+    changed since the cached build.
+    """
+    with open(csv_file, "rb") as fd:
+        raw = fd.read()
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    cache_file = catalog_cache_path(csv_file, digest)
+    try:
+        with open(cache_file, "rb") as fd:
+            return SensorCatalog(fd.read())
+    except OSError:
+        pass
+    except (ValueError, TypeError, struct.error):
+        # Corrupt or truncated cache, rebuilt below
+        try:
+            os.unlink(cache_file)
+        except OSError:
+            pass
+    data = compile_catalog(parse_catalog_csv(raw.decode("utf-8-sig")))
+    tmp_file = f"{cache_file}.{os.getpid()}"
+    try:
+        with open(tmp_file, "wb") as fd:
+            fd.write(data)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return SensorCatalog(data)
+
+
+def platform_catalog(platform: Optional[str], catalogs: Dict[str, str], default: str) -> str:
+    """Returns the catalog file of a platform, `default` if it has none."""
+    return catalogs.get(platform, default) if platform else default
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        catalog = load_catalog(path)
+        print(f"{path}: {len(catalog)} sensors, {len(catalog.strings)} strings")
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import json
+import math
+import os
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ring_buffer import RingBuffer
+from sensors import (
+    PASS,
+    FAILED,
+    SensorColumns,
+    check_devmap_changed,
+    get_sensor_config_file,
+    read_config_file,
+    resolve_sensor_paths,
+)
+
+# Default endpoints
+TELEMETRY_SOCKET = "/run/fboss_cit/sensors.sock"
+TELEMETRY_HISTORY_SECONDS = 600
+
+# Poll interval in seconds per sensor unit, rails move faster than temperatures
+SENSOR_INTERVALS = {
+    "V": 1.0,
+    "A": 1.0,
+    "W": 1.0,
+    "RPM": 2.0,
+    "°C": 5.0,
+    "Hz": 5.0,
+}
+SENSOR_DEFAULT_INTERVAL = 1.0
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class SensorTelemetry:
+    """
+    Continuous sensor telemetry store.
+
+    Every sensor is polled at its own interval (by unit, or overridden by
+    name) into a ring buffer holding `history` seconds of samples. The
+    latest snapshot and its OpenMetrics rendering are cached and only
+    rebuilt after new samples arrive.
+    """
+
+    def __init__(
+        self,
+        sensors,
+        intervals: Optional[Dict[str, float]] = None,
+        history: float = TELEMETRY_HISTORY_SECONDS,
+    ):
+        self.sensors = resolve_sensor_paths(sensors)
+        self.columns = SensorColumns(self.sensors)
+        intervals = intervals or {}
+        self.intervals = [
+            intervals.get(
+                s.sensor_name, SENSOR_INTERVALS.get(s.unit, SENSOR_DEFAULT_INTERVAL)
+            )
+            for s in self.sensors
+        ]
+        self.buffers = [
+            RingBuffer(max(1, int(math.ceil(history / interval))))
+            for interval in self.intervals
+        ]
+        self._by_name: Dict[str, int] = {}
+        for idx, sensor in enumerate(self.sensors):
+            self._by_name.setdefault(sensor.sensor_name, idx)
+        # Latest (timestamp, value, status) per sensor, None until read
+        self._latest: List[Optional[Tuple[float, float, str]]] = [None] * len(self.sensors)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._metrics_cache: Tuple[int, str] = (-1, "")
+        self._snapshot_cache: Tuple[int, Dict] = (-1, {})
+        self._schedule = [(0.0, idx) for idx in range(len(self.sensors))]
+        heapq.heapify(self._schedule)
+        self._stop = threading.Event()
+
+    def poll_due(self, now: float = None) -> int:
+        """Reads every sensor that is due, returns the number read."""
+        now = time.monotonic() if now is None else now
+        check_devmap_changed()
+        indices = []
+        while self._schedule and self._schedule[0][0] <= now:
+            due, idx = heapq.heappop(self._schedule)
+            indices.append(idx)
+            # Keep the cadence, skip missed slots instead of bursting
+            next_due = due + self.intervals[idx]
+            if next_due <= now:
+                next_due = now + self.intervals[idx]
+            heapq.heappush(self._schedule, (next_due, idx))
+        if indices:
+            self._poll_sensors(indices)
+        return len(indices)
+
+    def _poll_sensors(self, indices: List[int]):
+        # Same conversion and limits as the sensor_data table
+        values, fail = self.columns.evaluate(self.columns.read_raw(indices))
+        timestamp = time.time()
+        with self._lock:
+            for idx in indices:
+                value = float(values[idx])
+                status = None if math.isnan(value) else FAILED if fail[idx] else PASS
+                self.buffers[idx].append(timestamp, value)
+                self._latest[idx] = (timestamp, value, status)
+            self._generation += 1
+
+    def next_due(self) -> float:
+        """Returns the monotonic time at which the next sensor is due."""
+        return self._schedule[0][0] if self._schedule else math.inf
+
+    def run(self, duration: float = None):
+        """Polls sensors until stopped or `duration` seconds have elapsed."""
+        end = time.monotonic() + duration if duration else math.inf
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= end:
+                break
+            self.poll_due(now)
+            self._stop.wait(max(0.0, min(self.next_due(), end) - time.monotonic()))
+
+    def stop(self):
+        """Stops a running poll loop."""
+        self._stop.set()
+
+    def index(self, name_or_index) -> Optional[int]:
+        """Resolves a sensor name or catalog index."""
+        if isinstance(name_or_index, int) or str(name_or_index).isdigit():
+            idx = int(name_or_index)
+            return idx if 0 <= idx < len(self.sensors) else None
+        return self._by_name.get(name_or_index)
+
+    def snapshot(self) -> Dict:
+        """Returns the cached latest-value snapshot."""
+        with self._lock:
+            generation, cached = self._snapshot_cache
+            if generation == self._generation:
+                return cached
+            sensors = []
+            for idx, sensor in enumerate(self.sensors):
+                latest = self._latest[idx]
+                sensors.append({
+                    "index": idx,
+                    "name": sensor.sensor_name,
+                    "local": sensor.local,
+                    "bus": sensor.busid,
+                    "addr": sensor.addr,
+                    "unit": sensor.unit,
+                    "max": sensor.maxval,
+                    "min": sensor.minval,
+                    "timestamp": latest[0] if latest else None,
+                    "value": None if not latest or math.isnan(latest[1]) else latest[1],
+                    "status": _status_name(latest[2]) if latest else "NA",
+                })
+            cached = {"timestamp": time.time(), "sensors": sensors}
+            self._snapshot_cache = (self._generation, cached)
+            return cached
+
+    def history(self, name_or_index, seconds: float = None) -> Optional[Dict]:
+        """Returns the buffered samples of one sensor, optionally the last `seconds`."""
+        idx = self.index(name_or_index)
+        if idx is None:
+            return None
+        since = time.time() - seconds if seconds else 0.0
+        with self._lock:
+            ts, vals = self.buffers[idx].window(since)
+        return {
+            "index": idx,
+            "name": self.sensors[idx].sensor_name,
+            "unit": self.sensors[idx].unit,
+            "samples": [
+                [t, None if math.isnan(v) else v] for t, v in zip(ts.tolist(), vals.tolist())
+            ],
+        }
+
+    def stats(self, name_or_index, percentiles: Sequence[float] = ()) -> Optional[Dict]:
+        """
+        Returns min/max/mean over the buffered history of one sensor, and
+        the requested percentiles.
+        """
+        idx = self.index(name_or_index)
+        if idx is None:
+            return None
+        with self._lock:
+            stats = self.buffers[idx].stats(percentiles)
+        return {
+            "index": idx,
+            "name": self.sensors[idx].sensor_name,
+            "unit": self.sensors[idx].unit,
+            "samples": len(self.buffers[idx]),
+            **{k: None if math.isnan(v) else v for k, v in stats.items()},
+        }
+
+    def openmetrics(self) -> str:
+        """Returns the cached OpenMetrics exposition of the latest snapshot."""
+        with self._lock:
+            generation, cached = self._metrics_cache
+            if generation == self._generation:
+                return cached
+            values = ["# TYPE fboss_sensor_value gauge"]
+            statuses = ["# TYPE fboss_sensor_status gauge"]
+            for sensor, latest in zip(self.sensors, self._latest):
+                if latest is None:
+                    continue
+                timestamp, value, status = latest
+                labels = (
+                    f'sensor="{_label_value(sensor.sensor_name)}",'
+                    f'local="{_label_value(sensor.local)}",'
+                    f'bus="{_label_value(sensor.busid)}",'
+                    f'addr="{_label_value(sensor.addr)}",'
+                    f'unit="{_label_value(sensor.unit)}"'
+                )
+                if not math.isnan(value):
+                    values.append(f"fboss_sensor_value{{{labels}}} {value} {timestamp:.3f}")
+                if status in (PASS, FAILED):
+                    statuses.append(
+                        f"fboss_sensor_status{{{labels}}} {int(status == PASS)} {timestamp:.3f}"
+                    )
+            cached = "\n".join(values + statuses + ["# EOF", ""])
+            self._metrics_cache = (self._generation, cached)
+            return cached
+
+    def handle_request(self, request: str) -> str:
+        """
+        Answers one socket request:
+            metrics                 OpenMetrics text
+            latest                  JSON snapshot
+            history <name> [secs]   JSON samples of one sensor
+            stats <name> [p,...]    JSON min/max/mean (and percentiles) of one sensor
+        """
+        args = request.split()
+        if not args or args[0] == "metrics":
+            return self.openmetrics()
+        if args[0] == "latest":
+            return json.dumps(self.snapshot())
+        if args[0] == "history" and len(args) >= 2:
+            seconds = None
+            name = " ".join(args[1:])
+            if len(args) >= 3:
+                try:
+                    seconds = float(args[-1])
+                    name = " ".join(args[1:-1])
+                except ValueError:
+                    pass
+            data = self.history(name, seconds)
+            if data is None:
+                return json.dumps({"error": f"unknown sensor: {name}"})
+            return json.dumps(data)
+        if args[0] == "stats" and len(args) >= 2:
+            percentiles = ()
+            name = " ".join(args[1:])
+            if len(args) >= 3:
+                try:
+                    percentiles = tuple(float(p) for p in args[-1].split(","))
+                    name = " ".join(args[1:-1])
+                except ValueError:
+                    pass
+            data = self.stats(name, percentiles)
+            if data is None:
+                return json.dumps({"error": f"unknown sensor: {name}"})
+            return json.dumps(data)
+        return json.dumps({"error": f"unknown request: {request.strip()}"})
+
+
+def _status_name(status) -> str:
+    if status == PASS:
+        return "PASS"
+    if status == FAILED:
+        return "FAIL"
+    return "NA"
+
+
+class _TelemetrySocketHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = self.rfile.readline().decode(errors="replace")
+        self.wfile.write(self.server.telemetry.handle_request(request).encode())
+
+
+def _remove_stale_socket(path: str):
+    """
+    Unlinks a socket left behind by a dead daemon. A socket that still
+    accepts connections belongs to a running daemon and is left alone.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except FileNotFoundError:
+            return
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise RuntimeError(f"Telemetry daemon already running on {path}")
+
+
+class TelemetrySocketServer(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server answering one request line per connection."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, telemetry: SensorTelemetry):
+        self.telemetry = telemetry
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        _remove_stale_socket(path)
+        super().__init__(path, _TelemetrySocketHandler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+class _MetricsHttpHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.telemetry.openmetrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def query_telemetry(request: str = "metrics", path: str = TELEMETRY_SOCKET) -> str:
+    """Sends one request to a running telemetry daemon and returns the reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(request.encode() + b"\n")
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b"".join(chunks).decode()
+
+
+def sensor_telemetry_daemon(
+    config_file: str = None,
+    socket_path: str = TELEMETRY_SOCKET,
+    http_port: int = None,
+    history: float = TELEMETRY_HISTORY_SECONDS,
+    duration: float = None,
+):
+    """
+    Runs the telemetry poller with its Unix socket (and optional HTTP
+    /metrics) endpoint until interrupted or `duration` has elapsed.
+    """
+    if config_file is None:
+        config_file = get_sensor_config_file()
+    telemetry = SensorTelemetry(read_config_file(config_file), history=history)
+    servers = [TelemetrySocketServer(socket_path, telemetry)]
+    if http_port:
+        http_server = ThreadingHTTPServer(("127.0.0.1", http_port), _MetricsHttpHandler)
+        http_server.daemon_threads = True
+        http_server.telemetry = telemetry
+        servers.append(http_server)
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Sensor telemetry: {len(telemetry.sensors)} sensors, socket {socket_path}"
+          + (f", http://127.0.0.1:{http_port}/metrics" if http_port else ""))
+    try:
+        telemetry.run(duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        telemetry.stop()
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        for sensor in telemetry.sensors:
+            sensor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sensor telemetry daemon.")
+    parser.add_argument("--config", default=None, help="sensor threshold CSV (default: by board id)")
+    parser.add_argument("--socket", default=TELEMETRY_SOCKET, help="Unix socket path")
+    parser.add_argument("--http-port", type=int, default=None, help="serve /metrics on localhost")
+    parser.add_argument("--history", type=float, default=TELEMETRY_HISTORY_SECONDS, help="history in seconds")
+    parser.add_argument("--duration", type=float, default=None, help="run duration in seconds")
+    parser.add_argument("--query", default=None, help="query a running daemon (metrics, latest, history <name> [secs], stats <name> [p,...])")
+    args = parser.parse_args()
+    if args.query:
+        print(query_telemetry(args.query, args.socket), end="")
+    else:
+        sensor_telemetry_daemon(args.config, args.socket, args.http_port, args.history, args.duration)
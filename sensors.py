@@ -2,9 +2,16 @@
 
 import os
 import re
-import csv
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+from devmap import get_devmap, DEVMAP_I2C
+from sensor_catalog import load_catalog, platform_catalog
+
 # Constants for sensor status and error messages
 SENSOR_SUCCESS = "success"
 PASS = "\033[1;32mPASS\033[00m"
@@ -18,6 +25,56 @@ MUX_DEV_PATH = (
     "/sys/bus/auxiliary/devices/{}.{}_i2c_master.{}/i2c-{}/{}-0070/channel-{}"
 )
 CPU_TEMP = "/sys/devices/platform/coretemp.0/hwmon"
+BOARD_ID_PATH = "/sys/bus/auxiliary/devices/{}.fpga_info_iob.0/board_id"
+
+# Concurrent reads allowed per I2C master, and the reader pool size
+SENSOR_BUS_INFLIGHT = 1
+SENSOR_POLL_WORKERS = 16
+
+# Default sensor catalog and the platform config naming per-platform ones
+SENSOR_CONFIG = "Minipack 3 sensors threshold list_20240719.csv"
+PLATFORM_CONFIG = "fboss_dvt.json"
+
+# Raw sysfs value -> unit scale, same factors as Sensor.value_format
+UNIT_SCALES = {
+    "V": 1e-3,
+    "RPM": 1.0,
+    "°C": 1e-3,
+    "A": 1e-3,
+    "W": 1e-6,
+    "Hz": 1e-6,
+}
+
+# Resolution state shared by every Sensor: bumping the generation makes
+# each sensor resolve its path again on the next read.
+_PATH_GENERATION = 0
+_DEVMAP_MTIME = None
+_BUS_DIR_CACHE = {}
+
+
+def invalidate_sensor_paths():
+    """Forces every sensor to resolve its attribute path again."""
+    global _PATH_GENERATION
+    _PATH_GENERATION += 1
+    _BUS_DIR_CACHE.clear()
+
+
+def check_devmap_changed():
+    """Invalidates resolved sensor paths if the I2C devmap has changed."""
+    global _DEVMAP_MTIME
+    mtime = get_devmap().mtime(DEVMAP_I2C)
+    if mtime != _DEVMAP_MTIME:
+        if _DEVMAP_MTIME is not None:
+            invalidate_sensor_paths()
+        _DEVMAP_MTIME = mtime
+
+
+def resolve_sensor_paths(sensors):
+    """Resolves the attribute file of every sensor of a catalog once."""
+    check_devmap_changed()
+    for sensor in sensors:
+        sensor.resolve()
+    return sensors
 
 
 # Sensor data structure (more organized)
@@ -26,6 +83,12 @@ class Sensor:
     Represents a sensor with its attributes.
     """
 
+    __slots__ = (
+        "sensor_name", "local", "busid", "addr", "sysfs_link", "position",
+        "coefficient", "unit", "maxval", "minval",
+        "dev_file", "_fd", "_coef", "_scale_int", "_generation",
+    )
+
     def __init__(
         self,
         sensor_name,
@@ -49,6 +112,12 @@ class Sensor:
         self.unit = unit
         self.maxval = maxval
         self.minval = minval
+        # Resolved attribute file, filled by resolve()
+        self.dev_file = None
+        self._fd = None
+        self._coef = None
+        self._scale_int = False
+        self._generation = -1
 
     def value_format(self, unit: str, value: str) -> str:
         """
@@ -72,46 +141,89 @@ class Sensor:
         """
         Searches for the I2C bus ID within files in a given directory.
         """
+        if directory in _BUS_DIR_CACHE:
+            return _BUS_DIR_CACHE[directory]
+        busid = None
         # Use pathlib to iterate over files in the directory
         for file in Path(directory).iterdir():
             dev = re.findall(r"i2c-\d+", file.name, re.M)
             if dev:
-                return dev[0].split("-")[1]
-        return None
+                busid = dev[0].split("-")[1]
+                break
+        _BUS_DIR_CACHE[directory] = busid
+        return busid
 
-    def _read_sensor_data(self):
+    def resolve(self):
         """
-        Reads sensor data from either sysfs link or device path.
+        Resolves the attribute file of the sensor, from the sysfs link or
+        the device path. Returns the path, None if not found.
         """
-        file = self.sysfs_link
-
-        data = self._read_sysfs_data(file)
-        if data:
-            return data
-
-        data = self._read_device_data()
-        if data:
-            return data
-
-        return None
+        self.close()
+        self.dev_file = None
+        self._scale_int = False
+        if Path(self.sysfs_link).exists():
+            self.dev_file = self.sysfs_link
+        else:
+            try:
+                self.dev_file = self._resolve_device_path()
+            except OSError:
+                self.dev_file = None
+            self._scale_int = True
+        self._coef = float(self.coefficient) if self.coefficient else None
+        self._generation = _PATH_GENERATION
+        return self.dev_file
+
+    def close(self):
+        """Closes the held-open attribute file."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
 
-    def _read_sysfs_data(self, file_path):
+    def _read_sensor_data(self):
         """
-        Reads sensor data from the sysfs link.
+        Reads sensor data and applies the coefficient.
         """
-        if not Path(file_path).exists():
+        sensor_data = self.read_raw()
+        if sensor_data is None:
             return None
-        with open(file_path, "r") as f:
-            sensor_data = f.read().strip()
-            if self.coefficient:
-                sensor_data = round(float(sensor_data) * float(self.coefficient), 3)
+        if self._coef is not None:
+            value = int(sensor_data) if self._scale_int else float(sensor_data)
+            sensor_data = round(value * self._coef, 3)
         return sensor_data
 
-    def _read_device_data(self):
+    def read_raw(self):
+        """
+        Reads the unscaled attribute value as a string, None if unreadable.
+        The path is resolved again once if it is stale.
+        """
+        if self._generation != _PATH_GENERATION:
+            self.resolve()
+        data = self._read_dev_file()
+        if data is None:
+            self.resolve()
+            data = self._read_dev_file()
+        return data
+
+    def _read_dev_file(self):
         """
-        Reads sensor data from the device path.
+        Reads the attribute with a single pread on the held-open fd.
         """
+        if self.dev_file is None:
+            return None
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.dev_file, os.O_RDONLY)
+            sensor_data = os.pread(self._fd, 64, 0).decode().strip()
+        except OSError:
+            self.close()
+            return None
+        return sensor_data or None
 
+    def _resolve_device_path(self):
+        """
+        Resolves the attribute file from the device path.
+        """
+        dev_file = None
         local = self.local.lower()
         dev_name = self.sysfs_link.split("/")[-1]
 
@@ -142,17 +254,8 @@ class Sensor:
                 if Path(dev_path).exists():
                     for dirs in Path(dev_path).iterdir():
                         dev_file = f"{dev_path}/{dirs.name}/{dev_name}"
-                else:
-                    return None
-
-            with open(dev_file, "r") as f:
-                sensor_data = f.read().strip()
-
-            if self.coefficient:
-                sensor_data = round(int(sensor_data) * float(self.coefficient), 3)
 
-            return sensor_data
-        return None
+        return dev_file
 
     def test_sensor_data(self):
         """
@@ -184,38 +287,195 @@ class Sensor:
         return PASS
 
 
-def read_config_file(filename):
+def _raw_value(data) -> float:
+    if data is None:
+        return np.nan
+    try:
+        return float(data)
+    except ValueError:
+        return np.nan
+
+
+def sensor_master(sensor):
     """
-    Reads sensor configuration from a CSV file.
+    Returns the (location, bus) of the I2C master a sensor sits behind,
+    sensors behind a mux share the master of the mux.
     """
-    sensors = []
-    with open(filename, "r", newline="") as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for row in reader:
-            sensors.append(
-                Sensor(
-                    sensor_name=row["Sensor rail name DVT"],
-                    local=row["Device location"],
-                    busid=row["Bus Num"],
-                    addr=row["Address"].strip(),
-                    sysfs_link=row["Software point"],
-                    position=row["Sensor Position"],
-                    coefficient=(row["Multiply"]),
-                    unit=row["Sensor Unit"],
-                    maxval=(
-                        float(row["Max_Design"])
-                        if any(char.isdigit() for char in row["Max_Design"])
-                        else "NA"
-                    ),
-                    minval=(
-                        float(row["Min_Design"])
-                        if any(char.isdigit() for char in row["Min_Design"])
-                        else "NA"
-                    ),
-                )
+    local = sensor.local.lower()
+    if "mux_" in local:
+        _, dev_local, mux_busid = local.split("_")[:3]
+        return dev_local, mux_busid
+    return local, sensor.busid
+
+
+class SensorPoller:
+    """
+    Concurrent sensor reader.
+
+    Sensors are grouped by I2C master; the blocking sysfs reads run in a
+    thread pool, with at most `inflight` reads outstanding per master, so
+    independent buses are sampled in parallel and a sweep takes about as
+    long as the slowest bus. `limits` overrides the limit per master.
+    """
+
+    def __init__(self, sensors, inflight=SENSOR_BUS_INFLIGHT, max_workers=SENSOR_POLL_WORKERS,
+                 limits=None):
+        self.sensors = list(sensors)
+        self.inflight = inflight
+        self.limits = limits or {}
+        self.groups = {}
+        for idx, sensor in enumerate(self.sensors):
+            self.groups.setdefault(sensor_master(sensor), []).append(idx)
+        self.max_workers = max(1, min(max_workers, sum(
+            min(self.limits.get(master, inflight), len(indices))
+            for master, indices in self.groups.items()
+        )))
+        self._executor = None
+
+    async def _poll_group(self, master, indices, raw):
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(self.limits.get(master, self.inflight))
+
+        async def read(idx):
+            async with limit:
+                data = await loop.run_in_executor(self._executor, self.sensors[idx].read_raw)
+            raw[idx] = _raw_value(data)
+
+        await asyncio.gather(*(read(idx) for idx in indices))
+
+    async def poll(self) -> np.ndarray:
+        """Reads every sensor once, NaN where a read failed."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        raw = np.full(len(self.sensors), np.nan)
+        await asyncio.gather(
+            *(self._poll_group(master, indices, raw) for master, indices in self.groups.items())
+        )
+        return raw
+
+    def read_raw(self) -> np.ndarray:
+        """Runs one concurrent sweep from synchronous code."""
+        return asyncio.run(self.poll())
+
+    def close(self):
+        """Shuts down the reader pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class SensorColumns:
+    """
+    Columnar view of a sensor catalog for vectorized threshold checks.
+
+    Coefficients, unit scales and limits are held as float arrays ("NA"
+    limits and unknown units become NaN), so a sweep is one raw vector and
+    conversion plus pass/fail are array operations. Raw inputs may be a
+    single sweep (n_sensors,) or a history matrix (n_samples, n_sensors).
+    """
+
+    def __init__(self, sensors):
+        self.sensors = list(sensors)
+        self.names = [sensor.sensor_name for sensor in self.sensors]
+        self.units = [sensor.unit for sensor in self.sensors]
+        self.coefficients = np.array(
+            [float(s.coefficient) if s.coefficient else 1.0 for s in self.sensors],
+            dtype=np.float64,
+        )
+        self.has_coefficient = np.array([bool(s.coefficient) for s in self.sensors], dtype=bool)
+        self.scales = np.array(
+            [UNIT_SCALES.get(unit, np.nan) for unit in self.units], dtype=np.float64
+        )
+        # RPM is reported as read, every other unit is truncated then scaled
+        self.truncate = np.array([unit != "RPM" for unit in self.units], dtype=bool)
+        self.maxvals = np.array(
+            [np.nan if s.maxval == "NA" else s.maxval for s in self.sensors], dtype=np.float64
+        )
+        self.minvals = np.array(
+            [np.nan if s.minval == "NA" else s.minval for s in self.sensors], dtype=np.float64
+        )
+        self.positions, self.position_codes = np.unique(
+            np.array([s.position for s in self.sensors], dtype=str), return_inverse=True
+        )
+
+    @classmethod
+    def from_files(cls, *filenames):
+        """Builds one catalog from several sensor CSV files."""
+        sensors = []
+        for filename in filenames:
+            sensors.extend(read_config_file(filename))
+        return cls(sensors)
+
+    def __len__(self):
+        return len(self.sensors)
+
+    def read_raw(self, indices=None) -> np.ndarray:
+        """
+        Reads every sensor (or only those in `indices`) once, NaN where a
+        read failed or was skipped.
+        """
+        raw = np.full(len(self.sensors), np.nan)
+        for idx in range(len(self.sensors)) if indices is None else indices:
+            raw[idx] = _raw_value(self.sensors[idx].read_raw())
+        return raw
+
+    def convert(self, raw) -> np.ndarray:
+        """Converts raw values (last axis = sensor) to display units."""
+        values = np.asarray(raw, dtype=np.float64) * self.coefficients
+        values = np.where(self.has_coefficient, np.round(values, 3), values)
+        values = np.where(self.truncate, np.trunc(values), values)
+        values = values * self.scales
+        return np.where(self.truncate, np.round(values, 2), values)
+
+    def evaluate(self, raw):
+        """
+        Converts raw values and checks them against the limits.
+
+        Returns (values, fail_mask). NaN values and NaN limits never fail.
+        """
+        values = self.convert(raw)
+        with np.errstate(invalid="ignore"):
+            fail = (values < self.minvals) | (values > self.maxvals)
+        return values, fail
+
+    def violations(self, raw):
+        """
+        Returns the limit violations of a sweep or history matrix as
+        (sample index or None, sensor index, name, value, min, max) tuples.
+        """
+        values, fail = self.evaluate(raw)
+        result = []
+        for pos in zip(*np.nonzero(fail)):
+            sample, idx = (None, int(pos[0])) if values.ndim == 1 else map(int, pos)
+            result.append(
+                (sample, idx, self.names[idx], float(values[pos]),
+                 float(self.minvals[idx]), float(self.maxvals[idx]))
             )
-    return sensors
+        return result
+
+
+def read_config_file(filename):
+    """
+    Reads sensor configuration from a CSV file, through its compiled
+    catalog cache.
+    """
+    return [Sensor(*row) for row in load_catalog(filename).rows()]
+
+
+def get_sensor_config_file(platform_config=PLATFORM_CONFIG):
+    """
+    Selects the sensor catalog of the running platform from the board id,
+    the default catalog if the platform has none.
+    """
+    try:
+        with open(platform_config, "r", encoding="utf-8") as fd:
+            platform_data = json.load(fd)
+        with open(BOARD_ID_PATH.format(IOB_PCI_DRIVER), "r", encoding="utf-8") as fd:
+            board_id = fd.read().strip()
+    except (OSError, ValueError):
+        return SENSOR_CONFIG
+    platform = platform_data.get("platformName", {}).get(board_id)
+    return platform_catalog(platform, platform_data.get("sensorCatalogs", {}), SENSOR_CONFIG)
 
 
 def sensor_data(sensors):
@@ -228,28 +488,41 @@ def sensor_data(sensors):
         "--------------------+-------+-----+------+--------+---------+---------+------+-------"
     )
 
-    for sensor in sensors:
-        status = PASS
-        data, status = sensor.test_sensor_data()
-        if status:
-
-            print(
-                f'{"":2}{sensor.sensor_name[:17]:<18}{"|":<2}{sensor.local[:4]:<4}{"":>2}{"|":<2}'
-                + f'{sensor.busid:<4}{"|":<2}{sensor.addr:<5}{"|":<2}'
-                + f'{data:<7}{"|":<2}{str(sensor.maxval):<8}{"|":<2}'
-                + f'{str(sensor.minval):<8}{"|":<2}{sensor.unit:<5}{"|":<2}{status:<5}'
-            )
+    check_devmap_changed()
+    columns = sensors if isinstance(sensors, SensorColumns) else SensorColumns(sensors)
+    poller = SensorPoller(columns.sensors)
+    try:
+        values, fail = columns.evaluate(poller.read_raw())
+    finally:
+        poller.close()
+    status = PASS
+    for idx, sensor in enumerate(columns.sensors):
+        if np.isnan(values[idx]):
+            data, sensor_status = "NA", "NA"
+        else:
+            data = f"{values[idx]:g}"
+            sensor_status = FAILED if fail[idx] else PASS
+            if fail[idx]:
+                status = FAILED
+        print(
+            f'{"":2}{sensor.sensor_name[:17]:<18}{"|":<2}{sensor.local[:4]:<4}{"":>2}{"|":<2}'
+            + f'{sensor.busid:<4}{"|":<2}{sensor.addr:<5}{"|":<2}'
+            + f'{data:<7}{"|":<2}{str(sensor.maxval):<8}{"|":<2}'
+            + f'{str(sensor.minval):<8}{"|":<2}{sensor.unit:<5}{"|":<2}{sensor_status:<5}'
+        )
         print(
             "--------------------+-------+-----+------+--------+---------+---------+------+-------"
         )
     return status
 
 
-def sensor_test(config_file="Minipack 3 sensors threshold list_20240719.csv"):
+def sensor_test(config_file=None):
     """
     Main function to test sensors.
     """
-    sensors = read_config_file(config_file)
+    if config_file is None:
+        config_file = get_sensor_config_file()
+    sensors = resolve_sensor_paths(read_config_file(config_file))
     sensor_data(sensors)
 
 
@@ -0,0 +1,150 @@
+"""Module providing a process-wide pool of SMBus handles."""
+
+import atexit
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from smbus2 import SMBus
+
+# Upper bounds (us) of the latency histogram buckets, the last bucket is open
+LATENCY_BUCKETS_US = (50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+
+class BusStats:
+    """Transaction counters and latency histogram of one bus."""
+
+    __slots__ = ("transactions", "errors", "bytes", "latency", "histogram")
+
+    def __init__(self):
+        self.transactions = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_US) + 1)
+
+    def record(self, elapsed: float, nbytes: int, ok: bool):
+        self.transactions += 1
+        self.latency += elapsed
+        if ok:
+            self.bytes += nbytes
+        else:
+            self.errors += 1
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_US, elapsed * 1e6)] += 1
+
+    def percentile(self, pct: float) -> Optional[int]:
+        """Returns the bucket bound (us) holding the pct-th percentile."""
+        if not self.transactions:
+            return None
+        target = self.transactions * pct / 100.0
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_US + (None,), self.histogram):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+
+class SmbusPool:
+    """
+    Shared SMBus handles keyed by bus id.
+
+    /dev/i2c-N is opened on first use and kept open. Every transaction on
+    a bus holds that bus' lock, so users on different threads never
+    interleave on one bus while independent buses run in parallel.
+    """
+
+    def __init__(self):
+        self._buses: Dict[int, SMBus] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        self._stats: Dict[int, BusStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, busid: int) -> Tuple[SMBus, threading.Lock, BusStats]:
+        busid = int(busid)
+        with self._lock:
+            bus = self._buses.get(busid)
+            if bus is None:
+                bus = SMBus(busid, force=True)
+                self._buses[busid] = bus
+                self._locks[busid] = threading.Lock()
+                self._stats.setdefault(busid, BusStats())
+            return bus, self._locks[busid], self._stats[busid]
+
+    def open(self, busid: int):
+        """Opens a bus ahead of use, raises OSError if it does not exist."""
+        self._get(busid)
+
+    def _call(self, busid: int, nbytes: int, method: str, *args, **kwargs):
+        bus, lock, stats = self._get(busid)
+        with lock:
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = getattr(bus, method)(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                stats.record(time.perf_counter() - start, nbytes, ok)
+
+    def write_quick(self, busid: int, addr: int, force: bool = True):
+        """SMBus quick write."""
+        return self._call(busid, 0, "write_quick", addr, force=force)
+
+    def read_byte(self, busid: int, addr: int, force: bool = True) -> int:
+        """SMBus receive byte."""
+        return self._call(busid, 1, "read_byte", addr, force=force)
+
+    def read_byte_data(self, busid: int, addr: int, reg: int, force: bool = True) -> int:
+        """SMBus read byte data."""
+        return self._call(busid, 1, "read_byte_data", addr, reg, force=force)
+
+    def write_byte_data(self, busid: int, addr: int, reg: int, value: int, force: bool = True):
+        """SMBus write byte data."""
+        return self._call(busid, 1, "write_byte_data", addr, reg, value, force=force)
+
+    def read_word_data(self, busid: int, addr: int, reg: int, force: bool = True) -> int:
+        """SMBus read word data."""
+        return self._call(busid, 2, "read_word_data", addr, reg, force=force)
+
+    def read_i2c_block_data(self, busid: int, addr: int, reg: int, length: int,
+                            force: bool = True) -> List[int]:
+        """I2C block read of `length` bytes."""
+        return self._call(busid, length, "read_i2c_block_data", addr, reg, length, force=force)
+
+    def stats(self) -> Dict[int, BusStats]:
+        """Returns the statistics of every bus used so far."""
+        with self._lock:
+            return dict(self._stats)
+
+    def print_stats(self):
+        """Prints per-bus transaction counts and latency."""
+        print(" Bus | Transactions | Errors | Bytes    | Avg (us) | p50 (us) | p99 (us)")
+        for busid, stats in sorted(self.stats().items()):
+            avg = stats.latency / stats.transactions * 1e6 if stats.transactions else 0
+            p50, p99 = (f"<{p}" if p else ">50000" for p in (stats.percentile(50), stats.percentile(99)))
+            print(f" {busid:<4}| {stats.transactions:<13}| {stats.errors:<7}| {stats.bytes:<9}"
+                  f"| {avg:<9.0f}| {p50:<9}| {p99}")
+
+    def close(self):
+        """Closes every handle, statistics are kept."""
+        with self._lock:
+            for bus in self._buses.values():
+                bus.close()
+            self._buses.clear()
+            self._locks.clear()
+
+
+_POOL: Optional[SmbusPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_smbus_pool() -> SmbusPool:
+    """Returns the process-wide SMBus pool."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SmbusPool()
+            atexit.register(_POOL.close)
+        return _POOL
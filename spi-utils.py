@@ -5,8 +5,10 @@ import sys
 import subprocess
 import time
 
+from devmap import get_devmap, DEVMAP_GPIOCHIPS
+
 TMP_DIR = "/tmp/.fboss-fwtmp"
-IOB_GPIOCHIP = os.path.basename(os.readlink("/run/devmap/gpiochips/IOB_GPIO_CHIP_0"))
+IOB_GPIOCHIP = os.path.basename(get_devmap().resolve(DEVMAP_GPIOCHIPS, "IOB_GPIO_CHIP_0") or "")
 
 def clean_env():
     """Cleanup temporary directory."""
@@ -0,0 +1,173 @@
+"""Module providing a native SPI NOR flash probe over spidev."""
+
+import ctypes
+import fcntl
+import os
+import struct
+from typing import Dict, Optional, Tuple
+
+# struct spi_ioc_transfer: tx_buf, rx_buf, len, speed_hz, delay_usecs,
+# bits_per_word, cs_change, tx_nbits, rx_nbits, word_delay_usecs, pad
+SPI_IOC_TRANSFER = struct.Struct("<QQIIHBBBBBB")
+SPI_IOC_MAGIC = ord("k")
+SPI_PROBE_SPEED_HZ = 1000000
+
+CMD_RDID = 0x9F
+CMD_RDSFDP = 0x5A
+SFDP_SIGNATURE = b"SFDP"
+# JEDEC Basic Flash Parameter Table, parameter id 0xFF00
+SFDP_BFPT_ID = 0xFF00
+SFDP_MAX_HEADERS = 8
+
+# JEDEC JEP106 manufacturer ids (bank 1)
+JEDEC_VENDORS: Dict[int, str] = {
+    0x01: "Spansion",
+    0x1F: "Atmel",
+    0x20: "Micron",
+    0x9D: "ISSI",
+    0xBF: "SST",
+    0xC2: "Macronix",
+    0xC8: "GigaDevice",
+    0xEF: "Winbond",
+}
+
+# (manufacturer, device id) -> flashrom chip names, the first one is shown
+JEDEC_PARTS: Dict[Tuple[int, int], Tuple[str, ...]] = {
+    (0x20, 0xBA18): ("MT25QL128", "N25Q128..3E"),
+    (0x20, 0xBB18): ("MT25QU128", "N25Q128..1E"),
+    (0x20, 0xBA19): ("MT25QL256", "N25Q256..3E"),
+    (0x20, 0xBB19): ("MT25QU256", "N25Q256..1E"),
+    (0x20, 0xBA20): ("MT25QL512", "N25Q512..3E"),
+    (0x20, 0xBB20): ("MT25QU512", "N25Q512..1E"),
+    (0xC2, 0x2018): ("MX25L12835F/MX25L12845E/MX25L12865E",),
+    (0xC2, 0x2019): ("MX25L25635F/MX25L25645G",),
+    (0xEF, 0x3012): ("W25X20",),
+    (0xEF, 0x3013): ("W25X40",),
+    (0xEF, 0x3014): ("W25X80",),
+    (0xEF, 0x4015): ("W25Q16.V",),
+    (0xEF, 0x4016): ("W25Q32.V", "W25Q32JV"),
+    (0xEF, 0x7016): ("W25Q32JV", "W25Q32JV-.M"),
+    (0xEF, 0x4017): ("W25Q64.V", "W25Q64JV-.Q"),
+    (0xEF, 0x4018): ("W25Q128.V", "W25Q128JV-.Q"),
+    (0xEF, 0x4019): ("W25Q256.V", "W25Q256JV_Q"),
+}
+
+
+def spi_ioc_message(count: int) -> int:
+    """Returns the SPI_IOC_MESSAGE(count) ioctl request number."""
+    return (1 << 30) | ((SPI_IOC_TRANSFER.size * count) << 16) | (SPI_IOC_MAGIC << 8)
+
+
+def capacity_size(capacity: int) -> Optional[int]:
+    """Decodes the RDID capacity byte to bytes, None if not a size code."""
+    if 0x10 <= capacity <= 0x1F:
+        return 1 << capacity
+    # 512Mb and up continue at 0x20 on Micron and others
+    if 0x20 <= capacity <= 0x22:
+        return 1 << (capacity - 6)
+    return None
+
+
+class FlashInfo:
+    """Identity of a probed flash."""
+
+    __slots__ = ("manufacturer", "device", "vendor", "names", "size")
+
+    def __init__(self, manufacturer, device, vendor, names, size):
+        self.manufacturer = manufacturer
+        self.device = device
+        self.vendor = vendor
+        self.names = names
+        self.size = size
+
+    @property
+    def name(self) -> str:
+        return self.names[0] if self.names else f"{self.manufacturer:02x}{self.device:04x}"
+
+    def matches(self, chip: str) -> bool:
+        """Returns True if `chip` is one of the flashrom names of this part."""
+        return chip in self.names
+
+    def __repr__(self):
+        return f"FlashInfo({self.vendor} {self.name} {self.size})"
+
+
+class SpiFlash:
+    """
+    SPI NOR flash behind /dev/spidevX.Y.
+
+    Every command is one SPI_IOC_MESSAGE with a write transfer and a read
+    transfer under one chip select, like the flashrom linux_spi driver.
+    """
+
+    def __init__(self, path: str, speed_hz: int = SPI_PROBE_SPEED_HZ):
+        self.path = path
+        self.speed_hz = speed_hz
+        self._fd = os.open(path, os.O_RDWR)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def command(self, tx: bytes, rx_len: int) -> bytes:
+        """Sends `tx` and reads `rx_len` bytes back."""
+        tx_buf = ctypes.create_string_buffer(bytes(tx), len(tx))
+        rx_buf = ctypes.create_string_buffer(rx_len)
+        message = bytearray(
+            SPI_IOC_TRANSFER.pack(ctypes.addressof(tx_buf), 0, len(tx), self.speed_hz, 0, 8, 0, 0, 0, 0, 0)
+            + SPI_IOC_TRANSFER.pack(0, ctypes.addressof(rx_buf), rx_len, self.speed_hz, 0, 8, 0, 0, 0, 0, 0)
+        )
+        fcntl.ioctl(self._fd, spi_ioc_message(2), message)
+        return rx_buf.raw
+
+    def read_jedec_id(self) -> Tuple[int, int]:
+        """Returns the (manufacturer, device id) read with RDID."""
+        data = self.command(bytes([CMD_RDID]), 3)
+        return data[0], (data[1] << 8) | data[2]
+
+    def read_sfdp(self, addr: int, length: int) -> bytes:
+        """Reads `length` bytes of the SFDP space."""
+        return self.command(bytes([CMD_RDSFDP, (addr >> 16) & 0xFF, (addr >> 8) & 0xFF, addr & 0xFF, 0]), length)
+
+    def sfdp_size(self) -> Optional[int]:
+        """Returns the density from the SFDP basic parameter table, None without SFDP."""
+        header = self.read_sfdp(0, 8)
+        if header[:4] != SFDP_SIGNATURE:
+            return None
+        headers = self.read_sfdp(8, 8 * min(header[6] + 1, SFDP_MAX_HEADERS))
+        for offset in range(0, len(headers), 8):
+            param = headers[offset:offset + 8]
+            if (param[7] << 8) | param[0] != SFDP_BFPT_ID or param[3] < 2:
+                continue
+            pointer = param[4] | (param[5] << 8) | (param[6] << 16)
+            density = struct.unpack("<I", self.read_sfdp(pointer + 4, 4))[0]
+            if density in (0, 0xFFFFFFFF):
+                return None
+            bits = 1 << (density & 0x7FFFFFFF) if density & 0x80000000 else density + 1
+            return bits // 8
+        return None
+
+    def probe(self) -> Optional[FlashInfo]:
+        """Identifies the flash, None if nothing answers RDID."""
+        manufacturer, device = self.read_jedec_id()
+        if manufacturer in (0x00, 0xFF):
+            return None
+        size = self.sfdp_size() or capacity_size(device & 0xFF)
+        return FlashInfo(manufacturer, device, JEDEC_VENDORS.get(manufacturer, f"0x{manufacturer:02x}"),
+                         JEDEC_PARTS.get((manufacturer, device), ()), size)
+
+
+def probe_spi_flash(path: str, speed_hz: int = SPI_PROBE_SPEED_HZ) -> Optional[FlashInfo]:
+    """Probes the flash on a spidev node, None on error or no answer."""
+    try:
+        with SpiFlash(path, speed_hz) as flash:
+            return flash.probe()
+    except OSError:
+        return None
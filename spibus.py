@@ -4,9 +4,12 @@ import os
 import pathlib
 import re
 from ast import literal_eval
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from devmap import get_devmap, DEVMAP_FLASHES, DEVMAP_GPIOCHIPS
 from fboss_utils import execute_shell_cmd
+from gpio import GPIO_CHIP_NAME
+from spi_flash import probe_spi_flash
 
 IOB_PCI_DRIVER="fbiob_pci"
 
@@ -37,16 +40,14 @@ class SPIBUS:
     def __init__(self, spi_info: Dict, fpga_path: str):
         self._fpga_path = fpga_path
         self.spi_dict = spi_info
+        self._gpiochip = None
         generate_spidev()
 
     def _get_spidev_from_udev(self, spidev_name: str) -> Tuple[bool, str]:
         """get spidev info."""
-        dev_name = f"{DEVMAP_SPI}{spidev_name}"
-        if pathlib.Path(dev_name).exists():
-            chardev = os.readlink(dev_name)
-            if pathlib.Path(chardev).exists():
-                spidev_info = os.path.basename(chardev)
-                return True, spidev_info
+        entry = get_devmap().lookup(DEVMAP_FLASHES, spidev_name)
+        if entry and entry.exists and entry.chardev:
+            return True, entry.chardev
         return False, "NA"
 
     def _detect_gpio(self) -> str:
@@ -56,15 +57,22 @@ class SPIBUS:
             return stdout.strip().split(" ")[0]
         return "NA"
 
+    def _get_gpiochip(self) -> str:
+        """get the IOB gpiochip, looked up once."""
+        if self._gpiochip is None:
+            chip = get_devmap().resolve(DEVMAP_GPIOCHIPS, GPIO_CHIP_NAME)
+            self._gpiochip = os.path.basename(chip) if chip else self._detect_gpio()
+        return self._gpiochip
+
     def parse_spidev_udev(self, busid: int) -> Tuple[bool, str, str]:
         """parse spidev info."""
         spidev_info = ""
         spidev_udev = ""
         udev_flag = False
         # get spi flash device udev
-        if not pathlib.Path(DEVMAP_SPI).exists():
+        spi_udev = get_devmap().names(DEVMAP_FLASHES)
+        if not spi_udev:
             return False, "NA", "NA"
-        spi_udev = os.listdir(DEVMAP_SPI)
         for value in self.spi_dict.values():
             if busid == value["bus"]:
                 udev_flag = True
@@ -120,42 +128,21 @@ class SPIBUS:
             )
         return errcode, status
 
-    def spi_scan(self, dev: str) -> bool:
-        """detect spi flash chip info."""
-        dev_info = self.spi_dict.get(dev)
-        res = True
-        vendor, name, size = "NA", "NA", "NA"
-        gpiopin = self.spi_dict[dev].get("gpiopin")
-
-        gpiochip = self._detect_gpio()
-        if dev_info is None:
-            return False
-
-        if gpiopin:
-            self._set_gpio_pins(gpiochip, gpiopin, 1)
-
-        spidev = f'/dev/spidev{self.spi_dict[dev]["bus"]}.0'
-        if not os.path.exists(spidev):
-            return False
-
-        if dev == "iob":
-            cmd = (
-                f"flashrom -p linux_spi:dev={spidev} -c"
-                + f' {self.spi_dict[dev]["chip"]} --flash-name'
-            )
-            stat, stdout = execute_shell_cmd(cmd)
-
+    def _flashrom_probe(self, dev: str, spidev: str) -> Optional[Tuple[str, str, str]]:
+        """detect spi flash chip info with flashrom."""
         cmd = (
             f"flashrom -p linux_spi:dev={spidev} -c"
             + f' {self.spi_dict[dev]["chip"]} --flash-name'
         )
+        if dev == "iob":
+            execute_shell_cmd(cmd)
         stat, stdout = execute_shell_cmd(cmd)
         if not stat:
-            return False
+            return None
         try:
             vendor, name = SPI_VENDOR_PATTERN.findall(stdout.splitlines()[-1])[0]
-        except ValueError:
-            return False
+        except (ValueError, IndexError):
+            return None
         cmd = (
             f"flashrom -p linux_spi:dev={spidev} -c"
             + f' {self.spi_dict[dev]["chip"]} --flash-size'
@@ -165,19 +152,50 @@ class SPIBUS:
             size = "NA"
         else:
             size = f"{literal_eval(stdout.splitlines()[-1])//1024} KB"
+        return vendor, name, size
 
-        if gpiopin:
-            self._set_gpio_pins(gpiochip, gpiopin, 0)
+    def spi_scan(self, dev: str) -> bool:
+        """
+        detect spi flash chip info.
+
+        The flash is identified in-process with RDID and SFDP, flashrom is
+        only run when the native probe does not match the configured chip.
+        """
+        dev_info = self.spi_dict.get(dev)
+        if dev_info is None:
+            return False
+
+        spidev = f'/dev/spidev{dev_info["bus"]}.0'
+        if not os.path.exists(spidev):
+            return False
 
-        mux = self.spi_dict[dev]["gpiopin"]
+        gpiopin = dev_info.get("gpiopin")
+        if gpiopin:
+            gpiochip = self._get_gpiochip()
+            self._set_gpio_pins(gpiochip, gpiopin, 1)
+        try:
+            info = probe_spi_flash(spidev)
+            if info is not None and info.matches(dev_info["chip"]):
+                vendor, name = info.vendor, dev_info["chip"]
+                size = f"{info.size // 1024} KB" if info.size else "NA"
+            else:
+                found = self._flashrom_probe(dev, spidev)
+                if found is None:
+                    return False
+                vendor, name, size = found
+        finally:
+            if gpiopin:
+                self._set_gpio_pins(gpiochip, gpiopin, 0)
+
+        mux = dev_info["gpiopin"]
         print(
-            f'{dev.upper():>7s} Flash   {self.spi_dict[dev]["bus"]:>3d}   '
+            f'{dev.upper():>7s} Flash   {dev_info["bus"]:>3d}   '
             + f'{"".join(map(str, mux)) if mux else "NA":>6}{"":7}{vendor.ljust(7)}  '
             + f" {name.ljust(10)}{size:>9} ",
             end="",
         )
 
-        return res
+        return True
 
     def _set_gpio_pins(self, gpiochip: str, gpiopin: List[int], value: int):
         """Set GPIO pins to a specific value."""
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+"""Module providing a whole-system power view over eFuses, hwmon and sensor rails."""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from hwmon import HWMON_KINDS, HWMON_PATH, HwmonIndex
+from sensors import SensorColumns, SensorPoller, get_sensor_config_file, read_config_file, resolve_sensor_paths
+from tps25990_energy import EnergyIntegrator, find_efuse_buses, read_energy_data
+
+SOURCE_EFUSE = "efuse"
+SOURCE_SENSOR = "sensor"
+SOURCE_HWMON = "hwmon"
+
+POWER_KIND = [prefix for prefix, _, _ in HWMON_KINDS].index("power")
+POWER_DIVISOR = HWMON_KINDS[POWER_KIND][1]
+
+# Window of the energy-derived average, seconds
+POWER_WINDOW = 60.0
+
+
+class PowerSnapshot:
+    """
+    One time-aligned sweep of every power rail.
+
+    `watts` is the power of the last sweep interval, `average` the energy
+    over the window divided by its duration. eFuse rails are the system
+    input; sensor and hwmon rails sit behind them, so the system total is
+    the eFuse total when eFuses are present and the rail total otherwise.
+    """
+
+    __slots__ = ("timestamp", "skew", "window", "names", "domains", "sources", "watts", "average")
+
+    def __init__(self, timestamp, skew, window, names, domains, sources, watts, average):
+        self.timestamp = timestamp
+        self.skew = skew
+        self.window = window
+        self.names = names
+        self.domains = domains
+        self.sources = sources
+        self.watts = watts
+        self.average = average
+
+    def domain_totals(self) -> Dict[Tuple[str, str], Tuple[float, float]]:
+        """Returns {(source, domain): (watts, average)}, NaN rails are skipped."""
+        totals = {}
+        for idx, key in enumerate(zip(self.sources, self.domains)):
+            watts, average = totals.get(key, (0.0, 0.0))
+            totals[key] = (watts + np.nan_to_num(self.watts[idx]), average + np.nan_to_num(self.average[idx]))
+        return totals
+
+    def source_total(self, source: str) -> Tuple[float, float]:
+        """Returns (watts, average) summed over the rails of one source."""
+        mask = np.array([s == source for s in self.sources], dtype=bool)
+        if not mask.any():
+            return np.nan, np.nan
+        return float(np.nansum(self.watts[mask])), float(np.nansum(self.average[mask]))
+
+    def total(self) -> Tuple[float, float]:
+        """Returns the system (watts, average)."""
+        if SOURCE_EFUSE in self.sources:
+            return self.source_total(SOURCE_EFUSE)
+        rails = [self.source_total(source) for source in (SOURCE_SENSOR, SOURCE_HWMON)]
+        return tuple(float(np.nansum(values)) for values in zip(*rails))
+
+    def to_dict(self):
+        watts, average = self.total()
+        return {
+            "timestamp": self.timestamp,
+            "skew": self.skew,
+            "window": self.window,
+            "total": {"watts": watts, "average": average},
+            "domains": [
+                {"source": source, "domain": domain, "watts": float(w), "average": float(a)}
+                for (source, domain), (w, a) in self.domain_totals().items()
+            ],
+        }
+
+    def print_report(self):
+        """Prints per-domain and total power."""
+        stamp = time.strftime("%F %T", time.localtime(self.timestamp))
+        print(f"{stamp}  skew {self.skew * 1000:.1f} ms  average over {self.window:.0f} s")
+        print(" Source | Domain                   | Power (W)  | Avg (W)")
+        for (source, domain), (watts, average) in sorted(self.domain_totals().items()):
+            print(f" {source:<7}| {domain:<25}| {watts:<11.3f}| {average:.3f}")
+        for source in (SOURCE_EFUSE, SOURCE_SENSOR, SOURCE_HWMON):
+            watts, average = self.source_total(source)
+            if not np.isnan(watts):
+                print(f" {source + ' total':<34}| {watts:<11.3f}| {average:.3f}")
+        watts, average = self.total()
+        print(f" \033[1;34m{'System':<34}| {watts:<11.3f}| {average:.3f}\033[0m")
+        print()
+
+
+class SystemPower:
+    """
+    Power accounting over the eFuses, the W-unit sensor rails and the hwmon
+    power attributes not already covered by a sensor.
+
+    A sweep reads the three sources concurrently and stamps them with the
+    sweep midpoint. eFuse energy comes from the READ_EIN accumulators; the
+    other rails are integrated from their samples, so every rail has a
+    cumulative energy and the window average is one difference.
+    """
+
+    def __init__(self, config_file: str = None, efuse: bool = True,
+                 hwmon_path: str = HWMON_PATH, window: float = POWER_WINDOW):
+        self.window = window
+        self.hwmon_path = hwmon_path
+        busids = find_efuse_buses() if efuse else []
+        self.integrator = EnergyIntegrator(busids, checkpoint_file=None, window=window) if busids else None
+        self.efuse_buses = list(self.integrator.rails) if self.integrator else []
+
+        sensors = resolve_sensor_paths(read_config_file(config_file or get_sensor_config_file()))
+        self.columns = SensorColumns([sensor for sensor in sensors if sensor.unit == "W"])
+        self.poller = SensorPoller(self.columns.sensors)
+        self.hwmon = None
+        self.hwmon_rows = np.zeros(0, dtype=np.int64)
+        self._build()
+
+    def _build(self):
+        """Lays out the rails, resets the energy history."""
+        if self.hwmon is not None:
+            self.hwmon.close()
+        self.hwmon = HwmonIndex(self.hwmon_path)
+        covered = {os.path.realpath(s.dev_file) for s in self.columns.sensors if s.dev_file}
+        rows, keys = [], set()
+        # Prefer *_input over *_average of the same attribute
+        order = sorted(range(len(self.hwmon.attrs)), key=lambda r: "_input" not in self.hwmon.attrs[r][1].file)
+        for row in order:
+            chip_idx, attr = self.hwmon.attrs[row]
+            key = (chip_idx, attr.file.split("_")[0])
+            if attr.kind != POWER_KIND or key in keys or os.path.realpath(attr.path) in covered:
+                continue
+            keys.add(key)
+            rows.append(row)
+        self.hwmon_rows = np.array(sorted(rows), dtype=np.int64)
+
+        self.names = [f"bus {busid}" for busid in self.efuse_buses]
+        self.domains = ["eFuse"] * len(self.efuse_buses)
+        self.sources = [SOURCE_EFUSE] * len(self.efuse_buses)
+        self.names += self.columns.names
+        self.domains += [sensor.position for sensor in self.columns.sensors]
+        self.sources += [SOURCE_SENSOR] * len(self.columns)
+        for row in self.hwmon_rows:
+            chip_idx, attr = self.hwmon.attrs[row]
+            self.names.append(attr.label)
+            self.domains.append(self.hwmon.chips[chip_idx].name)
+            self.sources.append(SOURCE_HWMON)
+
+        size = len(self.names)
+        self.efuse = slice(0, len(self.efuse_buses))
+        self.joules = np.zeros(size)
+        self.history = deque()
+        self._last_watts = np.full(size, np.nan)
+        self._last_time = None
+
+    async def _sweep(self):
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        done = {}
+
+        async def timed(name, future):
+            result = await future
+            done[name] = time.monotonic()
+            return result
+
+        efuse_reads = [
+            timed(f"efuse{busid}", loop.run_in_executor(None, _read_energy, busid))
+            for busid in self.efuse_buses
+        ]
+        results = await asyncio.gather(
+            timed("sensors", self.poller.poll()),
+            timed("hwmon", loop.run_in_executor(None, self.hwmon.sample)),
+            *efuse_reads,
+        )
+        end = max(done.values(), default=start)
+        return start, end, results[0], results[1], dict(zip(self.efuse_buses, results[2:]))
+
+    def sample(self) -> PowerSnapshot:
+        """Reads every rail once and returns the updated snapshot."""
+        if self.hwmon.stale():
+            self._build()
+        start, end, raw, hwmon_data, efuse = asyncio.run(self._sweep())
+        mono = (start + end) / 2
+        timestamp = time.time() - (time.monotonic() - mono)
+
+        watts = np.full(len(self.names), np.nan)
+        sensor_rows = slice(self.efuse.stop, self.efuse.stop + len(self.columns))
+        watts[sensor_rows] = self.columns.convert(raw)
+        records = hwmon_data.records[self.hwmon_rows]
+        watts[sensor_rows.stop:] = np.where(records["valid"], records["value"] / POWER_DIVISOR, np.nan)
+
+        # Rails: trapezoid between sweeps, one-sided where a sample is missing
+        if self._last_time is not None:
+            elapsed = mono - self._last_time
+            rails = slice(self.efuse.stop, None)
+            pair = np.where(np.isnan(watts[rails]), self._last_watts[rails], watts[rails])
+            last = np.where(np.isnan(self._last_watts[rails]), watts[rails], self._last_watts[rails])
+            self.joules[rails] += np.nan_to_num((pair + last) / 2) * elapsed
+        # eFuses: the hardware accumulators, power is the energy of the interval
+        if self.integrator is not None:
+            self.integrator.update(efuse, timestamp, mono)
+            joules = np.array([self.integrator.rails[busid].joules for busid in self.efuse_buses])
+            if self.history and self._last_time is not None and mono > self._last_time:
+                missing = np.array([efuse[busid] is None for busid in self.efuse_buses], dtype=bool)
+                interval = (joules - self.joules[self.efuse]) / (mono - self._last_time)
+                watts[self.efuse] = np.where(missing, np.nan, interval)
+            self.joules[self.efuse] = joules
+        self._last_watts = np.where(np.isnan(watts), self._last_watts, watts)
+        self._last_time = mono
+
+        self.history.append((mono, self.joules.copy()))
+        while self.history and self.history[0][0] < mono - self.window:
+            self.history.popleft()
+        if len(self.history) >= 2:
+            (first_time, first), (last_time, last) = self.history[0], self.history[-1]
+            average = (last - first) / (last_time - first_time)
+            window = last_time - first_time
+        else:
+            average = np.full(len(self.names), np.nan)
+            window = 0.0
+        return PowerSnapshot(timestamp, end - start, window, self.names, self.domains,
+                             self.sources, watts, average)
+
+    def run(self, interval: float = 1.0, duration: float = None, as_json: bool = False):
+        """Prints a snapshot every `interval` seconds."""
+        end = time.monotonic() + duration if duration else None
+        next_due = time.monotonic()
+        try:
+            while end is None or time.monotonic() < end:
+                snapshot = self.sample()
+                if as_json:
+                    print(json.dumps(snapshot.to_dict()), flush=True)
+                else:
+                    snapshot.print_report()
+                next_due += interval
+                time.sleep(max(0.0, next_due - time.monotonic()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.poller.close()
+        if self.hwmon is not None:
+            self.hwmon.close()
+
+
+def _read_energy(busid) -> Optional[Tuple[int, int, int]]:
+    try:
+        return read_energy_data(busid)
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="System power snapshot.")
+    parser.add_argument("--config", default=None, help="sensor threshold CSV")
+    parser.add_argument("--interval", type=float, default=1.0, help="refresh interval in seconds")
+    parser.add_argument("--duration", type=float, default=None, help="run duration in seconds")
+    parser.add_argument("--window", type=float, default=POWER_WINDOW, help="average window in seconds")
+    parser.add_argument("--no-efuse", action="store_true", help="skip the eFuse accumulators")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per sweep")
+    args = parser.parse_args()
+    SystemPower(args.config, not args.no_efuse, window=args.window).run(args.interval, args.duration, args.json)
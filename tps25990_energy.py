@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 """Read PMBus energy data functions."""
 
-from smbus2 import SMBus
-from time import sleep, time
+from collections import deque
+from time import monotonic, sleep, strftime, time
+import argparse
+import json
 import os
 import re
 
+from pci_devices import read_boot_id
+from smbus_pool import get_smbus_pool
+
 # Define constants for PMBus registers and data
 DEVICE_CONFIG = 0xE4
 READ_EIN = 0x86
@@ -28,6 +33,31 @@ MV_16BIT = 2**16
 IOB_PCI_DRIVER="fbiob_pci"
 DEVPATH = "/sys/bus/auxiliary/devices/{}.iob_i2c_master.{}/"
 
+# IOB I2C masters with an eFuse, RIMON value and average power interval
+EFUSE_MASTERS = range(18, 26)
+EFUSE_RVAL = 1780
+EFUSE_INTERVAL = 5
+
+# Sample period constants -> seconds, and the READ_EIN sample counter range
+SAMPLE_PERIOD_SECONDS = {SAMPLE_PERIOD_11US: 11e-6, SAMPLE_PERIOD_18US: 18e-6}
+SAMPLE_COUNT_WRAP = 1 << 24
+
+# Energy integrator: poll at this fraction of the shortest wrap time,
+# averaging window, checkpoint path and period
+INTEGRATOR_WRAP_FRACTION = 0.25
+INTEGRATOR_MAX_INTERVAL = 30.0
+INTEGRATOR_WINDOW = 60.0
+INTEGRATOR_CHECKPOINT = "/var/lib/fboss_cit/efuse_energy.json"
+INTEGRATOR_CHECKPOINT_INTERVAL = 60.0
+# Worst-case eFuse input power (W), i.e. energy count per sample, bounding
+# the energy count rate until a rail's own rate is known
+EFUSE_MAX_POWER = 1000.0
+# Smallest accepted ratio of counted samples to elapsed sample periods
+INTEGRATOR_MIN_SAMPLE_RATIO = 0.5
+
+# The sample period is a static device setting, cached per bus
+_SAMPLE_PERIODS = {}
+
 def read_energy_data(bus_id, raw_data=False):
     """Reads energy data from an I2C device.
 
@@ -41,17 +71,16 @@ def read_energy_data(bus_id, raw_data=False):
             - rollover: The rollover value as a single byte.
             - sample_count: The sample count as a 24-bit unsigned integer.
     """
-    with SMBus(bus_id, force=True) as bus:
-        block = bus.read_i2c_block_data(DEV_ADDR, READ_EIN, BLK_SIZE, force=True)
-        if raw_data:
-            print("Raw data: ", " ".join(f"\033[1;33m{hex(b)}\033[0m" for b in block))
+    block = get_smbus_pool().read_i2c_block_data(bus_id, DEV_ADDR, READ_EIN, BLK_SIZE, force=True)
+    if raw_data:
+        print("Raw data: ", " ".join(f"\033[1;33m{hex(b)}\033[0m" for b in block))
 
-        # Extract data from the block
-        accumulator_value = block[1] + block[2] * MV_8BIT
-        rollover = block[3]
-        sample_count = block[4] + block[5] * MV_8BIT + block[6] * MV_16BIT
+    # Extract data from the block
+    accumulator_value = block[1] + block[2] * MV_8BIT
+    rollover = block[3]
+    sample_count = block[4] + block[5] * MV_8BIT + block[6] * MV_16BIT
 
-        return accumulator_value, rollover, sample_count
+    return accumulator_value, rollover, sample_count
 
 def read_sample_period(bus_id):
     """Reads the sample period from the device.
@@ -62,20 +91,24 @@ def read_sample_period(bus_id):
     Returns:
         The sample period in microseconds (11 or 18), or None if an error occurs.
     """
+    sample_period = _SAMPLE_PERIODS.get(bus_id)
+    if sample_period is not None:
+        return sample_period
     try:
-        with SMBus(bus_id, True) as bus:
-            # Read the configuration data from the device
-            config_data = bus.read_word_data(DEV_ADDR, DEVICE_CONFIG, force=True)
-
-            # Extract the relevant bit from the configuration data
-            config_bit = (config_data >> 3) & 0x01
-
-            # Return the corresponding time value
-            return SAMPLE_PERIOD_11US if config_bit == 0 else SAMPLE_PERIOD_18US
+        # Read the configuration data from the device
+        config_data = get_smbus_pool().read_word_data(bus_id, DEV_ADDR, DEVICE_CONFIG, force=True)
     except OSError as e:
         print(f"Error reading sample period: {e}")
         return None
 
+    # Extract the relevant bit from the configuration data
+    config_bit = (config_data >> 3) & 0x01
+
+    # Cache and return the corresponding time value
+    sample_period = SAMPLE_PERIOD_11US if config_bit == 0 else SAMPLE_PERIOD_18US
+    _SAMPLE_PERIODS[bus_id] = sample_period
+    return sample_period
+
 def calculate_energy_count(accumulator_value, rollover, rval):
     """Calculates the energy count based on the PMBus accumulator register.
 
@@ -121,29 +154,46 @@ def pmbus_show_average_energy(busid, rval, delay_time):
     Returns:
         The average power as a float, or None if no change in energy count or an error occurs.
     """
-    max_energy_count = calculate_energy_count(0xffff, 0xff, rval)
     current_timestamp = time()
     print(f"First time read at: {current_timestamp}")
-    last_accumulator_value, last_rollover, last_sample_count = read_energy_data(busid, raw_data=True)
-    last_energy_count = calculate_energy_count(last_accumulator_value, last_rollover, rval)
+    first = read_energy_data(busid, raw_data=True)
 
     print(f"Delay {delay_time} seconds..")
     sleep(delay_time)
 
     current_timestamp = time()
     print(f"Second time read at: {current_timestamp}")
-    accumulator_value, rollover, sample_count = read_energy_data(busid, raw_data=True)
-    energy_count = calculate_energy_count(accumulator_value, rollover, rval)
+    second = read_energy_data(busid, raw_data=True)
 
-    if energy_count == last_energy_count:
+    average_power = calculate_average_power(first, second, rval)
+    if average_power is None:
         print("No change in energy count.")
+    return average_power
+
+
+def calculate_average_power(first, second, rval):
+    """Calculates the average power between two READ_EIN readings.
+
+    Args:
+        first: (accumulator_value, rollover, sample_count) of the first read.
+        second: (accumulator_value, rollover, sample_count) of the second read.
+        rval: The value of RIMON.
+
+    Returns:
+        The average power as a float, or None if the energy count did not change.
+    """
+    max_energy_count = calculate_energy_count(0xffff, 0xff, rval)
+    last_energy_count = calculate_energy_count(first[0], first[1], rval)
+    energy_count = calculate_energy_count(second[0], second[1], rval)
+
+    if energy_count == last_energy_count:
         return None
 
     energy_count_diff = energy_count - last_energy_count
     if energy_count_diff < 0:
         energy_count_diff += max_energy_count
 
-    sample_count_diff = sample_count - last_sample_count
+    sample_count_diff = second[2] - first[2]
     if sample_count_diff < 0:
         sample_count_diff += (1 << 24)
 
@@ -151,37 +201,84 @@ def pmbus_show_average_energy(busid, rval, delay_time):
     return average_power
 
 
-def read_all_device_energy():
-    # Set the RIMON value
-    rval = 1780
-
-    # Iterate through potential I2C bus IDs
-    for n in range(18, 26):
+def find_efuse_buses():
+    """Returns the I2C bus ids of the eFuse masters that are present."""
+    busids = []
+    for n in EFUSE_MASTERS:
         bus_path = DEVPATH.format(IOB_PCI_DRIVER, n)
 
         # Get the I2C bus ID from the directory
-        busid = get_i2c_bus(bus_path)
+        try:
+            busid = get_i2c_bus(bus_path)
+        except OSError:
+            busid = None
         if busid is None:
             print(f"I2C bus not found in {bus_path}")
             continue
+        busids.append(int(busid))
+    return busids
+
+
+def snapshot_energy(busids):
+    """Reads READ_EIN on every bus back to back.
+
+    Returns:
+        A dict of bus id -> (accumulator_value, rollover, sample_count),
+        None for buses that could not be read.
+    """
+    snapshot = {}
+    for busid in busids:
+        try:
+            snapshot[busid] = read_energy_data(busid)
+        except OSError:
+            snapshot[busid] = None
+    return snapshot
+
+
+def read_all_average_power(busids, rval=EFUSE_RVAL, delay_time=EFUSE_INTERVAL):
+    """Calculates the average power of every bus over one shared interval.
+
+    Returns:
+        A dict of bus id -> average power, None where it could not be read.
+    """
+    if not busids:
+        return {}
+    first = snapshot_energy(busids)
+    sleep(delay_time)
+    second = snapshot_energy(busids)
+    return {
+        busid: calculate_average_power(first[busid], second[busid], rval)
+        if first[busid] and second[busid] else None
+        for busid in busids
+    }
+
 
-        # Convert bus ID to integer
-        busid = int(busid)
+def read_all_device_energy():
+    # Set the RIMON value
+    rval = EFUSE_RVAL
 
-        # Calculate and print accumulated energy
-        accumulation_energy = pmbus_show_accumulation_energy(busid, rval)
+    busids = find_efuse_buses()
+
+    # Calculate and print accumulated energy
+    for busid in busids:
+        try:
+            accumulation_energy = pmbus_show_accumulation_energy(busid, rval)
+        except OSError:
+            accumulation_energy = None
         if accumulation_energy is not None:
             print(f"Accumulated energy on bus {busid}: [\033[1;34m{accumulation_energy}\033[0m]")
         else:
             print(f"Error reading accumulated energy on bus {busid}")
-
-        # Calculate and print average energy
-        average_energy = pmbus_show_average_energy(busid, rval, 5)
-        if average_energy is not None:
-            print(f"Average energy on bus {busid}: [\033[1;32m{average_energy}\033[0m]")
+    print()
+
+    # Sample every bus over the same interval
+    print(f"Sampling {len(busids)} buses over {EFUSE_INTERVAL} seconds..")
+    average_power = read_all_average_power(busids, rval, EFUSE_INTERVAL)
+    for busid in busids:
+        if average_power[busid] is not None:
+            print(f"Average energy on bus {busid}: [\033[1;32m{average_power[busid]}\033[0m]")
         else:
             print(f"Error reading average energy on bus {busid}")
-        print()
 
 def get_i2c_bus(directory):
     """
@@ -203,5 +300,223 @@ def get_i2c_bus(directory):
 
     return None
 
+class EfuseRail:
+    """Integration state of one eFuse."""
+
+    __slots__ = ("busid", "sample_period", "last", "last_time", "joules",
+                 "count_rate", "history", "gaps")
+
+    def __init__(self, busid, sample_period):
+        self.busid = busid
+        self.sample_period = sample_period
+        # Last (accumulator_value, rollover, sample_count) and its wall time
+        self.last = None
+        self.last_time = None
+        self.joules = 0.0
+        # Highest energy count increase per second seen, bounds the poll rate
+        self.count_rate = 0.0
+        # (monotonic time, joules) points for the windowed average
+        self.history = deque()
+        # Intervals that could not be integrated (read errors, long gaps)
+        self.gaps = 0
+
+    def to_dict(self):
+        return {"busid": self.busid, "last": self.last, "last_time": self.last_time,
+                "joules": self.joules, "count_rate": self.count_rate, "gaps": self.gaps}
+
+
+class EnergyIntegrator:
+    """
+    Continuous per-rail energy accounting for the TPS25990 eFuses.
+
+    Each rail's READ_EIN energy count and 24-bit sample count wrap, so
+    the rails are polled often enough to see at most one wrap between
+    reads: the interval is a fraction of the shortest of the sample
+    counter wrap time (from the sample period) and the energy count wrap
+    time (from the fastest rate seen, the device worst case until then).
+    Intervals longer than that, or whose energy and sample count deltas
+    disagree, are counted as gaps instead of being integrated. Every other
+    interval adds energy_count_diff x sample period joules to the rail, and the state is
+    checkpointed so a restart resumes the integral (checkpoint_file None
+    keeps it in memory only).
+    """
+
+    def __init__(self, busids, rval=EFUSE_RVAL, checkpoint_file=INTEGRATOR_CHECKPOINT,
+                 window=INTEGRATOR_WINDOW):
+        self.rval = rval
+        self.max_energy_count = calculate_energy_count(0xffff, 0xff, rval)
+        self.checkpoint_file = checkpoint_file
+        self.window = window
+        self.boot_id = read_boot_id()
+        self.rails = {}
+        for busid in busids:
+            sample_period = read_sample_period(busid)
+            if sample_period in SAMPLE_PERIOD_SECONDS:
+                self.rails[busid] = EfuseRail(busid, SAMPLE_PERIOD_SECONDS[sample_period])
+        self.started = time()
+        self.load()
+
+    def count_rate(self, rail):
+        """Returns the energy count rate bound of a rail, the device worst case until one is seen."""
+        if rail.count_rate > 0:
+            return rail.count_rate
+        return EFUSE_MAX_POWER / rail.sample_period
+
+    def wrap_time(self, rail):
+        """Returns the shortest time in which one of the rail's counters can wrap."""
+        return min(SAMPLE_COUNT_WRAP * rail.sample_period, self.max_energy_count / self.count_rate(rail))
+
+    def next_interval(self):
+        """Returns the poll interval that cannot miss a counter wrap."""
+        interval = INTEGRATOR_MAX_INTERVAL
+        for rail in self.rails.values():
+            interval = min(interval, self.wrap_time(rail) * INTEGRATOR_WRAP_FRACTION)
+        return interval
+
+    def poll(self):
+        """Reads every rail once and integrates the interval since the last read."""
+        now = time()
+        mono = monotonic()
+        self.update(snapshot_energy(list(self.rails)), now, mono)
+
+    def update(self, snapshot, now, mono):
+        """Integrates a snapshot_energy() result read at `now` (wall) / `mono`."""
+        for busid, reading in snapshot.items():
+            rail = self.rails[busid]
+            if reading is None:
+                continue
+            if rail.last is not None:
+                self._integrate(rail, reading, now)
+            rail.last = tuple(reading)
+            rail.last_time = now
+            rail.history.append((mono, rail.joules))
+            while rail.history and rail.history[0][0] < mono - self.window:
+                rail.history.popleft()
+
+    def _gap(self, rail, elapsed, reason):
+        rail.gaps += 1
+        print(f"Bus {rail.busid}: {reason}, {elapsed:.1f} s of energy not integrated")
+
+    def _integrate(self, rail, reading, now):
+        elapsed = now - rail.last_time
+        if elapsed >= self.wrap_time(rail):
+            # A counter may have wrapped more than once: the interval is lost
+            self._gap(rail, elapsed, "interval longer than the counter wrap time")
+            return
+        last_count = calculate_energy_count(rail.last[0], rail.last[1], self.rval)
+        energy_count = calculate_energy_count(reading[0], reading[1], self.rval)
+        energy_count_diff = energy_count - last_count
+        if energy_count_diff < 0:
+            energy_count_diff += self.max_energy_count
+        sample_count_diff = (reading[2] - rail.last[2]) % SAMPLE_COUNT_WRAP
+        if sample_count_diff < elapsed / rail.sample_period * INTEGRATOR_MIN_SAMPLE_RATIO:
+            # Fewer samples than the elapsed time allows: counters were reset
+            self._gap(rail, elapsed, "sample count behind the elapsed time")
+            return
+        if energy_count_diff > sample_count_diff * EFUSE_MAX_POWER:
+            # More energy than the samples can hold: a missed wrap or a bad read
+            self._gap(rail, elapsed, "energy count ahead of the sample count")
+            return
+        rail.joules += energy_count_diff * rail.sample_period
+        if elapsed > 0:
+            rail.count_rate = max(rail.count_rate, energy_count_diff / elapsed)
+
+    def average_power(self, busid):
+        """Returns the average power of a rail over the window, None if unknown."""
+        history = self.rails[busid].history
+        if len(history) < 2 or history[-1][0] <= history[0][0]:
+            return None
+        return (history[-1][1] - history[0][1]) / (history[-1][0] - history[0][0])
+
+    def load(self):
+        """Restores the integrals of a previous run."""
+        if self.checkpoint_file is None:
+            return
+        try:
+            with open(self.checkpoint_file, "r", encoding="utf-8") as fd:
+                checkpoint = json.load(fd)
+        except (OSError, ValueError):
+            return
+        same_boot = checkpoint.get("boot_id") == self.boot_id
+        for state in checkpoint.get("rails", []):
+            rail = self.rails.get(state.get("busid"))
+            if rail is None:
+                continue
+            rail.joules = state.get("joules", 0.0)
+            rail.count_rate = state.get("count_rate", 0.0)
+            rail.gaps = state.get("gaps", 0)
+            if same_boot and state.get("last"):
+                # Resume from the checkpointed reading, a long downtime is
+                # caught as a gap by the wrap check
+                rail.last = tuple(state["last"])
+                rail.last_time = state["last_time"]
+            else:
+                rail.gaps += 1
+        self.started = checkpoint.get("started", self.started)
+
+    def save(self):
+        """Checkpoints the integrals atomically."""
+        if self.checkpoint_file is None:
+            return
+        checkpoint = {
+            "boot_id": self.boot_id,
+            "started": self.started,
+            "saved": time(),
+            "rails": [rail.to_dict() for rail in self.rails.values()],
+        }
+        tmp_file = f"{self.checkpoint_file}.{os.getpid()}"
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as fd:
+                json.dump(checkpoint, fd)
+            os.replace(tmp_file, self.checkpoint_file)
+        except OSError as e:
+            print(f"Error writing energy checkpoint: {e}")
+
+    def print_report(self):
+        """Prints the cumulative energy and windowed power of every rail."""
+        hours = (time() - self.started) / 3600
+        print(f"{strftime('%F %T')}  integrated over {hours:.2f} h")
+        print(" Bus | Energy (J)     | Energy (Wh) | Avg power (W) | Gaps")
+        for busid, rail in self.rails.items():
+            power = self.average_power(busid)
+            power = f"{power:.3f}" if power is not None else "NA"
+            print(f" {busid:<4}| {rail.joules:<15.3f}| {rail.joules / 3600:<12.4f}| {power:<14}| {rail.gaps}")
+        print()
+
+    def run(self, duration=None, report_interval=10.0):
+        """Integrates until interrupted or `duration` seconds have elapsed."""
+        end = monotonic() + duration if duration else None
+        next_report = next_save = monotonic()
+        try:
+            while end is None or monotonic() < end:
+                self.poll()
+                now = monotonic()
+                if now >= next_report:
+                    self.print_report()
+                    next_report = now + report_interval
+                if now >= next_save:
+                    self.save()
+                    next_save = now + INTEGRATOR_CHECKPOINT_INTERVAL
+                sleep(self.next_interval())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.save()
+            self.print_report()
+
+
 if __name__ == "__main__":
-    read_all_device_energy()
+    parser = argparse.ArgumentParser(description="TPS25990 eFuse energy.")
+    parser.add_argument("--integrate", action="store_true", help="continuous energy accounting")
+    parser.add_argument("--duration", type=float, default=None, help="integration duration in seconds")
+    parser.add_argument("--report", type=float, default=10.0, help="report interval in seconds")
+    parser.add_argument("--checkpoint", default=INTEGRATOR_CHECKPOINT, help="checkpoint file")
+    parser.add_argument("--stats", action="store_true", help="print per-bus SMBus statistics")
+    args = parser.parse_args()
+    if args.integrate:
+        EnergyIntegrator(find_efuse_buses(), checkpoint_file=args.checkpoint).run(args.duration, args.report)
+    else:
+        read_all_device_energy()
+    if args.stats:
+        get_smbus_pool().print_stats()
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
-import mmap
-import struct
-import contextlib
+import argparse
 import subprocess
-from typing import Tuple, Optional
+import time
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from iob_bar import get_iob_bar
+from pci_devices import find_pci_bdf
+from ring_buffer import RingBuffer
 
 # Constants for XADC registers
 XADC_TEMP = [0x200, 0x280, 0x290]
@@ -19,6 +24,13 @@ IOB_XADC = {
     "VCCBRAM": XADC_VCCBRAM
 }
 
+# Sampler defaults
+XADC_SAMPLE_RATE = 1000
+XADC_WINDOW_SECONDS = 60
+XADC_PERCENTILES = (50, 95, 99)
+# Status bits below the 12-bit conversion result
+XADC_DATA_MASK = 0xFFF0
+
 # Define IOB device ID and paths
 IOB_DEV_ID = "1d9b:0011"
 BDF_PATH = "/sys/bus/pci/devices/0000:{}/"
@@ -48,12 +60,9 @@ def execute_shell_cmd(cmd: str) -> Tuple[bool, str]:
 
 def get_pci_bdf_info(vendor_id: str) -> Optional[str]:
     """Retrieves the PCI Bus, Device, and Function (BDF) information for a device with the given vendor ID."""
-    status, stdout = execute_shell_cmd("lspci -n")
-    if not status:
-        return None
-    for line in stdout.splitlines():
-        if vendor_id in line:
-            return line.split()[0]
+    bdf = find_pci_bdf(vendor_id)
+    if bdf is not None:
+        return bdf
     logging.warning(f"PCI device with vendor ID '{vendor_id}' not found.")
     return None
 
@@ -66,28 +75,12 @@ def get_fpga_path():
 
 def _fpga_io_operation(reg: int, val=None):
     """Performs FPGA I/O operations."""
-    fpga_path = get_fpga_path()
-    if fpga_path is None:
-        return None
-    bdf_fd = f"{fpga_path}resource0"
-
     try:
-        with open(bdf_fd, mode="r+", encoding="utf-8") as fpgaio:
-            with contextlib.closing(
-                mmap.mmap(
-                    fpgaio.fileno(),
-                    length=0,
-                    flags=mmap.MAP_SHARED,
-                    access=mmap.ACCESS_DEFAULT,
-                )
-            ) as mmap_obj:
-                if val is not None:
-                    mmap_obj.seek(reg)
-                    mmap_obj.write(struct.pack("<I", val))  # Use struct.pack for writing
-                    mmap_obj.flush()
-                else:
-                    mmap_obj.seek(reg)
-                    return struct.unpack("<I", mmap_obj.read(4))[0]  # Read as unsigned int
+        bar = get_iob_bar()
+        if val is not None:
+            bar.write32(reg, val)
+        else:
+            return bar.read32(reg)  # Read as unsigned int
     except IOError as err:
         logging.error(f"I/O error: {err}")
         return None
@@ -110,6 +103,142 @@ def vcc_operators(reg_val: int):
     vcc = round((bits_val / 4096) * 3, 3)
     return f"{vcc} V"
 
+def temp_operators_array(reg_val):
+    """Vectorized temp_operators, returns degrees C as float(s)."""
+    bits_val = (np.asarray(reg_val, dtype=np.uint32) & 0xFFF0) >> 4
+    return bits_val * (503.975 / 4096) - 273.15
+
+def vcc_operators_array(reg_val):
+    """Vectorized vcc_operators, returns volts as float(s)."""
+    bits_val = (np.asarray(reg_val, dtype=np.uint32) & 0xFFF0) >> 4
+    return bits_val * (3 / 4096)
+
+# Channel name -> (current value register, converter, unit)
+XADC_CHANNELS = {
+    k: (v[0], temp_operators_array if k == "Temperature" else vcc_operators_array,
+        "C" if k == "Temperature" else "V")
+    for k, v in IOB_XADC.items()
+}
+
+class XadcSampler:
+    """
+    Continuous XADC sampler.
+
+    Polls the current value registers of IOB_XADC at `rate` Hz into a ring
+    buffer holding `window` seconds of samples. Iterating the sampler yields
+    (timestamp, {channel: value}) tuples at the configured rate.
+    """
+
+    def __init__(self, rate: float = XADC_SAMPLE_RATE, window: float = XADC_WINDOW_SECONDS, bar=None):
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.bar = bar if bar is not None else get_iob_bar()
+        self.channels = tuple(XADC_CHANNELS)
+        self._regs = tuple(XADC_CHANNELS[k][0] for k in self.channels)
+        self.buffer = RingBuffer(max(1, int(rate * window)), len(self.channels), np.uint32)
+        self.overruns = 0
+        # Converters are affine in the masked register value, so window
+        # statistics of the raw samples convert directly
+        scales = []
+        offsets = []
+        for k in self.channels:
+            low, high = XADC_CHANNELS[k][1](np.array([0, 16], dtype=np.uint32))
+            scales.append((high - low) / 16)
+            offsets.append(low)
+        self._scales = np.array(scales)
+        self._offsets = np.array(offsets)
+
+    def sample(self) -> Tuple[float, Tuple[int, ...]]:
+        """Reads all channels once and stores the raw sample, status bits cleared."""
+        read32 = self.bar.read32
+        values = tuple(read32(reg) & XADC_DATA_MASK for reg in self._regs)
+        timestamp = time.time()
+        self.buffer.append(timestamp, values)
+        return timestamp, values
+
+    def convert(self, raw) -> Dict[str, np.ndarray]:
+        """Converts raw samples (last axis = channel) to engineering units."""
+        raw = np.asarray(raw)
+        return {
+            k: XADC_CHANNELS[k][1](raw[..., n]) for n, k in enumerate(self.channels)
+        }
+
+    def samples(self, count: Optional[int] = None) -> Iterator[Tuple[float, Tuple[int, ...]]]:
+        """Yields raw samples at the configured rate."""
+        deadline = time.perf_counter()
+        n = 0
+        while count is None or n < count:
+            yield self.sample()
+            n += 1
+            deadline += self.period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.overruns += 1
+                if -delay > self.period:
+                    # Too far behind, restart the schedule instead of bursting
+                    deadline = time.perf_counter()
+
+    def __iter__(self):
+        for timestamp, values in self.samples():
+            yield timestamp, {k: float(v) for k, v in self.convert(values).items()}
+
+    def stats(self, percentiles: Sequence[float] = ()) -> Dict[str, Dict[str, float]]:
+        """
+        Returns min/max/mean over the buffered window, plus the requested
+        percentiles (e.g. XADC_PERCENTILES), which are computed on demand.
+        """
+        if not len(self.buffer):
+            return {}
+        raw = self.buffer.stats(percentiles)
+        return {
+            k: {name: float(v[n] * self._scales[n] + self._offsets[n]) for name, v in raw.items()}
+            for n, k in enumerate(self.channels)
+        }
+
+def xadc_monitor(rate: float = XADC_SAMPLE_RATE, duration: float = None, interval: float = 1.0,
+                 window: float = XADC_WINDOW_SECONDS, percentiles: Sequence[float] = ()):
+    """
+    Samples XADC continuously and prints rolling statistics every interval.
+    Percentile columns sort the whole window each report, so they are
+    only shown when requested.
+    """
+    sampler = XadcSampler(rate, window)
+    columns = "".join(f"|{'P' + format(p, 'g'):>7}   " for p in percentiles)
+    print(
+        "-------------------------------------------------------------------------\n"
+        f"                   | XADC monitor ({rate:g} Hz) |\n"
+        "-------------------------------------------------------------------------\n"
+        f"       Time | Channel     |    Last  |    Min   |    Max   |   Mean   {columns}\n"
+        "-------------------------------------------------------------------------"
+    )
+    start = next_report = time.perf_counter()
+    try:
+        for timestamp, values in sampler.samples():
+            now = time.perf_counter()
+            if now < next_report:
+                continue
+            next_report += interval
+            last = sampler.convert(values)
+            stamp = time.strftime("%H:%M:%S", time.localtime(timestamp))
+            for k, st in sampler.stats(percentiles).items():
+                unit = XADC_CHANNELS[k][2]
+                print(
+                    f'{"":3}{stamp:>8} | {k:<12}| {float(last[k]):>7.3f}{unit}| {st["min"]:>7.3f}{unit}|'
+                    f' {st["max"]:>7.3f}{unit}| {st["mean"]:>7.3f}{unit}'
+                    + "".join(f'| {st[f"p{p:g}"]:>7.3f}{unit}' for p in percentiles)
+                )
+            if duration is not None and now - start >= duration:
+                break
+    except KeyboardInterrupt:
+        pass
+    print(
+        "-------------------------------------------------------------------------\n"
+        f"Samples: {sampler.buffer.count}, overruns: {sampler.overruns}\n"
+    )
+    return sampler
+
 def test_iob_xadc():
     """Tests the IOB XADC registers."""
     print(
@@ -169,4 +298,17 @@ def test_iob_xadc():
         print("Some XADC tests failed.")
 
 if __name__ == "__main__":
-    test_iob_xadc()
+    parser = argparse.ArgumentParser(description="IOB XADC test.")
+    parser.add_argument("--monitor", action="store_true", help="continuous sampling mode")
+    parser.add_argument("--rate", type=float, default=XADC_SAMPLE_RATE, help="sample rate in Hz")
+    parser.add_argument("--duration", type=float, default=None, help="monitor duration in seconds")
+    parser.add_argument("--interval", type=float, default=1.0, help="report interval in seconds")
+    parser.add_argument("--window", type=float, default=XADC_WINDOW_SECONDS, help="statistics window in seconds")
+    parser.add_argument("--percentiles", action="store_true",
+                        help=f"also report the {', '.join(f'p{p}' for p in XADC_PERCENTILES)} columns")
+    args = parser.parse_args()
+    if args.monitor:
+        xadc_monitor(args.rate, args.duration, args.interval, args.window,
+                     XADC_PERCENTILES if args.percentiles else ())
+    else:
+        test_iob_xadc()
@@ -1,4 +1,5 @@
 import os
+from devmap import get_devmap, DEVMAP_XCVRS
 from fboss_utils import read_sysfile_value, write_sysfile_value, get_platform
 
 # Constants
@@ -20,11 +21,12 @@ class XcvrManager:
     def _check_xcvr_device(self, device_name):
         """Checks if the XCVR device exists and is properly linked."""
         xcvr_file = os.path.join(XCVR_UDEV_PATH, device_name)
-        if not os.path.exists(xcvr_file):
+        entry = get_devmap().lookup(DEVMAP_XCVRS, device_name)
+        if entry is None or not entry.exists:
             raise ValueError(f"XCVR device not found: {xcvr_file}")
-        if not os.path.islink(xcvr_file):
+        if entry.target is None:
             raise ValueError(f"XCVR device is not a symbolic link: {xcvr_file}")
-        if not os.readlink(xcvr_file):
+        if not entry.target:
             raise ValueError(f"XCVR device has an invalid symbolic link: {xcvr_file}")
 
     def _get_xcvr_value(self, device_name):